@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Iterator, Optional
+from phi.utils.log import logger
+from utils.config_bundle import ConfigBundle, get_config_bundle
+from agents.base_agent import NimshipAgent
+
+# (配置文件绝对路径, 配置内容哈希, 模型 ID)
+PoolKey = Tuple[str, str, Optional[str]]
+
+
+class AgentPool:
+    """可复用的 NimshipAgent 实例池
+
+    以配置路径、配置内容哈希和模型 ID 作为键缓存空闲实例，按 LRU 淘汰。
+    配置经配置缓存（ConfigBundle）读取，池内不再另存一份。
+    实例被借出期间独占使用，归还时清空本次运行的历史记录。
+    """
+
+    def __init__(self, max_size: int = 16, bundle: Optional[ConfigBundle] = None):
+        self.max_size = max_size
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+        self._idle: "OrderedDict[PoolKey, List[NimshipAgent]]" = OrderedDict()
+        self._leased: Dict[int, PoolKey] = {}
+        self._bundle = bundle
+        self._lock = threading.Lock()
+
+    @property
+    def bundle(self) -> ConfigBundle:
+        return self._bundle or get_config_bundle()
+
+    def _resolve(self, config_path: str) -> Tuple[PoolKey, Dict[str, Any]]:
+        """解析池键，配置文件未修改时复用配置缓存中已解析的配置"""
+        path = os.path.abspath(config_path)
+        digest, config = self.bundle.load_versioned(path)
+        model_id = config.get("model", {}).get("name")
+        return (path, digest, model_id), config
+
+    def acquire(self, config_path: str) -> NimshipAgent:
+        """借出一个 agent 实例，没有空闲实例时新建"""
+        key, config = self._resolve(config_path)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                agent = idle.pop()
+                if not idle:
+                    del self._idle[key]
+                self._leased[id(agent)] = key
+                self.stats["hits"] += 1
+                return agent
+            self.stats["misses"] += 1
+            # 配置可能已变更，丢弃旧版本的空闲实例
+            for stale in [k for k in self._idle if k[0] == key[0] and k[1] != key[1]]:
+                self.stats["evictions"] += len(self._idle.pop(stale))
+
+        logger.debug(f"Agent pool miss, building agent from {config_path}")
+        agent = NimshipAgent(config_path=config_path, config=config)
+        with self._lock:
+            self._leased[id(agent)] = key
+        return agent
+
+    def release(self, agent: NimshipAgent) -> None:
+        """归还 agent 实例，重置运行历史后放回空闲队列"""
+        with self._lock:
+            key = self._leased.pop(id(agent), None)
+        if key is None:
+            return
+
+        agent.reset_run_state()
+        with self._lock:
+            self._idle.setdefault(key, []).append(agent)
+            self._idle.move_to_end(key)
+            self._evict()
+
+    def discard(self, agent: NimshipAgent) -> None:
+        """丢弃状态不可信的 agent 实例"""
+        with self._lock:
+            self._leased.pop(id(agent), None)
+
+    @contextmanager
+    def lease(self, config_path: str) -> Iterator[NimshipAgent]:
+        """以上下文管理器的方式借用 agent，异常时丢弃实例"""
+        agent = self.acquire(config_path)
+        try:
+            yield agent
+        except BaseException:
+            self.discard(agent)
+            raise
+        self.release(agent)
+
+    def clear(self) -> None:
+        """清空所有空闲实例"""
+        with self._lock:
+            self._idle.clear()
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(agents) for agents in self._idle.values())
+
+    def _evict(self) -> None:
+        """淘汰最久未使用的空闲实例，调用方需持有锁"""
+        total = sum(len(agents) for agents in self._idle.values())
+        while total > self.max_size and self._idle:
+            key, agents = next(iter(self._idle.items()))
+            agents.pop(0)
+            if not agents:
+                del self._idle[key]
+            total -= 1
+            self.stats["evictions"] += 1
+
+
+_default_pool: Optional[AgentPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> AgentPool:
+    """进程内共享的默认 agent 池"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = AgentPool()
+        return _default_pool
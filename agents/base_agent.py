@@ -1,14 +1,33 @@
-from typing import Dict, Any, List
-from phi.agent import Agent
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional
+from phi.agent import Agent, RunResponse
+from phi.model.message import Message
+from phi.model.base import Model
+from pydantic import PrivateAttr
 from utils.model_factory import load_model_from_config, load_agent_config
-from phi.tools.duckduckgo import DuckDuckGo
-from tools.file_manager import FileManagerTools
-from tools.devops import DevOpsTools
+from agents.response_cache import ResponseCache, cache_key, get_default_cache
+
+# 按提示词版本缓存的系统消息内容：配置、模型和工具相同的 agent 跨实例、跨会话共用，
+# 保证发给模型的前缀逐字节一致，便于服务端复用提示词缓存；按 LRU 保留最近的 MAX_SYSTEM_PROMPTS 个
+MAX_SYSTEM_PROMPTS = 64
+_system_prompts: "OrderedDict[str, str]" = OrderedDict()
+_system_prompts_lock = threading.Lock()
+# 流式调用可以走响应缓存的 run 参数，其他参数会改变输出，直接调用模型
+STREAM_KWARGS = frozenset({"stream_intermediate_steps"})
+
 
 class NimshipAgent(Agent):
-    def __init__(self, config_path: str):
-        # 加载配置
-        config = load_agent_config(config_path)
+    _nimship_config: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _response_cache: Optional[ResponseCache] = PrivateAttr(default=None)
+    _served_from_cache: bool = PrivateAttr(default=False)
+
+    def __init__(self, config_path: str, config: Optional[Dict[str, Any]] = None,
+                 response_cache: Optional[ResponseCache] = None):
+        # 加载配置，已解析的配置可直接传入以避免重复读取
+        if config is None:
+            config = load_agent_config(config_path)
         model = load_model_from_config(config.get("model", {}))
         
         # 初始化工具
@@ -28,15 +47,140 @@ class NimshipAgent(Agent):
             structured_outputs=True,  # 启用结构化输出
             show_tool_calls=True  # 显示工具调用
         )
+        self._nimship_config = config
+        self._response_cache = response_cache
 
     def _initialize_tools(self, tool_configs: List[str]) -> List[Any]:
-        """初始化工具，支持更灵活的工具配置"""
+        """初始化工具，支持更灵活的工具配置
+
+        工具类在用到时才导入，未配置该工具的 agent 不承担其导入开销。
+        """
         tools = []
         for tool in tool_configs:
             if tool == "DuckDuckGo":
+                from phi.tools.duckduckgo import DuckDuckGo
                 tools.append(DuckDuckGo())
             elif tool == "FileManager":
+                from tools.file_manager import FileManagerTools
                 tools.append(FileManagerTools())
             elif tool == "DevOps":
+                from tools.devops import DevOpsTools
                 tools.append(DevOpsTools())
         return tools
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        """响应缓存，未显式指定时使用 system.config.json 配置的默认缓存"""
+        return self._response_cache if self._response_cache is not None else get_default_cache()
+
+    def cache_fingerprint(self) -> Dict[str, Any]:
+        """影响模型输出的 agent 配置：原始配置、模型 ID、指令和工具集合"""
+        tool_names = sorted(type(tool).__name__ for tool in (self.tools or []))
+        return {
+            "config": self._nimship_config,
+            "model": self.model.id if self.model is not None else None,
+            "instructions": self.instructions,
+            "tools": tool_names
+        }
+
+    def prompt_version(self) -> str:
+        """系统消息的版本号，由 agent 指纹和影响系统消息的输出设置计算"""
+        return cache_key(self.cache_fingerprint(), {
+            "markdown": self.markdown,
+            "structured_outputs": self.structured_outputs,
+            "response_model": getattr(self.response_model, "__name__", None)
+        })
+
+    def _has_static_system_message(self) -> bool:
+        """系统消息只取决于配置时才能缓存；自定义提示词、时间、记忆、团队等会随运行变化"""
+        return (
+            self.system_prompt is None and self.system_prompt_template is None
+            and self.use_default_system_message and not self.add_datetime_to_instructions
+            and self.additional_context is None and not self.has_team()
+            and not (self.memory is not None and (self.memory.create_user_memories or self.memory.create_session_summary))
+        )
+
+    def get_system_message(self) -> Optional[Message]:
+        """返回系统消息，同一提示词版本只构建一次"""
+        if not self._has_static_system_message():
+            return super().get_system_message()
+        version = self.prompt_version()
+        with _system_prompts_lock:
+            content = _system_prompts.get(version)
+            if content is not None:
+                _system_prompts.move_to_end(version)
+        if content is None:
+            message = super().get_system_message()
+            if message is None:
+                return None
+            with _system_prompts_lock:
+                content = _system_prompts.setdefault(version, message.content)
+                while len(_system_prompts) > MAX_SYSTEM_PROMPTS:
+                    _system_prompts.popitem(last=False)
+        return Message(role=self.system_message_role, content=content)
+
+    @property
+    def served_from_cache(self) -> bool:
+        """上一次 run 是否直接返回了缓存的响应（没有调用模型，也没有产生 token 用量）"""
+        return self._served_from_cache
+
+    def run(self, message: Optional[Any] = None, *, stream: bool = False, **kwargs: Any) -> Any:
+        """运行 agent；开启响应缓存时，相同配置和输入的调用直接返回缓存结果
+
+        流式调用同样先查缓存：命中时把缓存的内容作为一个 token 块重放，
+        未命中时边转发边生成，完整读完后写入缓存（中途放弃的流不写入）。
+        """
+        self._served_from_cache = False
+        cache = self.response_cache
+        if set(kwargs) - STREAM_KWARGS or not cache.enabled:
+            return super().run(message, stream=stream, **kwargs)
+
+        key = cache_key(self.cache_fingerprint(), message)
+        cached = cache.get(key, agent=self.name or "")
+        if cached is not None:
+            self.run_response = cached
+            self._served_from_cache = True
+            return self._replay(cached) if stream else cached
+
+        if stream:
+            return self._stream_and_cache(key, message, **kwargs)
+        response = super().run(message)
+        cache.put(key, response, agent=self.name or "")
+        return response
+
+    def _replay(self, cached: RunResponse) -> Iterator[RunResponse]:
+        """以流式调用的形式返回缓存的响应"""
+        if isinstance(cached.content, str) and cached.content:
+            yield RunResponse(content=cached.content, model=cached.model, run_id=cached.run_id)
+
+    def _stream_and_cache(self, key: str, message: Optional[Any], **kwargs: Any) -> Iterator[RunResponse]:
+        yield from super().run(message, stream=True, **kwargs)
+        self.response_cache.put(key, self.run_response, agent=self.name or "")
+
+    @property
+    def supports_native_async(self) -> bool:
+        """模型是否实现了原生异步调用（Bedrock 目前只有同步客户端）"""
+        return self.model is not None and type(self.model).aresponse is not Model.aresponse
+
+    async def arun(self, message: Optional[Any] = None, *, stream: bool = False, **kwargs: Any) -> Any:
+        """异步运行；模型不支持原生异步时在线程中执行同步调用，避免阻塞事件循环"""
+        if self.supports_native_async:
+            return await super().arun(message, stream=stream, **kwargs)
+        if stream:
+            raise ValueError(f"Model {self.model.id} does not support async streaming")
+        return await asyncio.to_thread(self.run, message, **kwargs)
+
+    def reset_run_state(self) -> None:
+        """清空运行历史，使实例可以被下一次运行复用"""
+        if self.memory is not None:
+            self.memory.clear()
+        if self.model is not None:
+            self.model.metrics = {}
+            self.model.function_call_stack = None
+        self.run_id = None
+        self.run_input = None
+        self.run_response = RunResponse()
+        self._served_from_cache = False
+        self.images = None
+        self.videos = None
+        self.audio = None
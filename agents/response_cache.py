@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+from phi.agent import RunResponse
+from phi.utils.log import logger
+from utils.system_config import get_section, PROJECT_ROOT
+
+DEFAULT_CACHE_DIR = "tmp/response_cache"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 设置为 1/0 可在不修改配置文件的情况下开启/关闭缓存（例如 CI）
+CACHE_ENV_VAR = "NIMSHIP_RESPONSE_CACHE"
+
+
+def cache_key(fingerprint: Dict[str, Any], message: Any) -> str:
+    """由 agent 指纹（配置、模型、指令、工具）和序列化后的输入计算内容地址"""
+    payload = json.dumps({"agent": fingerprint, "input": message}, sort_keys=True, default=str,
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """磁盘上的 agent 响应缓存，按内容哈希寻址
+
+    每条响应一个 JSON 文件，读取时检查 TTL，写入后按最近访问时间淘汰直到
+    总大小不超过 max_bytes。统计信息按 agent 名称记录命中/未命中次数。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES, enabled: bool = True):
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(PROJECT_ROOT, cache_dir)
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._total_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _record(self, agent: str, outcome: str) -> None:
+        with self._lock:
+            counts = self.stats.setdefault(agent, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get(self, key: str, agent: str = "") -> Optional[RunResponse]:
+        """读取未过期的缓存响应，未命中返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._record(agent, "misses")
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            self._remove(path)
+            self._record(agent, "misses")
+            return None
+
+        # 更新访问时间，淘汰时按最近最少使用排序
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._record(agent, "hits")
+        logger.debug(f"Response cache hit for {agent}: {key[:12]}")
+        return RunResponse.model_validate(entry["response"])
+
+    def put(self, key: str, response: RunResponse, agent: str = "") -> None:
+        """写入一条响应；写入采用临时文件加重命名，并发读取不会看到半个文件"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({
+            "created_at": time.time(),
+            "agent": agent,
+            "response": response.model_dump(mode="json")
+        }, ensure_ascii=False, default=str)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += os.path.getsize(path) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        """返回 (路径, 修改时间, 大小) 列表"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _remove(self, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    def _evict(self) -> None:
+        """删除最久未访问的条目，直到总大小回到上限以内（调用方持有锁）"""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, _ in entries:
+            if total <= self.max_bytes:
+                break
+            total -= self._remove(path)
+        self._total_bytes = total
+        logger.debug(f"Response cache evicted down to {total} bytes")
+
+    def prune(self) -> int:
+        """删除所有已过期的条目，返回删除数量"""
+        removed = 0
+        for path, _, _ in self._entries():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    created_at = json.load(f).get("created_at", 0)
+            except (OSError, ValueError):
+                created_at = 0
+            if time.time() - created_at > self.ttl_seconds:
+                self._remove(path)
+                removed += 1
+        with self._lock:
+            self._total_bytes = None
+        return removed
+
+    def clear(self) -> None:
+        for path, _, _ in self._entries():
+            self._remove(path)
+        with self._lock:
+            self._total_bytes = 0
+            self.stats.clear()
+
+
+def cache_from_config() -> ResponseCache:
+    """根据 system.config.json 的 response_cache 节构建缓存，默认关闭"""
+    settings = get_section("response_cache")
+    enabled = bool(settings.get("enabled", False))
+    override = os.environ.get(CACHE_ENV_VAR)
+    if override is not None:
+        enabled = override.strip().lower() in ("1", "true", "yes", "on")
+    return ResponseCache(
+        cache_dir=settings.get("dir", DEFAULT_CACHE_DIR),
+        ttl_seconds=settings.get("ttl_seconds", DEFAULT_TTL_SECONDS),
+        max_bytes=settings.get("max_bytes", DEFAULT_MAX_BYTES),
+        enabled=enabled
+    )
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """进程内共享的默认响应缓存"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = cache_from_config()
+        return _default_cache
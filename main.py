@@ -2,21 +2,16 @@ import os
 import sys
 import json
 import time
-import logging
 from pathlib import Path  # Unused import
-from typing import List, Dict
-from workflows.workflow_controller import WorkflowController
-from workflows.models import WorkflowStateData
-
-# Configure logging
-logging.basicConfig(filename='workflow.log', level=logging.DEBUG, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-def load_system_config(config_file: str = "config/system.config.json") -> dict:
-    """加载系统配置"""
-    with open(config_file, 'r') as f:
-        return json.load(f)
+from typing import List, Dict, Iterator, TYPE_CHECKING
+from utils.system_config import load_system_config
+from utils.config_bundle import get_config_bundle
+from utils.log_utils import setup_logging
 
+# 控制器、phidata、boto3 等较重的依赖在实际运行 workflow 时才导入，
+# 这样 --help 和列出 workflow 不需要等待它们加载
+if TYPE_CHECKING:
+    from workflows.events import WorkflowEvent
 
 def get_input(prompt: str) -> str:
     """持续等待用户输入直到得到有效值"""
@@ -35,6 +30,14 @@ def parse_args():
     parser.add_argument('--workflow', type=str, help='Workflow name to run')
     parser.add_argument('--mode', choices=['cli', 'ui'], default='cli', help='Running mode')
     parser.add_argument('--silent', action='store_true', help='Run in silent mode')
+    parser.add_argument('--resume', type=str, metavar='SESSION_ID',
+                        help='Resume a session from its last checkpoint (requires --workflow)')
+    parser.add_argument('--batch', type=str, metavar='DIR|JSONL',
+                        help='Run every input in a directory of .json files or a .jsonl file (requires --workflow)')
+    parser.add_argument('--output', type=str, help='JSONL file for batch results')
+    parser.add_argument('--workers', type=int, help='Number of sessions run concurrently in batch mode')
+    parser.add_argument('--gc-blobs', action='store_true',
+                        help='Delete stored blobs no longer referenced by any session or checkpoint')
     return parser.parse_args()
 
 
@@ -45,15 +48,14 @@ def get_available_workflows(workflow_dir: str) -> List[Dict]:
         if file.endswith(".workflow.json"):
             workflow_path = os.path.join(workflow_dir, file)
             try:
-                with open(workflow_path, 'r') as f:
-                    config = json.load(f)
-                    workflows.append({
-                        'filename': file,
-                        'path': workflow_path,
-                        'name': config.get('name', ''),
-                        'description': config.get('description', ''),
-                        'agents': [agent['name'] for agent in config.get('agents', [])]
-                    })
+                config = get_config_bundle().load_json(workflow_path)
+                workflows.append({
+                    'filename': file,
+                    'path': workflow_path,
+                    'name': config.get('name', ''),
+                    'description': config.get('description', ''),
+                    'agents': [agent['name'] for agent in config.get('agents', [])]
+                })
             except Exception as e:
                 print(f"Error loading workflow {file}: {str(e)}")
     return workflows
@@ -75,52 +77,157 @@ def load_workflow_input(config_dir: str, input_file: str) -> dict:
         return json.load(f)
 
 
-def run_workflow(workflow_path: str, mode: str):
-    """运行workflow"""
+def run_workflow(workflow_path: str, mode: str, resume_session: str = None):
+    """运行workflow，指定 resume_session 时从该会话最后一个检查点继续"""
+    from workflows.workflow_controller import WorkflowController
+    from workflows.models import WorkflowStateData
+    from utils.metrics import recorder_from_config
+
     # 创建工作流实例 - 一次性完成所有初始化
     controller = WorkflowController(
         workflow_path=workflow_path,
-        session_id=f"session-{int(time.time())}"
+        session_id=resume_session or f"session-{int(time.time())}"
     )
+    print(f"Session: {controller.session_id}")
+    # 各阶段耗时与 token 用量写入日志目录下的 metrics.jsonl，结束时输出汇总表
+    controller.metrics = recorder_from_config(controller.session_id)
     
-    # 执行工作流程
-    workflow_states = [
-        ("requirement", "product_manager"),
-        ("technical", "tech_leader"),
-        ("development", "engineer"),
-        ("testing", "qa_engineer")
-    ]
-    
-    state_data = WorkflowStateData(**controller.input_data)
-    
-    for state, agent in workflow_states:
-        print(f"\n→ Transitioning to {state}")
-        print(f"→ Agent: {agent}")
-        
-        success = controller.try_transition(state, state_data.model_dump())
-        if not success:
+    def report(event: str, state: str, agent: str):
+        if event == "started":
+            print(f"\n→ Transitioning to {state}")
+            print(f"→ Agent: {agent}")
+        elif event == "completed":
+            print(f"✓ Completed state: {state}")
+        else:
             print(f"! Workflow stopped at {state}")
+
+    # 按状态依赖图执行工作流程，相互独立的分支并行运行
+    if resume_session:
+        if not controller.resume():
+            print(f"No checkpoint found for session: {resume_session}")
             return False
-            
-        print(f"✓ Completed state: {state}")
-        if controller.session_state.get("state_data"):
-            state_data = WorkflowStateData(**controller.session_state["state_data"])
+        print(f"Resuming from state: {controller.current_state}")
+        data = controller.session_state["state_data"]
+    else:
+        data = WorkflowStateData(**controller.input_data).model_dump()
+    if mode == "cli":
+        # CLI 模式流式输出：agent 生成的内容边生成边显示
+        succeeded = render_events(controller.stream_dag(data))
+    else:
+        succeeded = controller.run_dag(data, on_event=report)
+    print()
+    controller.metrics.render_summary()
+    print_cache_stats()
+    if not succeeded:
+        return False
     
     print("\n✓ Workflow completed successfully")
     return True
 
 
+def render_events(events: Iterator["WorkflowEvent"]) -> bool:
+    """在终端中渲染工作流事件流，返回工作流是否成功完成"""
+    from workflows.events import WorkflowEventType
+
+    streaming_state = None
+    succeeded = False
+    for event in events:
+        if event.event == WorkflowEventType.token:
+            if event.state != streaming_state:
+                # 并行分支的输出交错到达时，切换分支前先换行并标明来源
+                print(f"\n[{event.state}] ", end="", flush=True)
+                streaming_state = event.state
+            print(event.content, end="", flush=True)
+            continue
+
+        streaming_state = None
+        if event.event == WorkflowEventType.transition_started:
+            print(f"\n→ Transitioning to {event.state}")
+            print(f"→ Agent: {event.agent_id}")
+        elif event.event == WorkflowEventType.tool_call:
+            tool = (event.data or {}).get("tool_name", "tool")
+            print(f"\n  ⚙ {tool} {(event.data or {}).get('phase', '')}")
+        elif event.event == WorkflowEventType.transition_completed:
+            print(f"\n✓ Completed state: {event.state}")
+        elif event.event == WorkflowEventType.transition_failed:
+            print(f"\n! Workflow stopped at {event.state}")
+        elif event.event == WorkflowEventType.workflow_completed:
+            succeeded = bool((event.data or {}).get("success"))
+    return succeeded
+
+
+def run_batch_mode(workflow_path: str, source: str, output_path: str = None, workers: int = None):
+    """批量运行：所有输入共用同一个 workflow，结果逐条写入 JSONL"""
+    from workflows.batch_runner import load_batch_inputs, run_batch, DEFAULT_BATCH_WORKERS
+
+    if not os.path.exists(source):
+        print(f"Batch input not found: {source}")
+        return False
+    output_path = output_path or f"batch-results-{int(time.time())}.jsonl"
+    workers = workers or load_system_config().get("batch", {}).get("max_workers", DEFAULT_BATCH_WORKERS)
+
+    def report(record: Dict):
+        mark = "✓" if record["status"] == "success" else "!"
+        print(f"{mark} {record['input_id']}: {record['status']} ({record['duration_s']:.1f}s)")
+
+    print(f"Running batch from {source} with {workers} workers, results -> {output_path}")
+    summary = run_batch(workflow_path, load_batch_inputs(source), output_path, max_workers=workers,
+                        on_result=report)
+    print(f"\n{summary.format()}")
+    print_cache_stats()
+    return summary.failed == 0
+
+
+def collect_blobs():
+    """删除默认会话数据库中所有会话和检查点都不再引用的 blob"""
+    from sqlalchemy import create_engine
+    from utils.blob_store import get_blob_store
+    from workflows.checkpoint import referenced_blobs
+    from workflows.workflow_controller import DEFAULT_DB_FILE
+
+    if not os.path.exists(DEFAULT_DB_FILE):
+        print(f"Session database not found: {DEFAULT_DB_FILE}")
+        return False
+    store = get_blob_store()
+    result = store.collect(referenced_blobs(create_engine(f"sqlite:///{DEFAULT_DB_FILE}")))
+    print(f"Removed {result['removed']} unreferenced blobs ({result['bytes_freed']} bytes) from {store.root}")
+    return True
+
+
+def print_cache_stats():
+    """开启响应缓存时输出各 agent 的命中情况"""
+    from agents.response_cache import get_default_cache
+
+    cache = get_default_cache()
+    if not cache.enabled or not cache.stats:
+        return
+    print("\nResponse cache:")
+    for agent, counts in sorted(cache.stats.items()):
+        print(f"  {agent}: {counts['hits']} hits, {counts['misses']} misses")
+
+
 def main():
     args = parse_args()
+    # 日志经队列由后台线程写入轮转文件，见 system.config.json 的 logging 配置
+    setup_logging()
     
     # 加载系统配置
     system_config = load_system_config()
     workflow_dir = os.path.join(".", system_config['paths']['workflow_config_dir'])
     
+    if args.gc_blobs:
+        return collect_blobs()
+
+    if (args.resume or args.batch) and not args.workflow:
+        print("--resume and --batch require --workflow")
+        return False
+
     if args.workflow:
         workflow_path = os.path.join(workflow_dir, f"{args.workflow}.workflow.json")
         if os.path.exists(workflow_path):
-            return run_workflow(workflow_path, args.mode)
+            if args.batch:
+                return run_batch_mode(workflow_path, args.batch, args.output, args.workers)
+            return run_workflow(workflow_path, args.mode, resume_session=args.resume)
         else:
             print(f"Workflow not found: {args.workflow}")
             return False
@@ -0,0 +1,162 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+from phi.storage.workflow.sqlite import SqlWorkflowStorage
+from phi.utils.log import logger
+from agents.agent_pool import AgentPool
+from agents.base_agent import NimshipAgent
+from utils.blob_store import blob_store_from_config
+from utils.json_processor import JsonProcessor, available_backends
+from utils.system_config import PROJECT_ROOT
+from workflows.workflow_controller import WorkflowController
+from workflows.workflow_loader import WorkflowConfigLoader
+from tests.bench.harness import BenchResult, STATE_SIZES, make_state, measure
+from tests.bench.stub_model import StubModel
+
+AGENT_CONFIG = os.path.join(PROJECT_ROOT, "config", "agents", "product_manager.agent.json")
+FORMATTER_CONFIG = os.path.join(PROJECT_ROOT, "config", "agents", "formatter.agent.json")
+WORKFLOW_CONFIG = os.path.join(PROJECT_ROOT, "config", "workflows", "junior_developer.workflow.json")
+
+
+class StubAgentPool(AgentPool):
+    """Agent pool whose agents answer from StubModel instead of Bedrock.
+
+    Debug output, monitoring and telemetry are switched off so the numbers
+    measure the controller and phidata run loop rather than terminal or
+    network I/O.
+    """
+
+    def acquire(self, config_path: str) -> NimshipAgent:
+        agent = super().acquire(config_path)
+        if not isinstance(agent.model, StubModel):
+            agent.model = StubModel()
+            agent.debug_mode = False
+            agent.monitoring = False
+            agent.telemetry = False
+        return agent
+
+
+def _bench_workflow(workdir: str) -> str:
+    """Write a one-transition workflow whose agents use the repo's real agent configs"""
+    config = {
+        "name": "bench_workflow",
+        "description": "Single transition used by the controller benchmarks",
+        "input_file": "input.json",
+        "agents": [
+            {"id": "product_manager", "name": "Product Manager", "config_path": AGENT_CONFIG},
+            {"id": "formatter", "name": "Formatter Agent", "config_path": FORMATTER_CONFIG}
+        ],
+        "state_data": {
+            "init": {"required_fields": ["project_name"]},
+            "requirement": {"required_fields": ["project_name"]}
+        },
+        "initial_state": "init",
+        "transitions": [{"from_state": "init", "to_state": "requirement", "agent_id": "product_manager"}]
+    }
+    with open(os.path.join(workdir, "input.json"), "w") as f:
+        json.dump({"project_name": "Bench"}, f)
+    path = os.path.join(workdir, "bench.workflow.json")
+    with open(path, "w") as f:
+        json.dump(config, f)
+    return path
+
+
+def bench_config_load(min_time: float) -> List[BenchResult]:
+    loader = WorkflowConfigLoader(os.path.dirname(WORKFLOW_CONFIG))
+    return [measure("load_workflow", "-", lambda: loader.load_workflow(Path(WORKFLOW_CONFIG)), min_time=min_time)]
+
+
+def bench_agent_construction(min_time: float) -> List[BenchResult]:
+    return [measure("NimshipAgent()", "-", lambda: NimshipAgent(config_path=AGENT_CONFIG), min_time=min_time)]
+
+
+def bench_json_processor(size: str, state: Dict, min_time: float) -> List[BenchResult]:
+    update = {**make_state(STATE_SIZES["1KB"]), "content": {"summary": "new output", "extra": [1, 2, 3]}}
+    return [
+        measure("safe_serialize", size, lambda: JsonProcessor.safe_serialize(state), min_time=min_time),
+        measure("clean_content", size, lambda: JsonProcessor.clean_content(state), min_time=min_time),
+        measure("merge_content", size, lambda: JsonProcessor.merge_content(state, update), min_time=min_time),
+    ]
+
+
+def bench_json_backends(size: str, state: Dict, min_time: float) -> List[BenchResult]:
+    """Encode and decode the same state with every installed JSON backend"""
+    results = []
+    for name, backend_class in available_backends().items():
+        backend = backend_class()
+        text = backend.dumps(state)
+        results += [
+            measure(f"dumps[{name}]", size, lambda b=backend: b.dumps(state), min_time=min_time),
+            measure(f"loads[{name}]", size, lambda b=backend, t=text: b.loads(t), min_time=min_time),
+        ]
+    return results
+
+
+def bench_try_transition(size: str, state: Dict, workdir: str, min_time: float) -> List[BenchResult]:
+    storage = SqlWorkflowStorage(table_name=f"bench_{size}", db_file=os.path.join(workdir, "bench.db"))
+    controller = WorkflowController(workflow_path=_bench_workflow(workdir), session_id=f"bench-{size}",
+                                    storage=storage, agent_pool=StubAgentPool())
+    # Configured offload settings, but blobs go to the throwaway workdir instead of the project's storage
+    controller.blob_store = blob_store_from_config()
+    controller.blob_store.root = os.path.join(workdir, "blobs")
+    holder = {}
+
+    def setup():
+        controller.current_state = "init"
+        holder["data"] = dict(state)
+
+    def transition():
+        if not controller.try_transition("requirement", holder["data"]):
+            raise RuntimeError("benchmark transition failed")
+
+    return [measure("try_transition", size, transition, setup=setup, min_time=min_time)]
+
+
+# Modules whose cold import time is tracked: the CLI entry point and config validation
+IMPORT_TARGETS = ("main", "workflows.workflow_loader")
+
+
+def bench_imports(min_time: float) -> List[BenchResult]:
+    """Import each target in a fresh interpreter, so nothing is served from sys.modules"""
+    def cold_import(module: str) -> None:
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=PROJECT_ROOT, check=True)
+
+    return [measure(f"import {module}", "-", lambda m=module: cold_import(m), min_time=min_time)
+            for module in IMPORT_TARGETS]
+
+
+BENCH_GROUPS = ("import", "config", "agent", "json", "json_backends", "transition")
+
+
+def run_all(sizes: Optional[List[str]] = None, min_time: float = 0.3,
+            groups: Optional[List[str]] = None) -> List[BenchResult]:
+    """Run the suite, optionally restricted to some of BENCH_GROUPS and state sizes"""
+    sizes = sizes or list(STATE_SIZES)
+    groups = set(groups or BENCH_GROUPS)
+    # The controller logs every transition at INFO and phidata resets the level whenever an agent
+    # or workflow is built, so silence the logger outright to keep the console out of the measurement
+    logger.disabled = True
+    results: List[BenchResult] = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="nimship-bench-") as workdir:
+            if "import" in groups:
+                results += bench_imports(min_time)
+            if "config" in groups:
+                results += bench_config_load(min_time)
+            if "agent" in groups:
+                results += bench_agent_construction(min_time)
+            for size in sizes:
+                state = make_state(STATE_SIZES[size])
+                if "json" in groups:
+                    results += bench_json_processor(size, state, min_time)
+                if "json_backends" in groups:
+                    results += bench_json_backends(size, state, min_time)
+                if "transition" in groups:
+                    results += bench_try_transition(size, state, workdir, min_time)
+    finally:
+        logger.disabled = False
+    return results
@@ -0,0 +1,100 @@
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional
+
+# Accumulated state_data sizes the suite is run at
+STATE_SIZES = {
+    "1KB": 1024,
+    "100KB": 100 * 1024,
+    "1MB": 1024 * 1024,
+    "10MB": 10 * 1024 * 1024,
+}
+# Large states are split into artifacts of this size, like one document per agent output
+ARTIFACT_CHARS = 64 * 1024
+
+
+@dataclass
+class BenchResult:
+    name: str
+    size: str
+    iterations: int
+    ops_per_sec: float
+    mean_ms: float
+    # Allocation blocks still alive after one call and the peak traced memory during it
+    allocations: int
+    peak_kb: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def make_state(size_bytes: int) -> Dict[str, Any]:
+    """Build workflow state_data of roughly ``size_bytes``, shaped like accumulated agent outputs"""
+    state: Dict[str, Any] = {
+        "project_name": "Bench Project",
+        "project_description": "State used by the controller micro-benchmarks",
+        "user_stories": [f"As a user, I want feature {i}" for i in range(8)],
+        "acceptance_criteria": [f"Criterion {i} holds" for i in range(8)],
+        "status": "success",
+        "content": {"summary": "previous agent output", "format": "markdown"},
+    }
+    sentence = "## Section\nLorem ipsum dolor sit amet, consectetur adipiscing elit. "
+    artifact = sentence * (ARTIFACT_CHARS // len(sentence) + 1)
+    remaining = max(0, size_bytes - len(str(state)))
+    index = 0
+    while remaining > 0:
+        state[f"artifact_{index}"] = artifact[:min(ARTIFACT_CHARS, remaining)]
+        remaining -= ARTIFACT_CHARS
+        index += 1
+    return state
+
+
+def measure(name: str, size: str, fn: Callable[[], Any], setup: Optional[Callable[[], None]] = None,
+            min_time: float = 0.3, max_iterations: int = 100_000, warmup: int = 3) -> BenchResult:
+    """Run ``fn`` repeatedly for at least ``min_time`` seconds, then once more under tracemalloc.
+
+    ``setup`` runs before every call and is excluded from the timing. The first
+    ``warmup`` calls (stopping early once they take ``min_time``) are not timed,
+    so lazy imports, caches and connection setup do not skew the mean.
+    """
+    warmed = 0
+    started = time.perf_counter()
+    while warmed < warmup and time.perf_counter() - started < min_time:
+        if setup is not None:
+            setup()
+        fn()
+        warmed += 1
+
+    iterations = 0
+    elapsed = 0.0
+    gc.collect()
+    while elapsed < min_time and iterations < max_iterations:
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        elapsed += time.perf_counter() - started
+        iterations += 1
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return BenchResult(
+        name=name,
+        size=size,
+        iterations=iterations,
+        ops_per_sec=round(iterations / elapsed, 3) if elapsed else 0.0,
+        mean_ms=round(elapsed / iterations * 1000, 4) if iterations else 0.0,
+        allocations=allocations,
+        peak_kb=round(peak / 1024, 1),
+    )
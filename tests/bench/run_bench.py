@@ -0,0 +1,96 @@
+"""Controller micro-benchmarks against a stub model.
+
+Usage (from the project root):
+
+    python -m tests.bench.run_bench                      # run and compare with baseline.json
+    python -m tests.bench.run_bench --save-baseline      # record a new baseline
+    python -m tests.bench.run_bench --sizes 1KB,1MB --groups json,transition
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import json
+import platform
+from typing import Dict, List, Tuple
+from tests.bench.bench_controller import BENCH_GROUPS, run_all
+from tests.bench.harness import BenchResult, STATE_SIZES
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+
+
+def _key(result: Dict) -> Tuple[str, str]:
+    return result["name"], result["size"]
+
+
+def compare(results: List[BenchResult], baseline: Dict, tolerance: float) -> List[str]:
+    """Return a line for every benchmark whose throughput fell more than ``tolerance`` below baseline"""
+    previous = {_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get((result.name, result.size))
+        if not before or not before["ops_per_sec"]:
+            continue
+        ratio = result.ops_per_sec / before["ops_per_sec"]
+        if ratio < 1 - tolerance:
+            regressions.append(
+                f"{result.name} [{result.size}]: {result.ops_per_sec:.1f} ops/s vs {before['ops_per_sec']:.1f} "
+                f"({(ratio - 1) * 100:+.0f}%)"
+            )
+    return regressions
+
+
+def print_table(results: List[BenchResult], baseline: Dict) -> None:
+    previous = {_key(r): r for r in baseline.get("results", [])}
+    header = f"{'benchmark':<18}{'size':>7}{'ops/sec':>14}{'mean ms':>12}{'allocs':>10}{'peak KB':>11}{'vs base':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        before = previous.get((r.name, r.size))
+        change = f"{(r.ops_per_sec / before['ops_per_sec'] - 1) * 100:+.0f}%" if before and before["ops_per_sec"] else ""
+        print(f"{r.name:<18}{r.size:>7}{r.ops_per_sec:>14.1f}{r.mean_ms:>12.3f}{r.allocations:>10}"
+              f"{r.peak_kb:>11.1f}{change:>9}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Controller micro-benchmarks with a stub model")
+    parser.add_argument("--sizes", default=",".join(STATE_SIZES), help="Comma separated state sizes")
+    parser.add_argument("--groups", default=",".join(BENCH_GROUPS), help="Comma separated benchmark groups")
+    parser.add_argument("--min-time", type=float, default=0.3, help="Minimum seconds per benchmark")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed throughput drop before a benchmark counts as a regression")
+    args = parser.parse_args()
+
+    results = run_all(sizes=args.sizes.split(","), min_time=args.min_time, groups=args.groups.split(","))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": [r.to_dict() for r in results]
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import hashlib
+import json
+from typing import Iterator, List
+from phi.model.base import Model
+from phi.model.message import Message
+from phi.model.response import ModelResponse
+
+
+class StubModel(Model):
+    """Deterministic in-process model for benchmarks; never touches the network.
+
+    The reply is a JSON object derived from a hash of the last user message,
+    padded to ``response_chars``, so identical inputs give identical outputs.
+    """
+
+    id: str = "stub-model"
+    name: str = "StubModel"
+    provider: str = "Stub"
+    response_chars: int = 512
+
+    def _reply(self, messages: List[Message]) -> str:
+        last = next((m for m in reversed(messages) if m.role == "user"), None)
+        text = last.get_content_string() if last is not None else ""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return json.dumps({
+            "summary": f"stub reply {digest[:16]}",
+            "details": (digest * (self.response_chars // len(digest) + 1))[:self.response_chars]
+        })
+
+    def invoke(self, messages: List[Message]) -> str:
+        """The full reply text, as a provider client would return it"""
+        return self._reply(messages)
+
+    def invoke_stream(self, messages: List[Message]) -> Iterator[str]:
+        """The reply in 64-character chunks"""
+        content = self._reply(messages)
+        for start in range(0, len(content), 64):
+            yield content[start:start + 64]
+
+    def response(self, messages: List[Message]) -> ModelResponse:
+        content = self.invoke(messages)
+        input_chars = sum(len(m.get_content_string()) for m in messages)
+        messages.append(Message(role="assistant", content=content, metrics={
+            "input_tokens": input_chars // 4,
+            "output_tokens": len(content) // 4
+        }))
+        return ModelResponse(content=content)
+
+    def response_stream(self, messages: List[Message]) -> Iterator[ModelResponse]:
+        chunks = list(self.invoke_stream(messages))
+        messages.append(Message(role="assistant", content="".join(chunks)))
+        for chunk in chunks:
+            yield ModelResponse(content=chunk)
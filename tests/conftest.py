@@ -0,0 +1,186 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import re
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+from phi.agent import RunResponse
+from phi.run.response import RunEvent
+from phi.storage.workflow.sqlite import SqlWorkflowStorage
+from utils import config_bundle
+from workflows.workflow_controller import WorkflowController
+
+WORKFLOW_DIR = Path(__file__).resolve().parent.parent / "config" / "workflows"
+AGENT_IDS = ("product_manager", "engineer", "qa_engineer", "tech_leader", "formatter")
+
+
+def workflow_config(transitions, name="test_workflow", required_fields=("project_name",)):
+    """Minimal workflow config whose states are the ones the transitions mention"""
+    states = ["init"]
+    for transition in transitions:
+        for state in (transition["from_state"], transition["to_state"]):
+            if state not in states:
+                states.append(state)
+    return {
+        "name": name,
+        "description": f"{name} used by the tests",
+        "input_file": "input.json",
+        "agents": [
+            {"id": agent_id, "name": agent_id, "config_path": f"{agent_id}.agent.json"}
+            for agent_id in AGENT_IDS
+        ],
+        "state_data": {state: {"required_fields": list(required_fields)} for state in states},
+        "initial_state": "init",
+        "transitions": [dict(transition) for transition in transitions]
+    }
+
+
+def chain(*states):
+    """Transitions that walk through states one after another, each run by the given agent
+
+    Each argument is a ``(state, agent_id)`` pair; the first transition starts from init.
+    """
+    transitions, previous = [], "init"
+    for state, agent_id in states:
+        transitions.append({"from_state": previous, "to_state": state, "agent_id": agent_id})
+        previous = state
+    return transitions
+
+
+class StubAgent:
+    """Pooled agent stand-in that answers from its pool's script instead of calling a model
+
+    Streams like phidata's ``Agent.run(stream=True)``: the shared run_response is
+    yielded once per chunk and only holds the full answer after the last one.
+    """
+
+    def __init__(self, agent_id, pool):
+        self.agent_id = agent_id
+        self.pool = pool
+        self.model = SimpleNamespace(id=pool.model_id, close_stream=pool.close_stream)
+        self.run_response = RunResponse()
+        self.served_from_cache = pool.cached
+
+    def _answer(self, message):
+        self.pool.calls.append(self.agent_id)
+        content = message.get("content") if isinstance(message, dict) else message
+        try:
+            self.pool.sent.append(json.loads(content))
+        except (TypeError, ValueError):
+            self.pool.sent.append(content)
+        answer = self.pool.answers.get(self.agent_id, f"{self.agent_id} is done")
+        return re.split(r"(?<=\s)(?=\S)", answer) if isinstance(answer, str) else list(answer)
+
+    def _response(self, content):
+        return RunResponse(content=content, model=self.pool.model_id, metrics=dict(self.pool.metrics))
+
+    def run(self, message=None, stream=False, stream_intermediate_steps=False):
+        chunks = self._answer(message)
+        if not stream:
+            return self._response("".join(chunks))
+
+        def generate():
+            if self.pool.tool_calls:
+                self.run_response.tools = [{"tool_name": "search", "tool_args": {"q": self.agent_id}}]
+                yield RunResponse(content="search(...)", event=RunEvent.tool_call_started.value)
+            for chunk in chunks:
+                self.pool.streamed += 1
+                self.run_response.content = chunk
+                yield self.run_response
+            self.run_response.content = "".join(chunks)
+        return generate()
+
+    async def arun(self, message=None):
+        pool = self.pool
+        pool.active += 1
+        pool.peak = max(pool.peak, pool.active)
+        await asyncio.sleep(pool.delay)
+        pool.active -= 1
+        return self._response("".join(self._answer(message)))
+
+
+class StubPool:
+    """Agent pool that hands out StubAgents and records what they were asked
+
+    ``answers`` maps agent ids to their answer, either a string (streamed word
+    by word) or an explicit list of chunks; unlisted agents answer
+    "<agent_id> is done"; with ``cached`` every answer reports itself as a
+    response cache hit. ``calls`` and ``sent`` record who was called and the
+    decoded message they received; ``streamed`` counts chunks actually
+    generated, ``closed_streams`` the model streams closed early and ``peak``
+    the most agents running at once in ``arun``.
+    """
+
+    def __init__(self, answers=None, model_id="stub-model", metrics=None, tool_calls=False, delay=0.0,
+                 cached=False):
+        self.answers = answers or {}
+        self.model_id = model_id
+        self.metrics = metrics or {}
+        self.tool_calls = tool_calls
+        self.cached = cached
+        self.delay = delay
+        self.calls = []
+        self.sent = []
+        self.streamed = 0
+        self.closed_streams = 0
+        self.active = 0
+        self.peak = 0
+
+    def close_stream(self):
+        self.closed_streams += 1
+
+    def acquire(self, config_path):
+        return StubAgent(os.path.basename(config_path).split(".")[0], self)
+
+    def release(self, agent):
+        pass
+
+    def discard(self, agent):
+        pass
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_config_bundle():
+    """Keep the configs tests write under tmp_path out of the project's on-disk config bundle
+
+    Session scoped so it is in place before module and class fixtures build agents.
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv(config_bundle.BUNDLE_ENV_VAR, "0")
+        patch.setattr(config_bundle, "_default_bundle", None)
+        yield
+
+
+@pytest.fixture
+def make_workflow(tmp_path):
+    """Write a workflow config (or the transitions of one) and its input file, return the path"""
+    def build(config, input_data=None):
+        if isinstance(config, list):
+            config = workflow_config(config)
+        (tmp_path / "input.json").write_text(json.dumps(input_data or {"project_name": "Demo"}))
+        path = tmp_path / f"{config['name']}.workflow.json"
+        path.write_text(json.dumps(config))
+        return str(path)
+    return build
+
+
+@pytest.fixture
+def junior_workflow(make_workflow):
+    """Copy of the shipped junior_developer workflow that reads its input from the test directory"""
+    config = json.loads((WORKFLOW_DIR / "junior_developer.workflow.json").read_text())
+    config["input_file"] = "input.json"
+    return make_workflow(config)
+
+
+@pytest.fixture
+def make_controller(tmp_path):
+    """Build controllers that share one SQLite database under tmp_path"""
+    def build(workflow_path, session_id="test-session", agent_pool=None):
+        storage = SqlWorkflowStorage(table_name="test_workflows", db_file=str(tmp_path / "workflows.db"))
+        return WorkflowController(workflow_path=workflow_path, session_id=session_id, storage=storage,
+                                  agent_pool=agent_pool)
+    return build
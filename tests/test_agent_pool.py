@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pytest
+from phi.model.message import Message
+from agents.agent_pool import AgentPool
+
+
+def write_agent_config(path, model_name="anthropic.claude-3-haiku-20240307-v1:0"):
+    with open(path, "w") as f:
+        json.dump({
+            "name": "Pool Test Agent",
+            "description": "Agent used by pool tests",
+            "model": {"type": "bedrock", "name": model_name},
+            "instructions": ["Answer briefly"],
+            "tools": []
+        }, f)
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "pool_test.agent.json"
+    write_agent_config(path)
+    return str(path)
+
+
+def test_release_reuses_instance(config_path):
+    pool = AgentPool(max_size=4)
+    agent = pool.acquire(config_path)
+    pool.release(agent)
+
+    assert pool.acquire(config_path) is agent
+    assert pool.stats == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_leased_instances_are_exclusive(config_path):
+    pool = AgentPool(max_size=4)
+    first = pool.acquire(config_path)
+    second = pool.acquire(config_path)
+    assert first is not second
+
+
+def test_release_resets_history(config_path):
+    pool = AgentPool(max_size=4)
+    with pool.lease(config_path) as agent:
+        agent.memory.add_message(Message(role="user", content="hello"))
+        agent.run_id = "run-1"
+
+    agent = pool.acquire(config_path)
+    assert agent.memory.messages == []
+    assert agent.run_id is None
+
+
+def test_config_change_invalidates_idle_agents(config_path):
+    pool = AgentPool(max_size=4)
+    agent = pool.acquire(config_path)
+    pool.release(agent)
+
+    write_agent_config(config_path, model_name="anthropic.claude-3-sonnet-20240229-v1:0")
+    stat = os.stat(config_path)
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    fresh = pool.acquire(config_path)
+    assert fresh is not agent
+    assert fresh.model.id == "anthropic.claude-3-sonnet-20240229-v1:0"
+    assert pool.idle_count() == 0
+
+
+def test_lru_eviction(tmp_path):
+    pool = AgentPool(max_size=1)
+    paths = []
+    for name in ("a", "b"):
+        path = tmp_path / f"{name}.agent.json"
+        write_agent_config(path)
+        paths.append(str(path))
+
+    first = pool.acquire(paths[0])
+    second = pool.acquire(paths[1])
+    pool.release(first)
+    pool.release(second)
+
+    assert pool.idle_count() == 1
+    assert pool.stats["evictions"] == 1
+    assert pool.acquire(paths[1]) is second
+
+
+def test_lease_discards_on_error(config_path):
+    pool = AgentPool(max_size=4)
+    with pytest.raises(RuntimeError):
+        with pool.lease(config_path):
+            raise RuntimeError("boom")
+    assert pool.idle_count() == 0
@@ -0,0 +1,115 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import threading
+import pytest
+from phi.agent import RunResponse
+from agents.base_agent import NimshipAgent
+from utils.blob_store import BlobStore
+from utils.concurrency import ModelConcurrencyLimiter
+from workflows.checkpoint import CheckpointStore
+from tests.conftest import StubPool
+
+# Two independent branches joined by a final state
+TRANSITIONS = [
+    {"from_state": "init", "to_state": "requirement", "agent_id": "product_manager"},
+    {"from_state": "requirement", "to_state": "development", "agent_id": "engineer"},
+    {"from_state": "requirement", "to_state": "test_planning", "agent_id": "qa_engineer"},
+    {"from_state": "development", "to_state": "testing", "agent_id": "qa_engineer"},
+    {"from_state": "test_planning", "to_state": "testing", "agent_id": "qa_engineer"}
+]
+
+
+@pytest.fixture
+def make_async_controller(make_workflow, make_controller):
+    workflow_path = make_workflow(TRANSITIONS)
+
+    def build(session_id, pool, limiter):
+        controller = make_controller(workflow_path, session_id, agent_pool=pool)
+        controller.concurrency_limiter = limiter
+        return controller
+    return build
+
+
+def test_atry_transition(make_async_controller):
+    controller = make_async_controller("async-single", StubPool(delay=0.01), ModelConcurrencyLimiter())
+
+    assert asyncio.run(controller.atry_transition("requirement", dict(controller.input_data)))
+    assert controller.current_state == "requirement"
+    assert controller.session_state["state_data"]["status"] == "success"
+    assert not asyncio.run(controller.atry_transition("init", {}))
+
+
+def test_many_sessions_share_loop_with_model_limit(make_async_controller):
+    pool = StubPool(delay=0.01)
+    limiter = ModelConcurrencyLimiter(limits={"stub-model": 3})
+    controllers = [make_async_controller(f"async-{i}", pool, limiter) for i in range(20)]
+
+    async def run_all():
+        return await asyncio.gather(*(c.arun() for c in controllers))
+
+    results = asyncio.run(run_all())
+
+    assert all(results)
+    assert len(pool.calls) == 20 * 4
+    assert pool.peak == 3
+    assert all(c.current_state == "testing" for c in controllers)
+
+
+def test_limiter_slot_uses_the_model_the_router_will_call(make_async_controller):
+    pool = StubPool(delay=0.01)
+    acquire = pool.acquire
+
+    def routed(config_path):
+        agent = acquire(config_path)
+        agent.model.next_model_id = "fast-model"
+        return agent
+
+    pool.acquire = routed
+    limiter = ModelConcurrencyLimiter(limits={"fast-model": 1})
+    controllers = [make_async_controller(f"async-routed-{i}", pool, limiter) for i in range(3)]
+
+    async def run_all():
+        return await asyncio.gather(*(c.arun() for c in controllers))
+
+    assert all(asyncio.run(run_all()))
+    assert pool.peak == 1
+
+
+def test_blocking_work_stays_off_the_event_loop(make_async_controller, monkeypatch, tmp_path):
+    pool = StubPool(answers={"product_manager": "x" * 20_000})
+    controller = make_async_controller("async-offloop", pool, ModelConcurrencyLimiter())
+    controller.blob_store = BlobStore(root=str(tmp_path / "blobs"), threshold_bytes=1024)
+    on_loop = []
+
+    def recording(name, original):
+        def wrapper(*args, **kwargs):
+            on_loop.append((name, threading.current_thread() is threading.main_thread()))
+            return original(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(pool, "acquire", recording("acquire", pool.acquire))
+    monkeypatch.setattr(BlobStore, "put", recording("put", BlobStore.put))
+    monkeypatch.setattr(CheckpointStore, "save", recording("save", CheckpointStore.save))
+
+    assert asyncio.run(controller.arun())
+    assert {name for name, _ in on_loop} == {"acquire", "put", "save"}
+    assert not any(loop_thread for _, loop_thread in on_loop)
+
+
+def test_nimship_agent_arun_falls_back_to_thread(tmp_path, monkeypatch):
+    config_path = tmp_path / "threaded.agent.json"
+    config_path.write_text(json.dumps({
+        "name": "Threaded",
+        "description": "Bedrock agent without native async",
+        "model": {"type": "bedrock", "name": "anthropic.claude-3-haiku-20240307-v1:0"},
+        "tools": []
+    }))
+    agent = NimshipAgent(config_path=str(config_path))
+    monkeypatch.setattr(NimshipAgent, "run", lambda self, message=None, **kwargs: RunResponse(content=message))
+
+    assert not agent.supports_native_async
+    assert asyncio.run(agent.arun("hello")).content == "hello"
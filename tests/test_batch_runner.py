@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import threading
+import time
+from workflows.batch_runner import load_batch_inputs, run_batch
+from workflows.workflow_controller import WorkflowController
+from tests.conftest import chain
+
+
+def test_load_inputs_from_dir_and_jsonl(tmp_path):
+    briefs = tmp_path / "briefs"
+    briefs.mkdir()
+    (briefs / "b.json").write_text(json.dumps({"project_name": "B"}))
+    (briefs / "a.json").write_text(json.dumps({"project_name": "A"}))
+    (briefs / "notes.txt").write_text("ignored")
+    jsonl = tmp_path / "briefs.jsonl"
+    jsonl.write_text('{"id": "x", "project_name": "X"}\n\n{"project_name": "Y"}\n')
+
+    assert [i for i, _ in load_batch_inputs(str(briefs))] == ["a", "b"]
+    assert list(load_batch_inputs(str(jsonl))) == [("x", {"project_name": "X"}), ("3", {"project_name": "Y"})]
+
+
+def test_batch_runs_sessions_concurrently(tmp_path, make_workflow, make_controller, monkeypatch):
+    workflow_path = make_workflow(chain(("requirement", "product_manager"), ("development", "engineer")))
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fake_execute(self, agent_id, task_data, state=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        status = "error" if task_data["project_name"] == "Broken" else "success"
+        return {**task_data, "status": status}
+
+    monkeypatch.setattr(WorkflowController, "execute_agent_task", fake_execute)
+    inputs = [(f"p{i}", {"project_name": f"Project {i}", "project_description": "brief"}) for i in range(6)]
+    inputs.append(("broken", {"project_name": "Broken", "project_description": "brief"}))
+    output = tmp_path / "out" / "results.jsonl"
+
+    summary = run_batch(workflow_path, iter(inputs), str(output), max_workers=4, make_controller=make_controller)
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert summary.total == len(records) == 7
+    assert summary.succeeded == 6 and summary.failed == 1
+    assert peak[0] > 1
+    by_id = {r["input_id"]: r for r in records}
+    assert by_id["p0"]["final_state"] == "development"
+    assert by_id["broken"]["status"] == "failed"
+    assert "sessions/min" in summary.format()
@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.bench.bench_controller import run_all
+from tests.bench.harness import BenchResult
+from tests.bench.run_bench import compare
+
+
+def test_bench_suite_runs_at_smallest_size():
+    results = run_all(sizes=["1KB"], min_time=0.01)
+
+    names = {r.name for r in results}
+    assert {"load_workflow", "NimshipAgent()", "safe_serialize", "clean_content", "merge_content",
+            "try_transition"} <= names
+    assert all(r.iterations >= 1 and r.ops_per_sec > 0 for r in results)
+
+
+def test_compare_flags_throughput_drops():
+    baseline = {"results": [
+        {"name": "try_transition", "size": "1KB", "ops_per_sec": 100.0},
+        {"name": "safe_serialize", "size": "1KB", "ops_per_sec": 100.0},
+    ]}
+    results = [
+        BenchResult("try_transition", "1KB", 10, 60.0, 16.6, 0, 0.0),
+        BenchResult("safe_serialize", "1KB", 10, 90.0, 11.1, 0, 0.0),
+        BenchResult("merge_content", "1KB", 10, 1.0, 1000.0, 0, 0.0),
+    ]
+
+    regressions = compare(results, baseline, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("try_transition [1KB]")
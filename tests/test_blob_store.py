@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+from utils.blob_store import BlobStore, is_blob_ref
+from workflows.checkpoint import referenced_blobs
+from tests.conftest import StubPool
+
+
+def test_large_values_become_lazy_references(tmp_path):
+    store = BlobStore(root=str(tmp_path / "blobs"), threshold_bytes=1024)
+    design = {"modules": [f"module_{i}" for i in range(500)]}
+
+    ref = store.offload(design)
+    assert is_blob_ref(ref) and ref["type"] == "object" and ref["preview"] == ["modules"]
+    assert len(json.dumps(ref)) < 200
+    assert store.offload("short") == "short" and store.offload(ref) is ref
+    assert store.offload(dict(design)) == ref and store.stats["deduplicated"] == 1
+    # Stored compressed, named by the hash of the serialized value
+    path = tmp_path / "blobs" / ref["$blob"][:2] / f"{ref['$blob']}.json.z"
+    assert path.stat().st_size < ref["size"]
+
+    state = store.offload_fields({"project_name": "Demo", "technical_design": design})
+    assert state["project_name"] == "Demo" and is_blob_ref(state["technical_design"])
+    assert store.resolve_fields(state) == {"project_name": "Demo", "technical_design": design}
+    assert store.resolve_fields(state, ["project_name"])["technical_design"] is state["technical_design"]
+    assert BlobStore(root=str(tmp_path / "off"), enabled=False).offload("x" * 100_000) == "x" * 100_000
+
+
+def test_collect_removes_old_unreferenced_blobs(tmp_path):
+    store = BlobStore(root=str(tmp_path / "blobs"), threshold_bytes=16)
+    kept, orphan, fresh = (store.offload(text * 100) for text in ("kept", "orphan", "fresh"))
+    paths = {name: tmp_path / "blobs" / ref["$blob"][:2] / f"{ref['$blob']}.json.z"
+             for name, ref in (("kept", kept), ("orphan", orphan), ("fresh", fresh))}
+    for name in ("kept", "orphan"):
+        os.utime(paths[name], (0, 0))
+
+    result = store.collect([kept["$blob"]], min_age_seconds=3600)
+    assert result["removed"] == 1 and not paths["orphan"].exists()
+    assert paths["kept"].exists() and paths["fresh"].exists()
+
+    # Offloading the same value again counts as a fresh write
+    os.utime(paths["fresh"], (0, 0))
+    store.offload("fresh" * 100)
+    assert store.collect([], min_age_seconds=3600)["removed"] == 1 and paths["fresh"].exists()
+
+
+def test_controller_offloads_and_resolves_on_demand(tmp_path, junior_workflow, make_controller):
+    pool = StubPool()
+    controller = make_controller(junior_workflow, "blob-test", agent_pool=pool)
+    controller.blob_store = BlobStore(root=str(tmp_path / "blobs"), threshold_bytes=4096)
+    controller.current_state = "development"
+
+    plan = "x" * 40_000
+    assert controller.try_transition("testing", {
+        "project_name": "Demo", "project_description": "d", "user_stories": ["story"],
+        "acceptance_criteria": ["works"], "technical_design": "design", "implementation_plan": plan,
+        "code_complete": True, "unit_tests": "tests", "test_results": "pass", "bug_report": "none",
+        "final_report": "done"
+    })
+    state = controller.session_state["state_data"]
+    assert is_blob_ref(state["implementation_plan"])
+    assert pool.sent[0]["omitted_fields"]["implementation_plan"].startswith("text, 40000 chars: xxx")
+    checkpoint = controller.checkpoint_store.table.select()
+    with controller.storage.db_engine.connect() as conn:
+        assert max(len(row.state_data) for row in conn.execute(checkpoint)) < 4096
+
+    # The next transition lists implementation_plan in its inputs, so its agent gets the full text
+    assert controller.try_transition("completed", dict(state))
+    assert pool.sent[1]["implementation_plan"] == plan
+
+    # Blobs the session or its checkpoints still reference survive a sweep
+    orphan = controller.blob_store.offload("y" * 40_000)
+
+    def blob_files():
+        return sorted(path.name for path in (tmp_path / "blobs").rglob("*.json.z"))
+
+    assert len(blob_files()) == 2
+    assert state["implementation_plan"]["$blob"] in referenced_blobs(controller.storage.db_engine)
+    assert controller.collect_blobs(min_age_seconds=0)["removed"] == 1
+    assert blob_files() == [f"{state['implementation_plan']['$blob']}.json.z"]
+    assert orphan["$blob"] not in referenced_blobs(controller.storage.db_engine)
@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phi.storage.workflow.sqlite import SqlWorkflowStorage
+from workflows.checkpoint import CheckpointStore
+from workflows.workflow_controller import WorkflowController
+from tests.conftest import chain
+
+TRANSITIONS = chain(("requirement", "product_manager"), ("development", "engineer"), ("testing", "qa_engineer"))
+
+
+def test_store_appends_in_order(tmp_path):
+    storage = SqlWorkflowStorage(table_name="store_test", db_file=str(tmp_path / "store.db"))
+    store = CheckpointStore(storage.db_engine, table_name="store_test_checkpoints")
+
+    assert store.latest("s1") is None
+    store.save("s1", "init", "requirement", "product_manager", {"a": 1}, ["requirement"], output_ref="run-1")
+    seq = store.save("s1", "requirement", "development", "engineer", {"a": 2}, ["requirement", "development"])
+    store.save("s2", "init", "requirement", "product_manager", {"b": 1}, ["requirement"])
+
+    latest = store.latest("s1")
+    assert seq == 2
+    assert latest.seq == 2
+    assert latest.state_data == {"a": 2}
+    assert latest.completed_states == ["requirement", "development"]
+    assert [c.to_state for c in store.history("s1")] == ["requirement", "development"]
+    assert store.history("s1")[0].output_ref == "run-1"
+
+
+def test_resume_skips_completed_states(make_workflow, make_controller, monkeypatch):
+    workflow_path = make_workflow(TRANSITIONS)
+    calls = []
+
+    def failing_execute(self, agent_id, task_data, state=None):
+        calls.append(agent_id)
+        status = "error" if agent_id == "qa_engineer" else "success"
+        return {**task_data, f"{agent_id}_output": state, "status": status}
+
+    monkeypatch.setattr(WorkflowController, "execute_agent_task", failing_execute)
+    first = make_controller(workflow_path, "resume-session")
+    assert not first.run_dag(dict(first.input_data))
+    assert calls == ["product_manager", "engineer", "qa_engineer"]
+
+    # A fresh process: nothing in memory, everything comes from the checkpoint table
+    calls.clear()
+    monkeypatch.setattr(
+        WorkflowController, "execute_agent_task",
+        lambda self, agent_id, task_data, state=None: calls.append(agent_id) or {**task_data, "status": "success"}
+    )
+    resumed = make_controller(workflow_path, "resume-session")
+    assert resumed.resume()
+    assert resumed.current_state == "development"
+    assert resumed.session_state["state_data"]["engineer_output"] == "requirement"
+
+    assert resumed.run_dag(resumed.session_state["state_data"])
+    assert calls == ["qa_engineer"]
+    assert resumed.current_state == "testing"
+    assert len(resumed.checkpoint_store.history("resume-session")) == 3
+
+
+def test_resume_without_checkpoint(make_workflow, make_controller):
+    controller = make_controller(make_workflow(TRANSITIONS), "never-ran")
+    assert not controller.resume()
+    assert controller.current_state == "init"
+
+
+def test_deltas_between_snapshots(tmp_path):
+    storage = SqlWorkflowStorage(table_name="delta_test", db_file=str(tmp_path / "delta.db"))
+    store = CheckpointStore(storage.db_engine, table_name="delta_test_checkpoints", snapshot_interval=3)
+    design = {"modules": ["api", "db"] * 500}
+    states = [{"project_name": "Demo", "technical_design": design}]
+    states.append({**states[-1], "code": "print()"})
+    states.append({**states[-1], "code": "print('hi')", "review": "ok"})
+    states.append({key: value for key, value in states[-1].items() if key != "review"})
+    for step, state in enumerate(states):
+        store.save("s1", None, f"step{step}", "engineer", state, [], duration=0.5)
+
+    history = store.history("s1")
+    assert [c.kind for c in history] == ["snapshot", "delta", "delta", "snapshot"]
+    assert history[2].changes == {"set": {"code": "print('hi')", "review": "ok"}, "removed": []}
+    assert history[3].changes == {"set": {}, "removed": ["review"]}
+    assert [c.state_data for c in history] == states and history[1].duration == 0.5
+    assert store.state_at("s1", 3) == states[2] and store.state_at("s1", 9) is None
+
+    # Delta rows hold only the changed fields
+    with storage.db_engine.connect() as conn:
+        sizes = [len(row.state_data) for row in conn.execute(store.table.select().order_by(store.table.c.seq))]
+    assert sizes[1] < sizes[0] // 10
+
+    # A second store (a resumed process) continues the chain from the database
+    resumed = CheckpointStore(storage.db_engine, table_name="delta_test_checkpoints", snapshot_interval=3)
+    resumed.save("s1", None, "step4", "engineer", {**states[-1], "tests": "passed"}, [])
+    assert resumed.latest("s1").changes == {"set": {"tests": "passed"}, "removed": []}
+    assert resumed.latest("s1").state_data == {**states[-1], "tests": "passed"}
@@ -0,0 +1,128 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+from pathlib import Path
+from agents.agent_pool import AgentPool
+from utils.config_bundle import ConfigBundle, get_config_bundle
+from workflows import workflow_loader
+from workflows.workflow_loader import WorkflowConfigLoader
+
+WORKFLOW_PATH = Path(__file__).resolve().parent.parent / "config" / "workflows" / "junior_developer.workflow.json"
+
+
+def test_unchanged_file_is_parsed_once(tmp_path):
+    path = tmp_path / "a.agent.json"
+    path.write_text(json.dumps({"name": "A"}))
+    bundle = ConfigBundle()
+
+    assert bundle.load_json(str(path)) == {"name": "A"}
+    assert bundle.load_json(str(path)) is bundle.load_json(str(path))
+    assert bundle.stats == {"hits": 2, "misses": 1, "rehashed": 0}
+
+    # Touching the file without changing it only costs a hash
+    os.utime(path, ns=(0, 0))
+    bundle.load_json(str(path))
+    assert bundle.stats["rehashed"] == 1
+
+    path.write_text(json.dumps({"name": "Changed"}))
+    assert bundle.load_json(str(path)) == {"name": "Changed"}
+    assert bundle.stats["misses"] == 2
+
+
+def test_bundle_persists_between_processes(tmp_path):
+    path = tmp_path / "a.agent.json"
+    path.write_text(json.dumps({"name": "A"}))
+    bundle_file = str(tmp_path / "cache" / "bundle.pickle")
+
+    first = ConfigBundle(bundle_file)
+    first.load_json(str(path))
+    first.save()
+
+    second = ConfigBundle(bundle_file)
+    assert second.load_json(str(path)) == {"name": "A"}
+    assert second.stats == {"hits": 1, "misses": 0, "rehashed": 0}
+
+
+def test_save_drops_deleted_files(tmp_path):
+    kept, deleted = tmp_path / "kept.agent.json", tmp_path / "deleted.agent.json"
+    kept.write_text(json.dumps({"name": "Kept"}))
+    deleted.write_text(json.dumps({"name": "Deleted"}))
+    bundle_file = str(tmp_path / "bundle.pickle")
+
+    first = ConfigBundle(bundle_file)
+    first.load_json(str(kept))
+    first.derive(str(deleted), "name", lambda config: config["name"], persist=True)
+    first.save()
+    deleted.unlink()
+    first.save()
+
+    second = ConfigBundle(bundle_file)
+    assert set(second._entries) == {str(kept)}
+    assert second._persisted == {}
+
+
+def test_default_bundle_is_kept_out_of_the_project(tmp_path):
+    assert get_config_bundle().bundle_file is None
+
+
+def test_corrupt_bundle_is_ignored(tmp_path):
+    bundle_file = tmp_path / "bundle.pickle"
+    bundle_file.write_bytes(b"not a pickle")
+    path = tmp_path / "a.agent.json"
+    path.write_text("{}")
+
+    assert ConfigBundle(str(bundle_file)).load_json(str(path)) == {}
+
+
+def test_loader_reuses_compiled_workflow():
+    loader = WorkflowConfigLoader(str(WORKFLOW_PATH.parent), bundle=ConfigBundle())
+
+    assert loader.load_workflow(WORKFLOW_PATH) is loader.load_workflow(WORKFLOW_PATH)
+
+
+def test_compiled_workflow_persists_between_processes(tmp_path, monkeypatch):
+    bundle_file = str(tmp_path / "bundle.pickle")
+    first = ConfigBundle(bundle_file)
+    compiled = WorkflowConfigLoader(str(WORKFLOW_PATH.parent), bundle=first).load_workflow(WORKFLOW_PATH)
+    first.save()
+
+    def recompile(*args):
+        raise AssertionError("workflow was compiled again")
+
+    monkeypatch.setattr(WorkflowConfigLoader, "_compile", recompile)
+    loaded = WorkflowConfigLoader(str(WORKFLOW_PATH.parent), bundle=ConfigBundle(bundle_file)).load_workflow(WORKFLOW_PATH)
+    assert loaded is not compiled
+    assert dict(loaded) == dict(compiled) and loaded.edges == compiled.edges
+
+
+def test_compiler_change_invalidates_persisted_workflow(tmp_path, monkeypatch):
+    bundle_file = str(tmp_path / "bundle.pickle")
+    first = ConfigBundle(bundle_file)
+    WorkflowConfigLoader(str(WORKFLOW_PATH.parent), bundle=first).load_workflow(WORKFLOW_PATH)
+    first.save()
+
+    compiled = []
+    original = WorkflowConfigLoader._compile
+
+    def recording(self, *args):
+        compiled.append(args)
+        return original(self, *args)
+
+    monkeypatch.setattr(workflow_loader, "COMPILE_VERSION", "upgraded")
+    monkeypatch.setattr(WorkflowConfigLoader, "_compile", recording)
+    WorkflowConfigLoader(str(WORKFLOW_PATH.parent), bundle=ConfigBundle(bundle_file)).load_workflow(WORKFLOW_PATH)
+    assert len(compiled) == 1
+
+
+def test_agent_pool_reads_through_the_bundle(tmp_path):
+    path = tmp_path / "a.agent.json"
+    path.write_text(json.dumps({"name": "A", "model": {"type": "bedrock", "name": "m"}, "tools": []}))
+    bundle = ConfigBundle()
+    pool = AgentPool(bundle=bundle)
+
+    pool.release(pool.acquire(str(path)))
+    pool.release(pool.acquire(str(path)))
+    assert pool.stats["hits"] == 1
+    assert bundle.stats == {"hits": 1, "misses": 1, "rehashed": 0}
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pytest
+from tests.conftest import StubPool
+
+TECH_LEAD_ANSWER = """## Technical Design
+Single service backed by SQLite.
+
+## Implementation Plan
+- Write the schema
+- Implement the API
+"""
+
+
+@pytest.fixture
+def controller_for(junior_workflow, make_controller):
+    return lambda pool: make_controller(junior_workflow, "recovery-test", agent_pool=pool)
+
+
+def test_formatter_skipped_when_fields_recoverable(controller_for):
+    pool = StubPool({"tech_leader": TECH_LEAD_ANSWER})
+    controller = controller_for(pool)
+    controller.current_state = "requirement"
+    data = {"project_name": "Demo", "project_description": "Demo project",
+            "user_stories": ["story"], "acceptance_criteria": ["criteria"]}
+
+    result = controller.execute_agent_task("tech_leader", data, state="technical")
+
+    assert pool.calls == ["tech_leader"]
+    assert result["technical_design"] == "Single service backed by SQLite."
+    assert result["implementation_plan"] == ["Write the schema", "Implement the API"]
+    assert controller.formatter_stats == {"fields_recovered": 2, "formatter_avoided": 1, "formatter_calls": 0}
+
+
+def test_formatter_called_only_for_unrecoverable_fields(controller_for):
+    pool = StubPool({
+        "tech_leader": "## Technical Design\nMonolith.",
+        "formatter": json.dumps({"implementation_plan": "Iterate"})
+    })
+    controller = controller_for(pool)
+    controller.current_state = "requirement"
+
+    result = controller.execute_agent_task("tech_leader", {"project_name": "Demo"}, state="technical")
+
+    assert pool.calls == ["tech_leader", "formatter"]
+    assert result["technical_design"] == "Monolith."
+    assert controller.formatter_stats["formatter_calls"] == 1
+    assert controller.formatter_stats["fields_recovered"] == 1
@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import copy
+import json
+import pytest
+from workflows.state_machine import CompiledWorkflow
+from workflows.workflow_controller import project_input
+from tests.conftest import StubPool, WORKFLOW_DIR
+
+
+@pytest.fixture
+def raw_config():
+    with open(WORKFLOW_DIR / "junior_developer.workflow.json") as f:
+        return json.load(f)
+
+
+def test_input_fields_follow_states_and_inputs(raw_config):
+    workflow = CompiledWorkflow.compile(raw_config)
+
+    qa = workflow.input_fields_for(workflow.transition("development", "testing"))
+    assert qa == {
+        "project_name", "project_description",
+        "code_complete", "unit_tests", "documentation", "performance_metrics",
+        "test_results", "bug_report", "test_coverage", "performance_report",
+        "acceptance_criteria", "technical_design",
+    }
+    assert "user_stories" not in qa
+
+
+def test_projection_can_be_disabled(raw_config):
+    config = copy.deepcopy(raw_config)
+    config["transitions"][3]["inputs"] = "*"
+    workflow = CompiledWorkflow.compile(config)
+    assert workflow.input_fields_for(workflow.transition("development", "testing")) is None
+
+    config["input_projection"] = False
+    workflow = CompiledWorkflow.compile(config)
+    assert workflow.input_fields_for(workflow.transition("init", "requirement")) is None
+
+
+def test_invalid_inputs_rejected(raw_config):
+    config = copy.deepcopy(raw_config)
+    config["transitions"][0]["inputs"] = "user_stories"
+
+    with pytest.raises(ValueError, match="invalid inputs"):
+        CompiledWorkflow.compile(config)
+
+
+def test_project_input_summarises_other_fields():
+    data = {
+        "project_name": "Demo",
+        "technical_design": "x" * 5000,
+        "user_stories": ["a", "b", "c"],
+        "code_complete": True,
+        "messages": [{"role": "assistant"}],
+    }
+    projected = project_input(data, frozenset({"project_name", "code_complete"}))
+
+    assert projected["project_name"] == "Demo"
+    assert projected["code_complete"] is True
+    omitted = projected["omitted_fields"]
+    assert omitted["technical_design"].startswith("text, 5000 chars: xxx")
+    assert omitted["user_stories"] == "list of 3 items"
+    assert "messages" not in omitted
+    assert project_input(data, None) is data
+
+
+def test_agent_receives_projected_state(junior_workflow, make_controller):
+    pool = StubPool()
+    controller = make_controller(junior_workflow, "projection-test", agent_pool=pool)
+    controller.current_state = "development"
+
+    state = {
+        "project_name": "Demo", "project_description": "d", "user_stories": ["story"],
+        "acceptance_criteria": ["works"], "technical_design": "design", "implementation_plan": "x" * 10_000,
+        "code_complete": True, "unit_tests": "tests", "test_results": "pass", "bug_report": "none"
+    }
+    assert controller.try_transition("testing", state)
+
+    assert set(pool.sent[0]) == {
+        "project_name", "project_description", "acceptance_criteria", "technical_design",
+        "code_complete", "unit_tests", "test_results", "bug_report", "omitted_fields"
+    }
+    assert set(pool.sent[0]["omitted_fields"]) == {"user_stories", "implementation_plan"}
+    # The full state is still carried forward
+    assert controller.session_state["state_data"]["implementation_plan"] == "x" * 10_000
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+from datetime import datetime, timezone
+import pytest
+from pydantic import BaseModel
+from utils.json_processor import JsonProcessor, available_backends, select_backend, set_json_backend
+
+
+class Story(BaseModel):
+    title: str
+    points: int
+
+
+class Opaque:
+    def __str__(self):
+        return "opaque"
+
+
+STATE = {
+    "project_name": "演示项目",
+    "created_at": datetime(2024, 5, 1, 12, 30, 15, 123456),
+    "updated_at": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+    "story": Story(title="Login", points=3),
+    "extra": Opaque(),
+    "scores": {1: 0.5},
+    "nested": [{"ok": True, "value": None}],
+}
+
+
+@pytest.mark.parametrize("name", list(available_backends()))
+def test_backends_match_stdlib_semantics(name):
+    expected = json.loads(select_backend("stdlib").dumps(STATE))
+    text = select_backend(name).dumps(STATE)
+
+    assert "演示项目" in text
+    assert select_backend(name).loads(text) == expected
+    assert expected["created_at"] == "2024-05-01T12:30:15.123456"
+    assert expected["story"] == {"title": "Login", "points": 3}
+    assert expected["extra"] == "opaque" and expected["scores"] == {"1": 0.5}
+
+
+@pytest.mark.parametrize("name", list(available_backends()))
+def test_backends_fall_back_on_unsupported_values(name):
+    assert select_backend(name).loads(select_backend(name).dumps({"big": 2 ** 70})) == {"big": 2 ** 70}
+
+
+def test_unknown_backend_falls_back_to_stdlib():
+    assert select_backend("simdjson").name == "stdlib"
+
+
+def test_processor_uses_selected_backend():
+    try:
+        set_json_backend("stdlib")
+        assert JsonProcessor.safe_serialize({"a": 1}) == '{"a": 1}'
+        assert JsonProcessor.safe_deserialize("{bad")["raw_data"] == "{bad"
+    finally:
+        set_json_backend()
@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pytest
+from utils.json_processor import IncrementalJsonExtractor
+from workflows.workflow_controller import WorkflowController
+from tests.conftest import StubPool
+
+ANSWER = ('Here is the plan {draft}:\n```json\n{"user_stories": ["As a user {me}", "say \\"hi\\""],\n'
+          ' "details": {"points": [1, 2,],},}\n```\nThen {"acceptance_criteria": ["works"]} and more prose...')
+
+
+def feed_in_chunks(extractor, text, size):
+    return [obj for i in range(0, len(text), size) for obj in extractor.feed(text[i:i + size])]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(ANSWER)])
+def test_objects_are_decoded_as_chunks_arrive(size):
+    extractor = IncrementalJsonExtractor(["user_stories", "acceptance_criteria"])
+
+    objects = feed_in_chunks(extractor, ANSWER, size)
+    assert objects == [
+        {"user_stories": ["As a user {me}", 'say "hi"'], "details": {"points": [1, 2]}},
+        {"acceptance_criteria": ["works"]},
+    ]
+    assert extractor.complete and extractor.missing == []
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1, "b": "trunc', {"a": 1, "b": "trunc"}),
+    ('{"a": 1, "partial_ke', {"a": 1}),
+    ('{"a": [1, 2, {"b": tr', {"a": [1, 2, {}]}),
+    ('{"a": 1,', {"a": 1}),
+    ('not json { at all {"a": 1', {"a": 1}),
+])
+def test_finish_repairs_truncated_object(text, expected):
+    extractor = IncrementalJsonExtractor(["a", "c"])
+
+    assert extractor.feed(text) == []
+    assert extractor.finish() == [expected]
+    assert extractor.fields == expected and extractor.missing == ["c"] and not extractor.complete
+
+
+# The product manager echoes its inputs before it gets to the requirement fields
+PM_CHUNKS = [
+    '```json\n{"project_name": "Demo", "project_description": "Demo project"}\n```\n',
+    "Stories: ",
+    '{"user_stories": ["login"], ',
+    '"acceptance_criteria": ["works"]}',
+    " Extra prose that should never be generated",
+]
+
+
+@pytest.fixture
+def streamed_requirement(junior_workflow, make_controller, monkeypatch):
+    """Run init -> requirement of the junior_developer workflow with a streaming product manager"""
+    def prefill(self, transition, data):
+        # Stands in for the formatter filling the target state's fields before the agent runs
+        data.setdefault("user_stories", ["placeholder"])
+        data.setdefault("acceptance_criteria", ["placeholder"])
+        return True
+
+    monkeypatch.setattr(WorkflowController, "prepare_transition_data", prefill)
+
+    def run(data):
+        pool = StubPool({"product_manager": PM_CHUNKS})
+        controller = make_controller(junior_workflow, "extract-test", agent_pool=pool)
+        tokens = []
+        controller.event_sink = lambda event: tokens.append(event.content) if event.content else None
+        assert controller.try_transition("requirement", data)
+        return pool, tokens, controller.session_state["state_data"]
+    return run
+
+
+def test_stream_stops_once_target_state_fields_are_seen(streamed_requirement):
+    pool, tokens, state = streamed_requirement({"project_name": "Demo", "project_description": "Demo project"})
+
+    # Echoed input fields do not count, the stream runs until both requirement fields were seen
+    assert pool.streamed == 4 and tokens == PM_CHUNKS[:4]
+    assert pool.closed_streams == 1
+    assert state["content"]["raw_content"] == "".join(PM_CHUNKS[:4])
+    assert state["status"] == "success"
+
+
+def test_stream_runs_to_the_end_when_nothing_is_pending(streamed_requirement):
+    pool, tokens, state = streamed_requirement({
+        "project_name": "Demo", "project_description": "Demo project",
+        "user_stories": ["login"], "acceptance_criteria": ["works"]
+    })
+
+    assert pool.streamed == len(PM_CHUNKS) and pool.closed_streams == 0
+    assert state["content"]["raw_content"] == "".join(PM_CHUNKS)
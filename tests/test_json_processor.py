@@ -274,4 +274,46 @@ def test_workflow_state_validation():
     cleaned = JsonProcessor.clean_content(workflow_state.model_dump())
     
     assert "project_name" in cleaned
-    assert cleaned["project_name"] == "Test Project"
\ No newline at end of file
+    assert cleaned["project_name"] == "Test Project"
+
+AGENT_MARKDOWN = """# Technical Proposal
+
+## Technical Design
+Use a layered architecture with a REST API.
+
+## Implementation Plan
+- Build the data model
+- Expose the endpoints
+
+**Tech Stack**: Python, FastAPI
+
+```json
+{"architecture_diagram": "api -> service -> db"}
+```
+"""
+
+
+def test_extract_fields_from_markdown():
+    """测试从markdown内容中确定性地恢复字段"""
+    data = JsonProcessor.clean_content({"content": AGENT_MARKDOWN})
+    found = JsonProcessor.extract_fields(
+        data, ["technical_design", "implementation_plan", "tech_stack", "architecture_diagram", "unit_tests"]
+    )
+
+    assert found["technical_design"] == "Use a layered architecture with a REST API."
+    assert found["implementation_plan"][:2] == "- "
+    assert found["tech_stack"] == "Python, FastAPI"
+    assert found["architecture_diagram"] == "api -> service -> db"
+    assert "unit_tests" not in found
+
+
+def test_extract_fields_prefers_structured_content():
+    """测试content字典中的字段优先于文本解析"""
+    data = {"content": {"user_stories": ["Story 1"], "raw_content": "## User Stories\n- Other"}}
+    assert JsonProcessor.extract_fields(data, ["user_stories"]) == {"user_stories": ["Story 1"]}
+
+
+def test_extract_sections_bullet_lists():
+    """测试纯列表段落解析为列表"""
+    sections = JsonProcessor.extract_sections("## Acceptance Criteria\n- Works\n2. Is fast\n")
+    assert sections["acceptance_criteria"] == ["Works", "Is fast"]
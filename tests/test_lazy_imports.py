@@ -0,0 +1,29 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("boto3", "sqlalchemy", "phi.agent", "phi.tools.duckduckgo", "workflows.workflow_controller")
+
+
+def loaded_after_import(module: str):
+    """Import ``module`` in a fresh interpreter and report which heavy modules came with it"""
+    script = (f"import sys, json, {module}; "
+              f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    output = subprocess.check_output([sys.executable, "-c", script], cwd=PROJECT_ROOT, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_cli_import_defers_runtime_dependencies():
+    assert loaded_after_import("main") == []
+
+
+def test_config_validation_defers_runtime_dependencies():
+    assert loaded_after_import("workflows.workflow_loader") == []
+
+
+def test_agent_module_defers_model_and_tools():
+    assert "boto3" not in loaded_after_import("agents.base_agent")
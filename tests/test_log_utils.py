@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import logging
+from utils.log_utils import LogPayload, log_payload
+
+
+class ExplodingValue:
+    def __str__(self):
+        raise AssertionError("payload formatted although the record was filtered")
+
+
+def test_fields_mode_lists_field_shapes():
+    payload = log_payload({"project_name": "Demo", "user_stories": ["a", "b"], "code_complete": True},
+                          mode="fields")
+    assert str(payload) == "{project_name: str[4], user_stories: list[2], code_complete: True}"
+
+
+def test_fields_mode_is_independent_of_value_size():
+    payload = log_payload({"technical_design": "x" * 5_000_000}, mode="fields")
+    assert str(payload) == "{technical_design: str[5000000]}"
+
+
+def test_full_mode_truncates_large_payloads():
+    data = {"code": "y" * 100_000, "tests": list(range(10_000))}
+    text = str(log_payload(data, mode="full", max_chars=500))
+
+    assert len(text) <= 500 + len("...(truncated)")
+    assert text.startswith('{"code": "yyy')
+
+
+def test_hash_mode_is_stable():
+    first = str(log_payload({"b": 1, "a": [1, 2]}, mode="hash"))
+    second = str(log_payload({"a": [1, 2], "b": 1}, mode="hash"))
+    assert "sha256=" in first
+    assert first.split("sha256=")[1] == second.split("sha256=")[1]
+
+
+def test_payload_is_lazy_when_level_filtered():
+    test_logger = logging.getLogger("nimship.test.lazy")
+    test_logger.setLevel(logging.WARNING)
+    test_logger.debug("state: %s", LogPayload({"value": ExplodingValue()}, mode="full"))
+
+
+def test_unformattable_payload_does_not_raise():
+    text = str(LogPayload({"value": ExplodingValue()}, mode="hash"))
+    assert text.startswith("<unformattable payload")
+    json.dumps({"ok": text})
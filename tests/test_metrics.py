@@ -0,0 +1,118 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import json
+import threading
+import pytest
+from rich.console import Console
+from utils import metrics
+from utils.metrics import MetricsRecorder, estimate_cost
+from tests.conftest import StubPool, chain
+
+HAIKU = "anthropic.claude-3-haiku-20240307-v1:0"
+PRICES = {HAIKU: {"input_per_1k": 0.25, "output_per_1k": 1.25}}
+
+
+def test_recorder_writes_jsonl_and_summarizes(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(session_id="s1", path=str(path), prices=PRICES)
+
+    with recorder.span("agent_run", state="requirement", agent_id="pm"):
+        pass
+    with pytest.raises(RuntimeError):
+        with recorder.span("storage_write"):
+            raise RuntimeError("disk full")
+    recorder.record_usage(HAIKU, {"input_tokens": [2000], "output_tokens": 1000}, state="requirement")
+    recorder.record_usage("unpriced-model", {"input_tokens": 10})
+    recorder.flush()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["type"] for line in lines] == ["span", "span", "usage", "usage"]
+    assert lines[1]["error"] is True
+    assert lines[2]["cost"] == pytest.approx(0.5 + 1.25)
+    assert lines[3]["cost"] is None
+
+    summary = recorder.summary()
+    assert summary["spans"]["agent_run"]["count"] == 1
+    assert summary["states"]["requirement"]["input_tokens"] == 2000
+    assert summary["models"][HAIKU]["cost"] == pytest.approx(1.75)
+
+
+def test_records_are_written_off_the_calling_thread(tmp_path, monkeypatch):
+    path = tmp_path / "shared.jsonl"
+    writers = []
+    original = metrics._JsonlFormatter.format
+
+    def recording(self, record):
+        writers.append(threading.current_thread())
+        return original(self, record)
+
+    monkeypatch.setattr(metrics._JsonlFormatter, "format", recording)
+    first = MetricsRecorder(session_id="a", path=str(path))
+    second = MetricsRecorder(session_id="b", path=str(path))
+    first.record_usage(HAIKU, {"input_tokens": 1})
+    second.record_usage(HAIKU, {"input_tokens": 2})
+    second.flush()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["session_id"] for line in lines] == ["a", "b"]
+    assert writers and threading.current_thread() not in writers
+
+
+def test_estimate_cost_uses_configured_prices():
+    assert estimate_cost(HAIKU, 1000, 1000, PRICES) == pytest.approx(1.5)
+    assert estimate_cost("unknown", 1000, 1000, PRICES) is None
+
+
+def test_controller_records_phases_per_state(make_workflow, make_controller):
+    workflow_path = make_workflow(chain(("requirement", "product_manager"), ("development", "engineer")))
+    pool = StubPool(model_id=HAIKU, metrics={"input_tokens": [1000, 1000], "output_tokens": [400]})
+    controller = make_controller(workflow_path, agent_pool=pool)
+    controller.metrics.prices = PRICES
+
+    assert controller.run_dag(dict(controller.input_data))
+
+    summary = controller.metrics.summary()
+    assert {"config_load", "validation", "agent_acquire", "agent_run", "storage_write"} <= set(summary["spans"])
+    assert summary["states"]["development"]["runs"] == 1
+    assert summary["states"]["development"]["input_tokens"] == 2000
+    assert summary["models"][HAIKU]["calls"] == 2
+    assert summary["models"][HAIKU]["cost"] == pytest.approx(2 * (0.5 + 0.5))
+
+    output = io.StringIO()
+    controller.metrics.render_summary(Console(file=output, width=120))
+    assert "Agent time by state" in output.getvalue()
+
+
+def test_usage_is_billed_to_the_model_that_answered(make_workflow, make_controller):
+    workflow_path = make_workflow(chain(("requirement", "product_manager")))
+    pool = StubPool(model_id="routed-model", metrics={"input_tokens": [1000], "output_tokens": [400]})
+    acquire = pool.acquire
+
+    def failed_over(config_path):
+        agent = acquire(config_path)
+        agent.model.served_model_id = HAIKU
+        return agent
+
+    pool.acquire = failed_over
+    controller = make_controller(workflow_path, agent_pool=pool)
+    controller.metrics.prices = PRICES
+
+    assert controller.run_dag(dict(controller.input_data))
+    assert set(controller.metrics.summary()["models"]) == {HAIKU}
+
+
+def test_cache_hits_are_not_billed(make_workflow, make_controller):
+    workflow_path = make_workflow(chain(("requirement", "product_manager"), ("development", "engineer")))
+    pool = StubPool(model_id=HAIKU, metrics={"input_tokens": [1000], "output_tokens": [400]}, cached=True)
+    controller = make_controller(workflow_path, agent_pool=pool)
+    controller.metrics.prices = PRICES
+
+    assert controller.run_dag(dict(controller.input_data))
+
+    summary = controller.metrics.summary()
+    assert summary["models"][HAIKU] == {"calls": 0, "cache_hits": 2, "input_tokens": 0, "output_tokens": 0,
+                                        "cost": 0.0}
+    assert summary["states"]["development"]["cost"] == 0.0
@@ -0,0 +1,30 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import copy
+from utils.model_clients import BedrockClientRegistry, SharedClientClaude
+import utils.model_clients as model_clients
+
+
+def test_registry_shares_clients_per_region():
+    registry = BedrockClientRegistry(max_pool_connections=32, tcp_keepalive=True)
+
+    east = registry.runtime_client("us-east-1")
+    assert registry.runtime_client("us-east-1") is east
+    assert registry.runtime_client("us-west-2") is not east
+    assert registry.stats == {"clients": 2, "reused": 1}
+    assert east.meta.config.max_pool_connections == 32
+    assert east.meta.config.tcp_keepalive is True
+
+
+def test_models_use_registry_client(monkeypatch):
+    registry = BedrockClientRegistry()
+    monkeypatch.setattr(model_clients, "_default_registry", registry)
+
+    haiku = SharedClientClaude(id="anthropic.claude-3-haiku-20240307-v1:0", aws_region="us-east-1")
+    instant = SharedClientClaude(id="anthropic.claude-instant-v1", aws_region="us-east-1")
+
+    assert haiku.bedrock_runtime_client is instant.bedrock_runtime_client
+    assert copy.deepcopy(haiku).bedrock_runtime_client is haiku.bedrock_runtime_client
+    assert registry.stats["clients"] == 1
@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import pytest
+import utils.model_router as model_router
+from utils.model_factory import load_model_from_config
+from utils.model_router import ModelRouter, RoutedClaude
+
+FAST = "anthropic.claude-3-haiku-20240307-v1:0"
+SLOW = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+
+class FakeBedrock:
+    """Stands in for the bedrock-runtime client with a fixed delay or error per model"""
+
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = set(failing)
+        self.calls = []
+
+    def converse(self, **body):
+        model_id = body["modelId"]
+        self.calls.append(model_id)
+        time.sleep(self.delays.get(model_id, 0))
+        if model_id in self.failing:
+            raise RuntimeError(f"{model_id} throttled")
+        return {"modelId": model_id}
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = ModelRouter(min_samples=3, min_hedge_delay=0.01, cooldown_seconds=60)
+    monkeypatch.setattr(model_router, "_default_router", router)
+    return router
+
+
+def routed(client, hedge=False):
+    model = RoutedClaude(id=SLOW, candidates=[SLOW, FAST], hedge=hedge, aws_region="us-east-1")
+    model._bedrock_runtime_client = client
+    return model
+
+
+def test_rank_prefers_low_p95_and_healthy_models(router):
+    for _ in range(3):
+        router.record(SLOW, 2.0)
+        router.record(FAST, 0.2)
+    assert router.rank([SLOW, FAST]) == [FAST, SLOW]
+    assert router.snapshot()[FAST]["p50"] == 0.2
+
+    for _ in range(3):
+        router.record(FAST, 0.1, ok=False)
+    assert not router.is_healthy(FAST)
+    assert router.rank([SLOW, FAST]) == [SLOW, FAST]
+
+
+def test_unmeasured_models_are_tried_first(router):
+    for _ in range(3):
+        router.record(SLOW, 0.2)
+    assert router.rank([SLOW, FAST]) == [FAST, SLOW]
+
+
+def test_invoke_fails_over_to_next_candidate(router):
+    client = FakeBedrock({}, failing=[SLOW])
+    model = routed(client)
+
+    assert model.next_model_id == SLOW
+    assert model.invoke({"messages": []}) == {"modelId": FAST}
+    assert model.served_model_id == FAST
+    assert client.calls == [SLOW, FAST]
+    assert router.stats["failovers"] == 1
+    assert router.snapshot()[SLOW]["error_rate"] == 1.0
+
+
+def test_hedged_request_wins_when_primary_passes_p95(router):
+    for _ in range(3):
+        router.record(SLOW, 0.02)
+        router.record(FAST, 0.05)
+    client = FakeBedrock({SLOW: 0.5, FAST: 0.0})
+
+    model = routed(client, hedge=True)
+
+    started = time.perf_counter()
+    assert model.invoke({"messages": []}) == {"modelId": FAST}
+    assert time.perf_counter() - started < 0.4
+    assert model.served_model_id == FAST
+    assert router.stats == {"hedged": 1, "hedge_wins": 1, "failovers": 0}
+
+
+def test_factory_builds_routed_model():
+    model = load_model_from_config({"type": "bedrock", "candidates": [FAST, SLOW], "hedge": True})
+
+    assert isinstance(model, RoutedClaude)
+    assert model.id == FAST and model.candidates == [FAST, SLOW] and model.hedge
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+from collections import OrderedDict
+from phi.agent import Agent
+import agents.base_agent as base_agent
+from agents.base_agent import NimshipAgent
+from utils.model_clients import supports_prompt_cache, with_cache_points
+from utils.system_config import PROJECT_ROOT
+from workflows.workflow_controller import prompt_layout
+
+FORMATTER_CONFIG = os.path.join(PROJECT_ROOT, "config", "agents", "formatter.agent.json")
+
+
+def test_system_message_built_once_per_config(monkeypatch):
+    builds = []
+    original = Agent.get_system_message
+
+    def counting(self):
+        builds.append(self.name)
+        return original(self)
+
+    monkeypatch.setattr(Agent, "get_system_message", counting)
+    monkeypatch.setattr(base_agent, "_system_prompts", OrderedDict())
+    first, second = NimshipAgent(config_path=FORMATTER_CONFIG), NimshipAgent(config_path=FORMATTER_CONFIG)
+    first.instructions = first.instructions + ["Answer in English."]
+
+    assert first.get_system_message().content != second.get_system_message().content
+    assert second.get_system_message().content == NimshipAgent(config_path=FORMATTER_CONFIG).get_system_message().content
+    assert len(builds) == 2
+
+    # Per-run content such as the current time is never cached
+    second.add_datetime_to_instructions = True
+    second.get_system_message()
+    assert len(builds) == 3
+
+
+def test_system_prompt_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(base_agent, "_system_prompts", OrderedDict())
+    monkeypatch.setattr(base_agent, "MAX_SYSTEM_PROMPTS", 2)
+    agent = NimshipAgent(config_path=FORMATTER_CONFIG)
+    base = list(agent.instructions)
+
+    versions = []
+    for suffix in ("one", "two", "three"):
+        agent.instructions = base + [suffix]
+        agent.get_system_message()
+        versions.append(agent.prompt_version())
+
+    assert list(base_agent._system_prompts) == versions[1:]
+
+
+def test_prompt_layout_is_independent_of_insertion_order():
+    a = {"technical_design": "d", "omitted_fields": {"x": "list of 2 items"}, "project_name": "Demo",
+         "acceptance_criteria": ["ok"]}
+    b = dict(reversed(list(a.items())))
+
+    layout = prompt_layout(a, ("project_name", "project_description"))
+    assert list(layout) == ["project_name", "acceptance_criteria", "technical_design", "omitted_fields"]
+    assert json.dumps(layout) == json.dumps(prompt_layout(b, ("project_name", "project_description")))
+
+
+def test_cache_points_follow_static_prefix():
+    body = {"modelId": "us.anthropic.claude-3-5-haiku-20241022-v1:0", "system": [{"text": "You are..."}],
+            "toolConfig": {"tools": [{"toolSpec": {"name": "search"}}]},
+            "messages": [{"role": "user", "content": [{"text": "{}"}]}]}
+
+    assert supports_prompt_cache(body["modelId"])
+    assert not supports_prompt_cache("anthropic.claude-instant-v1")
+    cached = with_cache_points(body)
+    assert cached["system"][-1] == {"cachePoint": {"type": "default"}}
+    assert cached["toolConfig"]["tools"][-1] == {"cachePoint": {"type": "default"}}
+    assert cached["messages"] == body["messages"] and len(body["system"]) == 1
@@ -0,0 +1,193 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+import pytest
+from botocore.exceptions import ClientError
+import utils.rate_limiter as rate_limiter
+from utils.model_clients import SharedClientClaude
+from utils.rate_limiter import ModelRateLimiter, estimate_tokens, retry_throttled
+
+MODEL = "anthropic.claude-3-haiku-20240307-v1:0"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ThrottlingBedrock:
+    """Local stand-in for bedrock-runtime that throttles the first ``failures`` calls"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def converse(self, **body):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}}, "Converse")
+        return {"output": {"message": {"role": "assistant", "content": [{"text": "ok"}]}},
+                "usage": {"inputTokens": 10, "outputTokens": 5, "totalTokens": 15}}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_callers_queue_in_arrival_order(clock):
+    limiter = ModelRateLimiter(default={"requests_per_minute": 60}, sleep=clock.sleep, clock=clock)
+
+    # The first minute's burst is free, after that each caller waits one more second than the last
+    waits = [limiter.acquire(MODEL) for _ in range(63)][60:]
+    assert waits == pytest.approx([1.0, 1.0, 1.0])
+    assert clock.now == pytest.approx(3.0)
+
+
+def test_token_budget_is_settled_with_actual_usage(clock):
+    limiter = ModelRateLimiter(default={"tokens_per_minute": 600}, sleep=clock.sleep, clock=clock)
+
+    assert limiter.acquire(MODEL, tokens=600) == 0
+    limiter.settle(MODEL, reserved=600, used=300)
+    assert limiter.acquire(MODEL, tokens=300) == 0
+    assert limiter.acquire(MODEL, tokens=60) == pytest.approx(6.0)
+
+
+def test_throttling_errors_are_retried_with_backoff():
+    client = ThrottlingBedrock(failures=2)
+    delays = []
+
+    assert retry_throttled(lambda: client.converse(), base_delay=1.0, sleep=delays.append)["usage"]
+    assert client.calls == 3
+    assert len(delays) == 2 and 0 <= delays[0] <= 1.0 and 0 <= delays[1] <= 2.0
+
+    with pytest.raises(ClientError):
+        retry_throttled(lambda: ThrottlingBedrock(failures=5).converse(), max_retries=2, sleep=delays.append)
+    with pytest.raises(ValueError):
+        retry_throttled(lambda: (_ for _ in ()).throw(ValueError("bad request")), sleep=delays.append)
+
+
+def test_model_invoke_queues_and_retries(monkeypatch, clock):
+    limiter = ModelRateLimiter(default={"requests_per_minute": 600, "tokens_per_minute": 100_000},
+                               sleep=clock.sleep, clock=clock)
+    monkeypatch.setattr(rate_limiter, "_default_limiter", limiter)
+    model = SharedClientClaude(id=MODEL, aws_region="us-east-1")
+    model._bedrock_runtime_client = ThrottlingBedrock(failures=1)
+
+    body = {"modelId": MODEL, "messages": [{"role": "user", "content": [{"text": "x" * 400}]}],
+            "inferenceConfig": {"maxTokens": 100}}
+    assert estimate_tokens(body) == 200
+    assert model.invoke(body)["usage"]["totalTokens"] == 15
+    assert limiter.stats[MODEL] == {"requests": 2, "waited_s": 0.0, "throttled": 1}
+    assert 0 <= clock.now <= 1.0
+
+
+class EventStream:
+    """Iterable with the close() of botocore's EventStream"""
+
+    def __init__(self, events):
+        self.events = iter(events)
+        self.closed = False
+
+    def __iter__(self):
+        return self.events
+
+    def close(self):
+        self.closed = True
+
+
+class StreamingBedrock:
+    """Local stand-in for converse_stream: three 10-token text deltas, then the usage metadata"""
+
+    def __init__(self):
+        self.streams = []
+
+    def converse_stream(self, **body):
+        events = [{"contentBlockDelta": {"delta": {"text": "x" * 40}}}] * 3
+        self.streams.append(EventStream(events + [{"metadata": {"usage": {"totalTokens": 150}}}]))
+        return {"stream": self.streams[-1]}
+
+
+def test_reservations_are_settled_once_per_call(monkeypatch, clock):
+    # The clock never moves, so the bucket only changes through reservations and settlements
+    limiter = ModelRateLimiter(default={"tokens_per_minute": 1000}, sleep=lambda seconds: None, clock=clock)
+    monkeypatch.setattr(rate_limiter, "_default_limiter", limiter)
+    model = SharedClientClaude(id=MODEL, aws_region="us-east-1")
+    body = {"modelId": MODEL, "messages": [{"role": "user", "content": [{"text": "x" * 400}]}],
+            "inferenceConfig": {"maxTokens": 100}}
+
+    def balance():
+        return limiter._buckets[MODEL]["tokens"].tokens
+
+    model._bedrock_runtime_client = ThrottlingBedrock(failures=2)
+    model.invoke(body)
+    assert balance() == 1000 - 15
+
+    # A call that never gets through gives its reservation back
+    model._bedrock_runtime_client = ThrottlingBedrock(failures=100)
+    with pytest.raises(ClientError):
+        model.invoke(body)
+    assert balance() == 985
+
+    model._bedrock_runtime_client = StreamingBedrock()
+    assert len(list(model.invoke_stream(body))) == 4
+    assert balance() == 985 - 150
+
+    # An abandoned stream is charged its input and the output received so far
+    stream = model.invoke_stream(body)
+    next(stream)
+    stream.close()
+    assert balance() == 835 - (100 + 10)
+
+
+def test_close_stream_releases_an_abandoned_response(monkeypatch, clock):
+    limiter = ModelRateLimiter(default={"tokens_per_minute": 1000}, sleep=lambda seconds: None, clock=clock)
+    monkeypatch.setattr(rate_limiter, "_default_limiter", limiter)
+    model = SharedClientClaude(id=MODEL, aws_region="us-east-1")
+    model._bedrock_runtime_client = bedrock = StreamingBedrock()
+    body = {"modelId": MODEL, "messages": [{"role": "user", "content": [{"text": "x" * 400}]}],
+            "inferenceConfig": {"maxTokens": 100}}
+
+    # The consumer stops reading but still holds the generator, as phidata's wrappers do
+    stream = model.invoke_stream(body)
+    next(stream)
+    model.close_stream()
+
+    assert bedrock.streams[0].closed
+    assert limiter._buckets[MODEL]["tokens"].tokens == 1000 - (100 + 10)
+    assert list(stream) == [] and model._active_stream is None
+
+
+def test_default_limiter_is_shared_by_threads_that_start_together(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_default_limiter", None)
+    builds = []
+
+    def slow_build():
+        builds.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return ModelRateLimiter()
+
+    monkeypatch.setattr(rate_limiter, "limiter_from_config", slow_build)
+    start = threading.Barrier(8)
+    seen = []
+
+    def worker():
+        start.wait()
+        seen.append(rate_limiter.get_rate_limiter())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1 and len({id(limiter) for limiter in seen}) == 1
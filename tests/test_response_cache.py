@@ -0,0 +1,135 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import pytest
+from phi.agent import Agent, RunResponse
+from agents.base_agent import NimshipAgent
+from agents.response_cache import ResponseCache, cache_key
+
+AGENT_CONFIG = {
+    "name": "Cached",
+    "description": "Agent used by the response cache tests",
+    "instructions": ["Answer briefly"],
+    "model": {"type": "bedrock", "name": "anthropic.claude-3-haiku-20240307-v1:0"},
+    "tools": []
+}
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    calls = []
+
+    def fake_run(self, message=None, **kwargs):
+        calls.append(message)
+        return RunResponse(content={"echo": message["content"]}, run_id=f"run-{len(calls)}")
+
+    monkeypatch.setattr(Agent, "run", fake_run)
+    return calls
+
+
+def make_agent(tmp_path, cache, **overrides):
+    config_path = tmp_path / "cached.agent.json"
+    config_path.write_text(json.dumps({**AGENT_CONFIG, **overrides}))
+    return NimshipAgent(config_path=str(config_path), response_cache=cache)
+
+
+def test_repeated_input_is_served_from_cache(tmp_path, model_calls):
+    cache = ResponseCache(cache_dir=str(tmp_path / "cache"))
+    agent = make_agent(tmp_path, cache)
+    message = {"role": "user", "content": "same input"}
+
+    first = agent.run(message)
+    second = agent.run(message)
+    assert agent.served_from_cache
+    agent.run({"role": "user", "content": "other input"})
+
+    assert len(model_calls) == 2 and not agent.served_from_cache
+    assert second.content == first.content == {"echo": "same input"}
+    assert second.run_id == "run-1"
+    assert cache.stats == {"Cached": {"hits": 1, "misses": 2}}
+
+
+def test_changed_instructions_miss(tmp_path, model_calls):
+    cache = ResponseCache(cache_dir=str(tmp_path / "cache"))
+    message = {"role": "user", "content": "same input"}
+
+    make_agent(tmp_path, cache).run(message)
+    make_agent(tmp_path, cache, instructions=["Answer in detail"]).run(message)
+
+    assert len(model_calls) == 2
+
+
+def test_disabled_cache_is_bypassed(tmp_path, model_calls):
+    agent = make_agent(tmp_path, ResponseCache(cache_dir=str(tmp_path / "cache"), enabled=False))
+    message = {"role": "user", "content": "same input"}
+
+    agent.run(message)
+    agent.run(message)
+
+    assert len(model_calls) == 2
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def test_ttl_expiry(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path / "cache"), ttl_seconds=60)
+    key = cache_key({"model": "m"}, "input")
+    cache.put(key, RunResponse(content="old"))
+
+    path = cache._path(key)
+    with open(path) as f:
+        entry = json.load(f)
+    entry["created_at"] = time.time() - 120
+    with open(path, "w") as f:
+        json.dump(entry, f)
+
+    assert cache.get(key) is None
+    assert not os.path.exists(path)
+
+
+def test_size_eviction_keeps_recent_entries(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path / "cache"), max_bytes=2500)
+    keys = [cache_key({"model": "m"}, i) for i in range(5)]
+    for i, key in enumerate(keys):
+        cache.put(key, RunResponse(content="x" * 500))
+        os.utime(cache._path(key), (i, i))
+
+    cache.put(cache_key({"model": "m"}, "new"), RunResponse(content="x" * 500))
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[-1]) is not None
+    assert cache._scan_size() <= 2500
+
+
+def test_streamed_runs_use_the_cache(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_stream(self, message=None, stream=False, **kwargs):
+        calls.append(message)
+
+        def generate():
+            for chunk in ("cached ", "answer"):
+                yield RunResponse(content=chunk)
+            self.run_response = RunResponse(content="cached answer", run_id=f"run-{len(calls)}")
+        return generate()
+
+    monkeypatch.setattr(Agent, "run", fake_stream)
+    agent = make_agent(tmp_path, ResponseCache(cache_dir=str(tmp_path / "cache")))
+    message = {"role": "user", "content": "same input"}
+
+    first = [chunk.content for chunk in agent.run(message, stream=True, stream_intermediate_steps=True)]
+    replayed = [chunk.content for chunk in agent.run(message, stream=True, stream_intermediate_steps=True)]
+
+    assert first == ["cached ", "answer"] and replayed == ["cached answer"]
+    assert len(calls) == 1 and agent.served_from_cache
+    assert agent.run_response.content == "cached answer" and agent.run_response.run_id == "run-1"
+
+    # A stream abandoned part way through is not cached
+    other = {"role": "user", "content": "other input"}
+    partial = agent.run(other, stream=True)
+    next(partial)
+    partial.close()
+    list(agent.run(other, stream=True))
+    assert len(calls) == 3
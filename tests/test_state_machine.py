@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import copy
+import json
+import pytest
+from pydantic import ValidationError
+from pathlib import Path
+from workflows.state_machine import CompiledWorkflow
+from workflows.workflow_loader import WorkflowConfigLoader
+
+WORKFLOW_DIR = Path(__file__).resolve().parent.parent / "config" / "workflows"
+
+
+@pytest.fixture
+def raw_config():
+    with open(WORKFLOW_DIR / "junior_developer.workflow.json") as f:
+        return json.load(f)
+
+
+def test_loader_returns_compiled_workflow():
+    loader = WorkflowConfigLoader(str(WORKFLOW_DIR))
+    workflow = loader.load_workflow(WORKFLOW_DIR / "junior_developer.workflow.json")
+
+    assert isinstance(workflow, CompiledWorkflow)
+    assert workflow["name"] == "junior_developer_workflow"
+    assert all(key in workflow for key in ["agents", "state_data", "transitions"])
+
+
+def test_lookups(raw_config):
+    workflow = CompiledWorkflow.compile(raw_config)
+
+    assert workflow.transition("init", "requirement")["agent_id"] == "product_manager"
+    assert workflow.transition("init", "testing") is None
+    assert [t["to_state"] for t in workflow.transitions_from("technical")] == ["development"]
+    assert workflow.transitions_from("unknown") == ()
+    assert workflow.required_fields_for("technical") == ("technical_design", "implementation_plan")
+    assert workflow.required_fields_for("unknown") == ()
+    assert workflow.agent("formatter")["config_path"] == "config/agents/formatter.agent.json"
+    assert workflow.agent("nobody") is None
+
+
+def test_compiled_workflow_is_immutable(raw_config):
+    workflow = CompiledWorkflow.compile(raw_config)
+
+    with pytest.raises(TypeError):
+        workflow["state_data"]["init"] = {}
+    with pytest.raises(AttributeError):
+        workflow.edges = {}
+    assert workflow.to_dict() == raw_config
+
+
+def test_dangling_state_rejected(raw_config):
+    config = copy.deepcopy(raw_config)
+    config["transitions"][0]["to_state"] = "review"
+
+    with pytest.raises(ValueError, match="unknown state: review"):
+        CompiledWorkflow.compile(config)
+
+
+def test_dangling_agent_rejected(raw_config):
+    config = copy.deepcopy(raw_config)
+    config["transitions"][1]["agent_id"] = "architect"
+
+    with pytest.raises(ValueError, match="unknown agent: architect"):
+        CompiledWorkflow.compile(config)
+
+
+def test_loader_reports_invalid_config(tmp_path, raw_config):
+    config = copy.deepcopy(raw_config)
+    config["initial_state"] = "draft"
+    path = tmp_path / "broken.workflow.json"
+    path.write_text(json.dumps(config))
+
+    loader = WorkflowConfigLoader(str(tmp_path))
+    with pytest.raises(ValueError, match="Invalid workflow config"):
+        loader.load_workflow(path)
+
+
+def test_state_models_validate_owned_fields(raw_config):
+    config = copy.deepcopy(raw_config)
+    config["state_data"]["requirement"]["field_types"] = {"user_stories": "list[str]"}
+    workflow = CompiledWorkflow.compile(config)
+    model = workflow.state_model("requirement")
+
+    assert model is CompiledWorkflow.compile(config).state_model("requirement")
+    model.model_validate({"user_stories": ["login"], "acceptance_criteria": "ok", "project_name": 1})
+    with pytest.raises(ValidationError) as excinfo:
+        model.model_validate({"user_stories": "login"})
+    assert [error["loc"] for error in excinfo.value.errors()] == [("user_stories",), ("acceptance_criteria",)]
+
+
+def test_unknown_field_type_rejected(raw_config):
+    config = copy.deepcopy(raw_config)
+    config["state_data"]["init"]["field_types"] = {"timeline": "datetime"}
+
+    with pytest.raises(ValueError, match="unknown type for timeline"):
+        CompiledWorkflow.compile(config)
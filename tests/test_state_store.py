@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflows.state_store import StateStore, StateVersion, MAX_CHAIN_DEPTH
+from workflows.workflow_controller import StateNode, merge_branch_result
+
+DESIGN = {"modules": ["api", "db"] * 1000}
+
+
+def test_versions_share_unchanged_fields():
+    first = StateVersion({"project_name": "Demo", "technical_design": DESIGN})
+    second = first.evolve({"code": "print()", "project_name": "Demo"})
+
+    assert second is not first and second.version == 1
+    assert second._changes == {"code": "print()"}
+    assert second["technical_design"] is DESIGN
+    assert dict(first) == {"project_name": "Demo", "technical_design": DESIGN}
+    assert len(second) == 3 and "code" not in first
+    assert first.evolve({"technical_design": DESIGN}) is first
+
+
+def test_diff_and_long_chains():
+    root = StateVersion({"step": 0, "design": DESIGN})
+    version = root
+    for step in range(1, MAX_CHAIN_DEPTH * 2):
+        version = version.evolve({"step": step})
+
+    assert version["step"] == MAX_CHAIN_DEPTH * 2 - 1 and version["design"] is DESIGN
+    assert version._depth < MAX_CHAIN_DEPTH
+    latest = version.evolve({"review": "ok"})
+    assert latest.diff(version) == {"review": "ok"}
+    assert latest.diff(root) == {"step": MAX_CHAIN_DEPTH * 2 - 1, "review": "ok"}
+
+
+def test_branches_fork_and_merge_through_drafts():
+    store = StateStore({"project_name": "Demo", "details": {"a": 1}})
+    base = store.fork()
+    first, second = (StateNode(state, {"from_state": "requirement", "to_state": state}, frozenset(), rank)
+                     for rank, state in enumerate(("development", "test_planning")))
+    writers, conflicts = {}, []
+
+    for node, details in ((first, {"a": 1, "b": 2}), (second, {"a": 1, "c": 3})):
+        draft = store.draft()
+        merge_branch_result(draft, base, {**base.to_dict(), "details": details}, node, writers, conflicts)
+        store.commit(draft)
+
+    assert store.head["details"] == {"a": 1, "b": 2, "c": 3}
+    assert base["details"] == {"a": 1} and store.head.version == 2 and not conflicts
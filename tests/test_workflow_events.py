@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import pytest
+from workflows.events import WorkflowEventType
+from workflows.workflow_controller import _event_state
+from tests.conftest import StubPool
+
+TRANSITIONS = [
+    {"from_state": "init", "to_state": "requirement", "agent_id": "product_manager"},
+    {"from_state": "requirement", "to_state": "development", "agent_id": "engineer"},
+    {"from_state": "requirement", "to_state": "test_planning", "agent_id": "qa_engineer"}
+]
+
+
+@pytest.fixture
+def controller(make_workflow, make_controller):
+    return make_controller(make_workflow(TRANSITIONS), "events-test", agent_pool=StubPool(tool_calls=True))
+
+
+def test_stream_dag_yields_events_in_order(controller):
+    events = list(controller.stream_dag(dict(controller.input_data)))
+    kinds = [e.event for e in events]
+
+    assert kinds[0] == WorkflowEventType.transition_started
+    assert kinds[-1] == WorkflowEventType.workflow_completed
+    assert events[-1].data == {"success": True}
+
+    requirement = [e for e in events if e.state == "requirement"]
+    assert [e.event for e in requirement] == [
+        WorkflowEventType.transition_started,
+        WorkflowEventType.tool_call,
+        WorkflowEventType.token, WorkflowEventType.token, WorkflowEventType.token,
+        WorkflowEventType.transition_completed,
+    ]
+    assert "".join(e.content for e in requirement if e.event == WorkflowEventType.token) == "product_manager is done"
+    assert requirement[1].data["tool_name"] == "search"
+
+    # Parallel branches are tagged with the state they produce
+    tokens = {e.state: e.agent_id for e in events if e.event == WorkflowEventType.token}
+    assert tokens == {"requirement": "product_manager", "development": "engineer", "test_planning": "qa_engineer"}
+    assert controller.event_sink is None
+    assert controller.session_state["completed_states"] == ["requirement", "development", "test_planning"]
+
+
+def test_async_run_streams_to_sink(controller):
+    received = []
+    controller.event_sink = received.append
+
+    assert asyncio.run(controller.arun())
+    assert sum(1 for e in received if e.event == WorkflowEventType.token) == 9
+    assert sum(1 for e in received if e.event == WorkflowEventType.transition_completed) == 3
+
+
+def test_transition_state_tag_is_restored(controller):
+    received = []
+    controller.event_sink = received.append
+
+    assert controller.try_transition("requirement", dict(controller.input_data))
+    assert {e.state for e in received} == {"requirement"}
+    assert _event_state.get() is None
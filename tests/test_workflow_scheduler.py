@@ -0,0 +1,131 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+import pytest
+from workflows.workflow_controller import (
+    WorkflowController, StateNode, build_dependency_graph, merge_branch_result
+)
+from workflows.state_machine import CompiledWorkflow
+from tests.conftest import workflow_config
+
+
+def parallel_workflow_config():
+    """init -> requirement -> (development | test_planning) -> testing"""
+    return workflow_config([
+        {"from_state": "init", "to_state": "requirement", "agent_id": "product_manager"},
+        {"from_state": "requirement", "to_state": "development", "agent_id": "engineer"},
+        {"from_state": "requirement", "to_state": "test_planning", "agent_id": "qa_engineer"},
+        {"from_state": "development", "to_state": "testing", "agent_id": "qa_engineer"},
+        {"from_state": "test_planning", "to_state": "testing", "agent_id": "qa_engineer"}
+    ], name="parallel_test_workflow")
+
+
+@pytest.fixture
+def controller(make_workflow, make_controller):
+    return make_controller(make_workflow(parallel_workflow_config()), "scheduler-test")
+
+
+def test_dependency_graph_order():
+    graph = build_dependency_graph(CompiledWorkflow.compile(parallel_workflow_config()))
+
+    assert list(graph) == ["requirement", "development", "test_planning", "testing"]
+    assert graph["testing"].depends_on == {"development", "test_planning"}
+
+
+def test_dependency_graph_rejects_cycle():
+    config = parallel_workflow_config()
+    config["transitions"].append({"from_state": "testing", "to_state": "requirement", "agent_id": "product_manager"})
+
+    with pytest.raises(ValueError, match="cycle"):
+        build_dependency_graph(CompiledWorkflow.compile(config))
+
+
+def test_independent_branches_run_concurrently(controller, monkeypatch):
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_execute(self, agent_id, task_data, state=None):
+        with lock:
+            active.append(agent_id)
+            peak.append(len(active))
+        time.sleep(0.2)
+        with lock:
+            active.remove(agent_id)
+        return {**task_data, f"{agent_id}_output": state, "status": "success"}
+
+    monkeypatch.setattr(WorkflowController, "execute_agent_task", fake_execute)
+    events = []
+
+    started = time.perf_counter()
+    assert controller.run_dag(dict(controller.input_data), on_event=lambda e, s, a: events.append((e, s)))
+    elapsed = time.perf_counter() - started
+
+    # Critical path is three states, not four
+    assert elapsed < 0.75
+    assert max(peak) == 2
+    assert controller.current_state == "testing"
+    assert controller.session_state["completed_states"] == ["requirement", "development", "test_planning", "testing"]
+    assert ("completed", "testing") in events
+    assert controller.session_state["state_data"]["engineer_output"] == "requirement"
+
+
+def test_failed_branch_stops_downstream(controller, monkeypatch):
+    def fake_execute(self, agent_id, task_data, state=None):
+        status = "error" if agent_id == "engineer" else "success"
+        return {**task_data, "status": status}
+
+    monkeypatch.setattr(WorkflowController, "execute_agent_task", fake_execute)
+
+    assert not controller.run_dag(dict(controller.input_data))
+    assert "testing" not in controller.session_state["completed_states"]
+
+
+def test_merge_conflict_rules():
+    transition = {"from_state": "a", "to_state": "b", "agent_id": "x"}
+    first = StateNode(state="development", transition=transition, depends_on=frozenset(), rank=1)
+    second = StateNode(state="test_planning", transition=transition, depends_on=frozenset(), rank=2)
+    base = {"summary": "draft", "details": {"a": 1}, "status": "success", "last_updated": "2024-01-01"}
+    state_data = dict(base)
+    writers, conflicts = {}, []
+
+    merge_branch_result(state_data, base, {
+        **base, "summary": "from second", "details": {"a": 1, "b": 2}, "status": "error",
+        "last_updated": "2024-01-03"
+    }, second, writers, conflicts)
+    merge_branch_result(state_data, base, {
+        **base, "summary": "from first", "details": {"a": 1, "c": 3}, "code": "print()",
+        "last_updated": "2024-01-02"
+    }, first, writers, conflicts)
+
+    assert state_data["summary"] == "from second"
+    assert state_data["details"] == {"a": 1, "b": 2, "c": 3}
+    assert state_data["code"] == "print()"
+    assert state_data["status"] == "error"
+    assert state_data["last_updated"] == "2024-01-03"
+    assert conflicts == [{"field": "summary", "states": ["test_planning", "development"], "kept": "test_planning"}]
+
+
+def test_nested_changes_by_both_branches_are_conflicts():
+    transition = {"from_state": "a", "to_state": "b", "agent_id": "x"}
+    first = StateNode(state="development", transition=transition, depends_on=frozenset(), rank=1)
+    second = StateNode(state="test_planning", transition=transition, depends_on=frozenset(), rank=2)
+    base = {"content": {"raw_content": "pm", "meta": {"agent": "pm", "tokens": 1}}}
+    state_data = dict(base)
+    writers, conflicts = {}, []
+
+    merge_branch_result(state_data, base, {"content": {
+        "raw_content": "from second", "meta": {"agent": "qa", "tokens": 1}
+    }}, second, writers, conflicts)
+    merge_branch_result(state_data, base, {"content": {
+        "raw_content": "from first", "meta": {"agent": "pm", "tokens": 5}, "code": "print()"
+    }}, first, writers, conflicts)
+
+    assert state_data["content"] == {
+        "raw_content": "from second", "meta": {"agent": "qa", "tokens": 5}, "code": "print()"
+    }
+    assert conflicts == [{"field": "content.raw_content", "states": ["test_planning", "development"],
+                          "kept": "test_planning"}]
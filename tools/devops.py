@@ -81,16 +81,19 @@ class DevOpsTools(Tool):
             message="Environment diagnosis complete",
             data={"tools": results}
         )
-remote_config = RemoteConfig(
-    hostname="dev-server",
-    username="dev",
-    workspace_path="~/projects/my-project"
-)
 
-project_config = ProjectConfig(
-    repo_url="https://github.com/org/repo.git",
-    branch="develop"
-)
 
-devops_tools = DevOpsTools()
-result = devops_tools.setup_workspace(remote_config, project_config)
\ No newline at end of file
+if __name__ == "__main__":
+    remote_config = RemoteConfig(
+        hostname="dev-server",
+        username="dev",
+        workspace_path="~/projects/my-project"
+    )
+
+    project_config = ProjectConfig(
+        repo_url="https://github.com/org/repo.git",
+        branch="develop"
+    )
+
+    devops_tools = DevOpsTools()
+    result = devops_tools.setup_workspace(remote_config, project_config)
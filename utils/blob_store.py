@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Any, Iterable, Mapping, Optional, Set
+from phi.utils.log import logger
+from utils.json_processor import get_json_backend
+from utils.system_config import get_section, PROJECT_ROOT
+
+DEFAULT_BLOB_SUBDIR = "blobs"
+DEFAULT_THRESHOLD_BYTES = 16 * 1024
+# 引用中保留的预览长度（字符串的开头或对象的前几个键）
+PREVIEW_CHARS = 120
+# 设置为 1/0 可在不修改配置文件的情况下开启/关闭大字段外置
+BLOB_ENV_VAR = "NIMSHIP_BLOB_STORE"
+# 状态中代替大字段的引用以此键标记
+BLOB_REF_KEY = "$blob"
+# 未被引用的 blob 至少闲置这么久才回收，避免删除运行中会话刚写入、尚未进入检查点的 blob
+DEFAULT_GC_MIN_AGE_SECONDS = 24 * 3600
+_BLOB_REF_PATTERN = re.compile(r'"\$blob"\s*:\s*"([0-9a-f]{64})"')
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BLOB_REF_KEY in value
+
+
+def find_blob_refs(text: str) -> Set[str]:
+    """序列化后的文本（检查点、会话记录）中引用的 blob digest"""
+    return set(_BLOB_REF_PATTERN.findall(text))
+
+
+def _describe(value: Any) -> Dict[str, Any]:
+    """引用中保存的类型、长度和预览，不读取 blob 即可生成摘要"""
+    if isinstance(value, str):
+        return {"type": "text", "length": len(value), "preview": value[:PREVIEW_CHARS]}
+    if isinstance(value, dict):
+        return {"type": "object", "length": len(value), "preview": [str(key) for key in list(value)[:8]]}
+    if isinstance(value, (list, tuple)):
+        return {"type": "list", "length": len(value)}
+    return {"type": type(value).__name__}
+
+
+class BlobStore:
+    """本地文件系统上按内容寻址的 blob 存储，用于把大字段移出工作流状态
+
+    序列化后超过 threshold_bytes 的字段写入以 SHA-256 命名的文件（可选 zlib
+    压缩），状态中只保留带类型、大小和预览的小引用，需要完整内容时再通过
+    resolve 读取。相同内容只存一份，写入采用临时文件加重命名。
+    不再被任何会话引用的 blob 由 collect 回收。
+    """
+
+    def __init__(self, root: Optional[str] = None, threshold_bytes: int = DEFAULT_THRESHOLD_BYTES,
+                 compress: bool = True, enabled: bool = True,
+                 gc_min_age_seconds: float = DEFAULT_GC_MIN_AGE_SECONDS):
+        if root is None:
+            root = os.path.join(get_section("paths").get("storage_dir", "tmp"), DEFAULT_BLOB_SUBDIR)
+        if not os.path.isabs(root):
+            root = os.path.join(PROJECT_ROOT, root)
+        self.root = root
+        self.threshold_bytes = threshold_bytes
+        self.compress = compress
+        self.enabled = enabled
+        self.gc_min_age_seconds = gc_min_age_seconds
+        self.stats: Dict[str, int] = {"offloaded": 0, "deduplicated": 0, "bytes_written": 0, "resolved": 0,
+                                      "collected": 0}
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str, encoding: str) -> str:
+        suffix = ".json.z" if encoding == "zlib" else ".json"
+        return os.path.join(self.root, digest[:2], f"{digest}{suffix}")
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def put(self, data: bytes) -> Dict[str, Any]:
+        """写入原始字节（已存在则跳过），返回 digest、编码和原始大小"""
+        digest = hashlib.sha256(data).hexdigest()
+        encoding = "zlib" if self.compress else "raw"
+        path = self._path(digest, encoding)
+        try:
+            # 刷新修改时间，刚被再次引用的 blob 不会被 collect 当作闲置回收
+            os.utime(path)
+            self._count("deduplicated")
+        except FileNotFoundError:
+            stored = zlib.compress(data) if self.compress else data
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(stored)
+            os.replace(tmp_path, path)
+            self._count("bytes_written", len(stored))
+        return {BLOB_REF_KEY: digest, "encoding": encoding, "size": len(data)}
+
+    def get(self, digest: str, encoding: str = "zlib") -> bytes:
+        """读取 blob 的原始字节，文件不存在时抛出 FileNotFoundError"""
+        with open(self._path(digest, encoding), "rb") as f:
+            data = f.read()
+        return zlib.decompress(data) if encoding == "zlib" else data
+
+    def collect(self, referenced: Iterable[str], min_age_seconds: Optional[float] = None) -> Dict[str, int]:
+        """删除不在 referenced 中且超过 min_age_seconds（默认 gc_min_age_seconds）未写入的 blob 及遗留的临时文件
+
+        referenced 需覆盖所有使用此存储的会话和检查点引用的 digest（见
+        workflows.checkpoint.referenced_blobs）。返回删除的文件数和释放的字节数。
+        """
+        referenced = set(referenced)
+        if min_age_seconds is None:
+            min_age_seconds = self.gc_min_age_seconds
+        cutoff = time.time() - min_age_seconds
+        result = {"removed": 0, "bytes_freed": 0}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".tmp") and name.split(".", 1)[0] in referenced:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                result["removed"] += 1
+                result["bytes_freed"] += stat.st_size
+        self._count("collected", result["removed"])
+        if result["removed"]:
+            logger.info(f"Collected {result['removed']} unreferenced blobs ({result['bytes_freed']} bytes)")
+        return result
+
+    def offload(self, value: Any) -> Any:
+        """值序列化后超过阈值时写入 blob 并返回引用，否则原样返回"""
+        if not self.enabled or value is None or isinstance(value, (bool, int, float)) or is_blob_ref(value):
+            return value
+        # 每个字符编码后最多 6 字节（\uXXXX 转义），短字符串不必序列化即可判断
+        if isinstance(value, str) and len(value) * 6 + 2 <= self.threshold_bytes:
+            return value
+        data = get_json_backend().dumps(value).encode("utf-8")
+        if len(data) <= self.threshold_bytes:
+            return value
+        ref = self.put(data)
+        ref.update(_describe(value))
+        self._count("offloaded")
+        logger.debug(f"Offloaded {ref['type']} of {len(data)} bytes to blob {ref[BLOB_REF_KEY][:12]}")
+        return ref
+
+    def offload_fields(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """把 data 中的大字段原地替换为引用，返回 data"""
+        for key, value in data.items():
+            data[key] = self.offload(value)
+        return data
+
+    def resolve(self, value: Any) -> Any:
+        """引用返回 blob 中的完整值，其他值原样返回"""
+        if not is_blob_ref(value):
+            return value
+        data = self.get(value[BLOB_REF_KEY], value.get("encoding", "zlib"))
+        self._count("resolved")
+        return json.loads(data)
+
+    def resolve_fields(self, data: Mapping[str, Any], fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """返回 data 的浅拷贝，其中 fields（默认全部字段）的引用已替换为完整值"""
+        resolved = dict(data)
+        for key in (resolved if fields is None else fields):
+            if is_blob_ref(resolved.get(key)):
+                resolved[key] = self.resolve(resolved[key])
+        return resolved
+
+
+def blob_store_from_config() -> BlobStore:
+    """根据 system.config.json 的 blob_store 节构建 blob 存储，目录默认在 paths.storage_dir 下"""
+    settings = get_section("blob_store")
+    enabled = bool(settings.get("enabled", True))
+    override = os.environ.get(BLOB_ENV_VAR)
+    if override is not None:
+        enabled = override.strip().lower() in ("1", "true", "yes", "on")
+    return BlobStore(
+        root=settings.get("dir"),
+        threshold_bytes=settings.get("threshold_bytes", DEFAULT_THRESHOLD_BYTES),
+        compress=bool(settings.get("compress", True)),
+        enabled=enabled,
+        gc_min_age_seconds=settings.get("gc_min_age_seconds", DEFAULT_GC_MIN_AGE_SECONDS)
+    )
+
+
+_default_store: Optional[BlobStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """进程内共享的默认 blob 存储"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = blob_store_from_config()
+        return _default_store
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, AsyncIterator
+from utils.system_config import get_section
+
+DEFAULT_MODEL_CONCURRENCY = 8
+
+
+class ModelConcurrencyLimiter:
+    """按模型 ID 限制同一事件循环内的并发调用数"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = DEFAULT_MODEL_CONCURRENCY):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        # asyncio.Semaphore 绑定事件循环，因此按循环分别维护
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def limit_for(self, model_id: Optional[str]) -> int:
+        return self.limits.get(model_id or "", self.default_limit)
+
+    def _semaphore(self, model_id: Optional[str]) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.setdefault(loop, {})
+        key = model_id or ""
+        if key not in semaphores:
+            semaphores[key] = asyncio.Semaphore(self.limit_for(model_id))
+        return semaphores[key]
+
+    @asynccontextmanager
+    async def slot(self, model_id: Optional[str]) -> AsyncIterator[None]:
+        """占用一个模型调用名额，名额用尽时排队等待"""
+        async with self._semaphore(model_id):
+            yield
+
+
+def limiter_from_config() -> ModelConcurrencyLimiter:
+    """根据 system.config.json 的 models.max_concurrency 构建限流器"""
+    limits = dict(get_section("models").get("max_concurrency", {}))
+    default_limit = limits.pop("default", DEFAULT_MODEL_CONCURRENCY)
+    return ModelConcurrencyLimiter(limits=limits, default_limit=default_limit)
+
+
+_default_limiter: Optional[ModelConcurrencyLimiter] = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_default_limiter() -> ModelConcurrencyLimiter:
+    """进程内共享的默认限流器"""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = limiter_from_config()
+        return _default_limiter
@@ -0,0 +1,201 @@
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import threading
+from types import MappingProxyType, ModuleType
+from typing import Dict, Any, Callable, NamedTuple, Optional, Tuple
+from phi.utils.log import logger
+from utils.system_config import get_section, PROJECT_ROOT
+
+DEFAULT_BUNDLE_FILE = "tmp/config_bundle.pickle"
+# 缓存文件格式版本，格式变化时递增使旧文件失效
+BUNDLE_VERSION = 3
+# 设置为 0 可关闭磁盘缓存，只保留进程内缓存
+BUNDLE_ENV_VAR = "NIMSHIP_CONFIG_CACHE"
+
+
+class _Entry(NamedTuple):
+    mtime_ns: int
+    size: int
+    digest: str
+    data: Dict[str, Any]
+
+
+# (配置文件绝对路径, 派生类型, 内容哈希, 构建代码版本)
+DerivedKey = Tuple[str, str, str, str]
+
+
+def source_version(*modules: ModuleType) -> str:
+    """构建派生对象的模块源码的哈希，代码升级后旧的派生对象随之失效"""
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _mappingproxy(data: Dict[str, Any]) -> MappingProxyType:
+    return MappingProxyType(data)
+
+
+def _layout(value: Any) -> Tuple[str, ...]:
+    """派生对象的类名和 dataclass 字段，类定义变化后磁盘上的旧对象不再使用"""
+    cls = type(value)
+    return (cls.__module__, cls.__qualname__) + tuple(getattr(cls, "__dataclass_fields__", ()))
+
+
+class _BundlePickler(pickle.Pickler):
+    """支持只读映射（编译后的工作流由 MappingProxyType 组成）的 pickler"""
+
+    def reducer_override(self, obj: Any) -> Any:
+        if type(obj) is MappingProxyType:
+            return _mappingproxy, (dict(obj),)
+        return NotImplemented
+
+
+class ConfigBundle:
+    """已解析配置文件的缓存，进程内常驻并以 pickle 形式持久化到磁盘
+
+    每个文件按 (修改时间, 大小) 判断是否变化；两者变化但内容哈希不变时
+    （例如 git checkout 后）直接沿用已解析的结果。由配置派生的对象（如校验并
+    编译后的工作流）通过 derive 按内容哈希缓存，persist 为真时一并写入磁盘，
+    新进程无需重新校验和编译。返回的字典应视为只读。
+    """
+
+    def __init__(self, bundle_file: Optional[str] = None):
+        if bundle_file and not os.path.isabs(bundle_file):
+            bundle_file = os.path.join(PROJECT_ROOT, bundle_file)
+        self.bundle_file = bundle_file
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "rehashed": 0}
+        self._entries, self._persisted = self._read_bundle()
+        self._derived: Dict[DerivedKey, Any] = {key: value for key, (_, value) in self._persisted.items()}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if self.bundle_file:
+            # 冷启动时可能一次解析多个文件，退出时统一写回一次
+            atexit.register(self.save)
+
+    def _read_bundle(self) -> Tuple[Dict[str, _Entry], Dict[DerivedKey, Tuple[Tuple[str, ...], Any]]]:
+        if not self.bundle_file or not os.path.exists(self.bundle_file):
+            return {}, {}
+        try:
+            with open(self.bundle_file, "rb") as f:
+                version, entries, derived = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable config bundle {self.bundle_file}: {e}")
+            return {}, {}
+        if version != BUNDLE_VERSION:
+            return {}, {}
+        return entries, {key: (layout, value) for key, (layout, value) in derived.items() if layout == _layout(value)}
+
+    def save(self) -> None:
+        """将有变化的缓存写回磁盘（先写临时文件再原子替换）"""
+        with self._lock:
+            if not self.bundle_file:
+                return
+            self._prune()
+            if not self._dirty:
+                return
+            snapshot = dict(self._entries)
+            derived = dict(self._persisted)
+            self._dirty = False
+        tmp_path = f"{self.bundle_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.bundle_file), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                _BundlePickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump((BUNDLE_VERSION, snapshot, derived))
+            os.replace(tmp_path, self.bundle_file)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.warning(f"Failed to write config bundle {self.bundle_file}: {e}")
+
+    def _prune(self) -> None:
+        """丢弃已删除文件的条目，以及与文件当前内容不再对应的派生对象（调用方持有锁）"""
+        missing = [path for path in self._entries if not os.path.exists(path)]
+        for path in missing:
+            del self._entries[path]
+
+        def current(key: DerivedKey) -> bool:
+            entry = self._entries.get(key[0])
+            return entry is not None and entry.digest == key[2]
+
+        stale = [key for key in self._persisted if not current(key)]
+        for key in stale:
+            del self._persisted[key]
+        self._derived = {key: value for key, value in self._derived.items() if current(key)}
+        if missing or stale:
+            self._dirty = True
+
+    def _entry(self, path: str) -> _Entry:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self.stats["hits"] += 1
+                return entry
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        unchanged = entry is not None and entry.digest == digest
+        data = entry.data if unchanged else json.loads(raw)
+        entry = _Entry(stat.st_mtime_ns, stat.st_size, digest, data)
+        with self._lock:
+            self.stats["rehashed" if unchanged else "misses"] += 1
+            self._entries[path] = entry
+            self._dirty = True
+        return entry
+
+    def load_json(self, path: str) -> Dict[str, Any]:
+        """读取 JSON 配置文件，文件未变化时不再读取和解析"""
+        return self._entry(path).data
+
+    def load_versioned(self, path: str) -> Tuple[str, Dict[str, Any]]:
+        """返回 (内容哈希, 已解析的配置)，哈希可用作配置版本"""
+        entry = self._entry(path)
+        return entry.digest, entry.data
+
+    def derive(self, path: str, kind: str, build: Callable[[Dict[str, Any]], Any], persist: bool = False,
+               version: str = "") -> Any:
+        """返回由配置构建的派生对象，按文件内容哈希和 version 缓存，build 出错时不缓存
+
+        persist 为真时派生对象随缓存文件写入磁盘（需可 pickle），其类定义变化后自动失效；
+        构建逻辑变化时应同时改变 version（例如用 source_version 计算），否则新进程会沿用旧结果。
+        """
+        entry = self._entry(path)
+        key = (os.path.abspath(path), kind, entry.digest, version)
+        with self._lock:
+            if key in self._derived:
+                return self._derived[key]
+        value = build(entry.data)
+        with self._lock:
+            self._derived[key] = value
+            if persist:
+                self._persisted[key] = (_layout(value), value)
+                self._dirty = True
+        return value
+
+
+def bundle_from_config() -> ConfigBundle:
+    """根据 system.config.json 的 config_cache 节构建配置缓存"""
+    settings = get_section("config_cache")
+    enabled = bool(settings.get("enabled", True))
+    override = os.environ.get(BUNDLE_ENV_VAR)
+    if override is not None:
+        enabled = override.strip().lower() in ("1", "true", "yes", "on")
+    return ConfigBundle(settings.get("file", DEFAULT_BUNDLE_FILE) if enabled else None)
+
+
+_default_bundle: Optional[ConfigBundle] = None
+_default_bundle_lock = threading.Lock()
+
+
+def get_config_bundle() -> ConfigBundle:
+    """进程内共享的配置缓存"""
+    global _default_bundle
+    with _default_bundle_lock:
+        if _default_bundle is None:
+            _default_bundle = bundle_from_config()
+        return _default_bundle
@@ -1,8 +1,126 @@
 import json
-from typing import Dict, Any, Union
+import os
+import re
+from typing import Dict, Any, Union, List, Iterable, Optional, Callable
 from datetime import datetime
 from pydantic import BaseModel
 from phi.utils.log import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# 指定 JSON 后端（orjson / msgspec / stdlib），未设置时按该顺序选用已安装的第一个
+JSON_BACKEND_ENV_VAR = "NIMSHIP_JSON_BACKEND"
+
+_FENCED_BLOCK = re.compile(r"```(?:json|JSON)?[ \t]*\n(.*?)```", re.DOTALL)
+_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+_KEY_VALUE = re.compile(r"^[ \t]*[-*]?[ \t]*\**([A-Za-z][\w \t]*?)\**[ \t]*:\**[ \t]*(.+?)[ \t]*$", re.MULTILINE)
+_BULLET = re.compile(r"^[ \t]*(?:[-*+]|\d+[.)])[ \t]+(.*)$")
+
+
+def _normalize_key(text: str) -> str:
+    """将标题或键名规范化为 snake_case 以便与字段名比较"""
+    return re.sub(r"[^0-9a-z]+", "_", text.strip().strip("*_`").lower()).strip("_")
+
+
+def _serialize_item(obj: Any) -> Any:
+    """编码器无法直接处理的对象：datetime 转 ISO 字符串，pydantic 模型转字典，其余转字符串"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if hasattr(obj, '__str__'):
+        return str(obj)
+    return obj.__dict__ if hasattr(obj, '__dict__') else str(obj)
+
+
+class JsonBackend:
+    """JSON 编解码后端，dumps 输出 UTF-8 文本（不转义非 ASCII 字符）"""
+    name = "stdlib"
+
+    def dumps(self, data: Any, default: Callable[[Any], Any] = _serialize_item) -> str:
+        return json.dumps(data, default=default, ensure_ascii=False)
+
+    def loads(self, text: Union[str, bytes]) -> Any:
+        return json.loads(text)
+
+
+class OrjsonBackend(JsonBackend):
+    """orjson 后端：datetime 原生编码为 ISO 格式，与 stdlib 的 isoformat 结果一致"""
+    name = "orjson"
+
+    def dumps(self, data: Any, default: Callable[[Any], Any] = _serialize_item) -> str:
+        try:
+            return orjson.dumps(data, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # orjson.JSONEncodeError 是 TypeError 的子类；超过 64 位的整数、嵌套过深等 orjson 不支持的输入交给 stdlib
+            return super().dumps(data, default)
+
+    def loads(self, text: Union[str, bytes]) -> Any:
+        return orjson.loads(text)
+
+
+class MsgspecBackend(JsonBackend):
+    name = "msgspec"
+
+    def __init__(self):
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, data: Any, default: Callable[[Any], Any] = _serialize_item) -> str:
+        try:
+            return msgspec.json.encode(data, enc_hook=default).decode("utf-8")
+        except (TypeError, msgspec.EncodeError):
+            return super().dumps(data, default)
+
+    def loads(self, text: Union[str, bytes]) -> Any:
+        try:
+            return self._decoder.decode(text)
+        except msgspec.DecodeError as e:
+            raise json.JSONDecodeError(str(e), text if isinstance(text, str) else text.decode("utf-8", "replace"), 0)
+
+
+def available_backends() -> Dict[str, Callable[[], JsonBackend]]:
+    """已安装的后端，按优先级排列"""
+    backends: Dict[str, Callable[[], JsonBackend]] = {}
+    if orjson is not None:
+        backends["orjson"] = OrjsonBackend
+    if msgspec is not None:
+        backends["msgspec"] = MsgspecBackend
+    backends["stdlib"] = JsonBackend
+    return backends
+
+
+def select_backend(name: Optional[str] = None) -> JsonBackend:
+    """按名称创建后端，未指定时使用环境变量或优先级最高的已安装后端；指定的后端未安装时回退到 stdlib"""
+    backends = available_backends()
+    name = name or os.environ.get(JSON_BACKEND_ENV_VAR) or next(iter(backends))
+    if name not in backends:
+        logger.warning(f"JSON backend {name} is not installed, falling back to stdlib")
+        name = "stdlib"
+    return backends[name]()
+
+
+_backend: JsonBackend = select_backend()
+
+
+def get_json_backend() -> JsonBackend:
+    return _backend
+
+
+def set_json_backend(name: Optional[str] = None) -> JsonBackend:
+    """切换进程内使用的 JSON 后端并返回它"""
+    global _backend
+    _backend = select_backend(name)
+    return _backend
+
+
 class JsonProcessor:
     @staticmethod
     def clean_content(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -23,18 +141,9 @@ class JsonProcessor:
         return result
     @staticmethod
     def safe_serialize(data: Any) -> str:
-        """安全序列化为JSON字符串"""
+        """安全序列化为JSON字符串（使用当前 JSON 后端）"""
         try:
-            def serialize_item(obj):
-                if isinstance(obj, datetime):
-                    return obj.isoformat()
-                if isinstance(obj, BaseModel):
-                    return obj.model_dump()
-                if hasattr(obj, '__str__'):
-                    return str(obj)
-                return obj.__dict__ if hasattr(obj, '__dict__') else str(obj)
-                
-            return json.dumps(data, default=serialize_item, ensure_ascii=False)
+            return _backend.dumps(data)
         except Exception as e:
             logger.error(f"Serialization error: {str(e)}")
             return str(data)
@@ -42,7 +151,7 @@ class JsonProcessor:
     def safe_deserialize(json_str: str) -> Union[Dict[str, Any], list, str, int, bool, None]:
         """安全反序列化JSON字符串"""
         try:
-            return json.loads(json_str)
+            return _backend.loads(json_str)
         except json.JSONDecodeError:
             logger.error(f"Deserialization error for: {json_str}")
             return {"raw_data": json_str}
@@ -74,3 +183,238 @@ class JsonProcessor:
         except Exception as e:
             logger.error(f"Validation error: {str(e)}")
             return False
+
+    @staticmethod
+    def extract_json_blocks(text: str) -> List[Dict[str, Any]]:
+        """提取 markdown 代码块中的 JSON 对象；整段文本本身是 JSON 对象时也会返回"""
+        blocks = []
+        candidates = _FENCED_BLOCK.findall(text)
+        stripped = text.strip()
+        if stripped.startswith("{") and stripped.endswith("}"):
+            candidates.append(stripped)
+        for candidate in candidates:
+            try:
+                parsed = _backend.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                blocks.append(parsed)
+        return blocks
+
+    @staticmethod
+    def extract_sections(text: str) -> Dict[str, Any]:
+        """按 markdown 标题切分文本，键为规范化后的标题
+
+        纯列表的段落解析为字符串列表，其余为去除首尾空白的文本。
+        """
+        sections: Dict[str, Any] = {}
+        headings = list(_HEADING.finditer(text))
+        for i, match in enumerate(headings):
+            level = len(match.group(1))
+            end = len(text)
+            for following in headings[i + 1:]:
+                if len(following.group(1)) <= level:
+                    end = following.start()
+                    break
+            body = text[match.end():end].strip()
+            if not body:
+                continue
+            lines = [line for line in body.splitlines() if line.strip()]
+            bullets = [_BULLET.match(line) for line in lines]
+            if all(bullets):
+                value: Any = [b.group(1).strip() for b in bullets]
+            else:
+                value = body
+            sections.setdefault(_normalize_key(match.group(2)), value)
+        return sections
+
+    @staticmethod
+    def extract_fields(data: Dict[str, Any], fields: Iterable[str],
+                       text: Optional[str] = None) -> Dict[str, Any]:
+        """不调用模型，从已有数据中确定性地恢复缺失字段
+
+        依次查找：content 字典中的同名键、content.raw_content（或 text）里的
+        JSON 代码块、与字段名匹配的 markdown 标题段落、``字段名: 值`` 形式的行。
+        返回能够恢复的字段。
+        """
+        wanted = {_normalize_key(field): field for field in fields}
+        found: Dict[str, Any] = {}
+
+        def collect(candidates: Dict[str, Any]) -> None:
+            for key, value in candidates.items():
+                field = wanted.get(_normalize_key(str(key)))
+                if field is not None and field not in found and value not in (None, "", [], {}):
+                    found[field] = value
+
+        content = data.get("content") if isinstance(data, dict) else None
+        if isinstance(content, dict):
+            collect(content)
+        if text is None:
+            if isinstance(content, dict):
+                text = content.get("raw_content")
+            elif isinstance(content, str):
+                text = content
+        if len(found) == len(wanted) or not isinstance(text, str) or not text:
+            return found
+
+        for block in JsonProcessor.extract_json_blocks(text):
+            collect(block)
+        if len(found) < len(wanted):
+            collect(JsonProcessor.extract_sections(text))
+        if len(found) < len(wanted):
+            collect({key: value for key, value in _KEY_VALUE.findall(text)})
+        return found
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """删除对象和数组末尾多余的逗号（忽略字符串内的内容）"""
+    out: List[str] = []
+    in_string = escape = False
+    pending = None
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if pending is not None:
+            if ch.isspace():
+                pending.append(ch)
+                continue
+            if ch not in "}]":
+                out.append(",")
+            out.extend(pending)
+            pending = None
+        if ch == ",":
+            pending = []
+            continue
+        out.append(ch)
+        if ch == '"':
+            in_string = True
+    if pending is not None:
+        out.extend(pending)
+    return "".join(out)
+
+
+class IncrementalJsonExtractor:
+    """流式解析 LLM 输出中的 JSON 对象
+
+    每次 ``feed`` 只扫描新到达的字符，记录括号栈和字符串状态；顶层对象闭合时
+    立即解码，代码块标记和正文都会被跳过。解码失败时容忍末尾多余的逗号，
+    仍失败则视为正文中的 ``{`` 并从下一个字符重新查找。``finish`` 会修补被截断的
+    最后一个对象：补齐字符串和括号，或退回到最后一个完整的成员。
+    """
+
+    def __init__(self, required_fields: Iterable[str] = ()):
+        self.required_fields = tuple(required_fields)
+        self.objects: List[Dict[str, Any]] = []
+        # 所有已解码顶层对象合并后的字段
+        self.fields: Dict[str, Any] = {}
+        self._reset("")
+
+    def _reset(self, text: str) -> None:
+        self._text = text
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        # 当前对象内最后一个可以直接补齐括号的位置及对应的闭合括号
+        self._safe_end = 0
+        self._safe_closers = ""
+
+    @property
+    def missing(self) -> List[str]:
+        return [field for field in self.required_fields if field not in self.fields]
+
+    @property
+    def complete(self) -> bool:
+        """是否已解码出对象且所有必需字段都已出现"""
+        return bool(self.objects) and not self.missing
+
+    def _checkpoint(self, end: int) -> None:
+        self._safe_end = end
+        self._safe_closers = "".join(reversed(self._stack))
+
+    def _accept(self, text: str) -> Optional[Dict[str, Any]]:
+        for candidate in (text, _strip_trailing_commas(text)):
+            try:
+                parsed = _backend.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                self.objects.append(parsed)
+                self.fields.update(parsed)
+                return parsed
+            return None
+        return None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """追加一段文本，返回其中新闭合的顶层对象"""
+        completed: List[Dict[str, Any]] = []
+        text = self._text + chunk
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if not self._stack:
+                if ch == "{":
+                    # 丢弃对象之前的正文
+                    text, i = text[i:], 0
+                    self._stack.append("}")
+                    self._checkpoint(1)
+                i += 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._stack.append("}" if ch == "{" else "]")
+                self._checkpoint(i + 1)
+            elif ch in "}]" and ch == self._stack[-1]:
+                self._stack.pop()
+                if not self._stack:
+                    parsed = self._accept(text[:i + 1])
+                    if parsed is None:
+                        # 不是 JSON，当作正文里的 "{" 从下一个字符重新查找
+                        self._reset("")
+                        text, i = text[1:], 0
+                        continue
+                    completed.append(parsed)
+                    text, i = text[i + 1:], 0
+                    continue
+                self._checkpoint(i + 1)
+            elif ch == ",":
+                self._checkpoint(i)
+            i += 1
+        if not self._stack:
+            text, i = "", 0
+        self._text, self._pos = text, i
+        return completed
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """输入结束时修补并解码被截断的最后一个对象"""
+        completed: List[Dict[str, Any]] = []
+        while self._stack:
+            text = self._text
+            tail = text[:-1] if self._escape else text
+            repaired = tail + ('"' if self._in_string else "") + "".join(reversed(self._stack))
+            parsed = self._accept(repaired)
+            if parsed is None:
+                parsed = self._accept(text[:self._safe_end] + self._safe_closers)
+            if parsed is not None:
+                completed.append(parsed)
+                self._reset("")
+                break
+            # 开头的 "{" 只是正文，从下一个字符继续
+            self._reset("")
+            completed.extend(self.feed(text[1:]))
+        return completed
@@ -0,0 +1,162 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Optional
+from utils.system_config import get_section, PROJECT_ROOT
+
+DEFAULT_PAYLOAD_MODE = "fields"
+DEFAULT_MAX_PAYLOAD_CHARS = 2000
+
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def _describe(value: Any) -> str:
+    """单个值的简短描述，只用 O(1) 的信息（类型和长度）"""
+    if isinstance(value, (str, list, tuple, dict, set, bytes)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if value is None or isinstance(value, (bool, int, float)):
+        return repr(value)
+    return type(value).__name__
+
+
+def _clip(value: Any, budget: list, max_chars: int) -> Any:
+    """按字符预算截断嵌套结构，预算耗尽后不再遍历剩余内容"""
+    if budget[0] <= 0:
+        return "..."
+    if isinstance(value, str):
+        budget[0] -= min(len(value), max_chars)
+        return value if len(value) <= max_chars else value[:max_chars] + f"...(+{len(value) - max_chars} chars)"
+    if isinstance(value, dict):
+        clipped = {}
+        for key, item in value.items():
+            if budget[0] <= 0:
+                clipped["..."] = f"+{len(value) - len(clipped)} keys"
+                break
+            budget[0] -= len(str(key))
+            clipped[key] = _clip(item, budget, max_chars)
+        return clipped
+    if isinstance(value, (list, tuple)):
+        clipped = []
+        for item in value:
+            if budget[0] <= 0:
+                clipped.append(f"...(+{len(value) - len(clipped)} items)")
+                break
+            clipped.append(_clip(item, budget, max_chars))
+        return clipped
+    budget[0] -= 8
+    return value
+
+
+class LogPayload:
+    """延迟格式化的日志载荷，只有在日志真正输出时才序列化
+
+    - fields: 只记录字段名及其类型/长度（默认）
+    - hash: 在字段列表基础上附加内容哈希
+    - full: 输出按 max_chars 截断的 JSON
+    """
+
+    __slots__ = ("data", "mode", "max_chars")
+
+    def __init__(self, data: Any, mode: Optional[str] = None, max_chars: Optional[int] = None):
+        settings = get_section("logging")
+        self.data = data
+        self.mode = mode or settings.get("payload_mode", DEFAULT_PAYLOAD_MODE)
+        self.max_chars = max_chars or settings.get("max_payload_chars", DEFAULT_MAX_PAYLOAD_CHARS)
+
+    def _fields(self) -> str:
+        if isinstance(self.data, dict):
+            parts = []
+            for key, value in self.data.items():
+                parts.append(f"{key}: {_describe(value)}")
+                if sum(len(p) for p in parts) > self.max_chars:
+                    parts.append(f"... +{len(self.data) - len(parts)} fields")
+                    break
+            return "{" + ", ".join(parts) + "}"
+        return _describe(self.data)
+
+    def _full(self) -> str:
+        clipped = _clip(self.data, [self.max_chars], self.max_chars)
+        text = json.dumps(clipped, default=str, ensure_ascii=False)
+        if len(text) > self.max_chars:
+            text = text[:self.max_chars] + "...(truncated)"
+        return text
+
+    def _hash(self) -> str:
+        digest = hashlib.sha256(
+            json.dumps(self.data, default=str, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        return f"{self._fields()} sha256={digest}"
+
+    def __str__(self) -> str:
+        try:
+            if self.mode == "full":
+                return self._full()
+            if self.mode == "hash":
+                return self._hash()
+            return self._fields()
+        except Exception as e:
+            return f"<unformattable payload: {e}>"
+
+
+def log_payload(data: Any, mode: Optional[str] = None, max_chars: Optional[int] = None) -> LogPayload:
+    """将数据包装为延迟格式化的日志参数，配合 logger.info("...%s", payload) 使用"""
+    return LogPayload(data, mode=mode, max_chars=max_chars)
+
+
+def setup_logging(logger_names: tuple = ("phi",)) -> QueueListener:
+    """配置异步文件日志：调用方只入队，由后台线程写入按大小轮转的日志文件
+
+    根 logger 和 logger_names 中的 logger 都会写入同一个文件。
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = _start_listener(logger_names)
+            atexit.register(shutdown_logging)
+        return _listener
+
+
+def _start_listener(logger_names: tuple) -> QueueListener:
+
+    settings = get_section("logging")
+    log_dir = settings.get("dir") or get_section("paths").get("log_dir", "logs")
+    if not os.path.isabs(log_dir):
+        log_dir = os.path.join(PROJECT_ROOT, log_dir)
+    os.makedirs(log_dir, exist_ok=True)
+
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, settings.get("file", "workflow.log")),
+        maxBytes=settings.get("max_bytes", 10 * 1024 * 1024),
+        backupCount=settings.get("backup_count", 5),
+        encoding="utf-8"
+    )
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    level = getattr(logging, str(settings.get("level", "INFO")).upper(), logging.INFO)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    for name in logger_names:
+        logging.getLogger(name).addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def shutdown_logging() -> None:
+    """刷新队列中剩余的日志并停止后台写入线程"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None and _listener._thread is not None:
+            _listener.stop()
+        _listener = None
@@ -0,0 +1,221 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueListener
+from typing import Dict, Any, List, Optional, Iterator
+from utils.system_config import get_section, PROJECT_ROOT
+
+DEFAULT_METRICS_FILE = "metrics.jsonl"
+
+
+class _JsonlFormatter(logging.Formatter):
+    """记录在后台线程中才序列化为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+# 每个 JSONL 文件一个写入队列和后台线程（与 log_utils.setup_logging 相同的 QueueListener 方式），
+# 同一文件的多个记录器（例如批量运行的各个会话）共用
+_writers: Dict[str, "tuple[queue.Queue, QueueListener]"] = {}
+_writers_lock = threading.Lock()
+
+
+def _writer_queue(path: str) -> queue.Queue:
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+            handler.setFormatter(_JsonlFormatter())
+            records: queue.Queue = queue.Queue(-1)
+            listener = QueueListener(records, handler)
+            listener.start()
+            if not _writers:
+                atexit.register(shutdown_writers)
+            writer = _writers[path] = (records, listener)
+        return writer[0]
+
+
+def shutdown_writers() -> None:
+    """写完队列中剩余的记录并停止所有后台写入线程"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for _, listener in writers:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _token_count(value: Any) -> int:
+    """phidata 的 RunResponse.metrics 中每条 assistant 消息记录一个值，这里求和"""
+    if isinstance(value, (list, tuple)):
+        return sum(int(v or 0) for v in value)
+    return int(value or 0)
+
+
+def estimate_cost(model_id: Optional[str], input_tokens: int, output_tokens: int,
+                  prices: Optional[Dict[str, Dict[str, float]]] = None) -> Optional[float]:
+    """按 system.config.json 中 metrics.prices 的每千 token 单价估算费用，未配置单价返回 None"""
+    if prices is None:
+        prices = get_section("metrics").get("prices", {})
+    price = prices.get(model_id or "")
+    if not price:
+        return None
+    return (input_tokens / 1000 * price.get("input_per_1k", 0.0)
+            + output_tokens / 1000 * price.get("output_per_1k", 0.0))
+
+
+class MetricsRecorder:
+    """记录一次会话的耗时区间和 token 用量
+
+    每条记录追加写入 JSONL 文件（path 为 None 时只保存在内存中）：调用方只入队，
+    由后台线程序列化和写入，需要立即读取文件时先调用 flush()。
+    会话结束后可通过 summary() 汇总或 render_summary() 输出表格。
+    """
+
+    def __init__(self, session_id: Optional[str] = None, path: Optional[str] = None,
+                 prices: Optional[Dict[str, Dict[str, float]]] = None):
+        self.session_id = session_id
+        self.path = path
+        self.prices = prices
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = _writer_queue(path) if path else None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        record = {"session_id": self.session_id, "ts": time.time(), **record}
+        with self._lock:
+            self.records.append(record)
+        if self._queue is not None:
+            self._queue.put_nowait(logging.makeLogRecord({"msg": record}))
+
+    def flush(self) -> None:
+        """等待已记录的内容全部写入文件"""
+        if self._queue is not None:
+            self._queue.join()
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """记录代码块耗时；产出的字典可用于补充属性（例如池是否命中）"""
+        extra: Dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            yield extra
+        except BaseException:
+            extra["error"] = True
+            raise
+        finally:
+            self._write({
+                "type": "span",
+                "name": name,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                **attrs,
+                **extra
+            })
+
+    def record_usage(self, model_id: Optional[str], metrics: Optional[Dict[str, Any]], **attrs: Any) -> None:
+        """记录一次模型调用的 token 用量和估算费用"""
+        metrics = metrics or {}
+        input_tokens = _token_count(metrics.get("input_tokens"))
+        output_tokens = _token_count(metrics.get("output_tokens"))
+        self._write({
+            "type": "usage",
+            "model": model_id,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": estimate_cost(model_id, input_tokens, output_tokens, self.prices),
+            **attrs
+        })
+
+    def record_cache_hit(self, model_id: Optional[str], **attrs: Any) -> None:
+        """记录一次由响应缓存直接返回的调用；缓存的 metrics 属于原始调用，不计入用量和费用"""
+        self._write({"type": "cache_hit", "model": model_id, **attrs})
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """按区间名称、状态和模型汇总"""
+        spans: Dict[str, Dict[str, Any]] = {}
+        states: Dict[str, Dict[str, Any]] = {}
+        models: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            records = list(self.records)
+
+        for record in records:
+            if record["type"] == "span":
+                entry = spans.setdefault(record["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                entry["count"] += 1
+                entry["total_ms"] += record["duration_ms"]
+                entry["max_ms"] = max(entry["max_ms"], record["duration_ms"])
+                if record["name"] == "agent_run" and record.get("state"):
+                    state = states.setdefault(record["state"], {"runs": 0, "total_ms": 0.0,
+                                                                "input_tokens": 0, "output_tokens": 0, "cost": 0.0})
+                    state["runs"] += 1
+                    state["total_ms"] += record["duration_ms"]
+            elif record["type"] in ("usage", "cache_hit"):
+                model = models.setdefault(record.get("model") or "unknown", {
+                    "calls": 0, "cache_hits": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0
+                })
+                if record["type"] == "cache_hit":
+                    model["cache_hits"] += 1
+                    continue
+                model["calls"] += 1
+                model["input_tokens"] += record["input_tokens"]
+                model["output_tokens"] += record["output_tokens"]
+                model["cost"] += record["cost"] or 0.0
+                if record.get("state") in states:
+                    state = states[record["state"]]
+                    state["input_tokens"] += record["input_tokens"]
+                    state["output_tokens"] += record["output_tokens"]
+                    state["cost"] += record["cost"] or 0.0
+        return {"spans": spans, "states": states, "models": models}
+
+    def render_summary(self, console: Any = None) -> None:
+        """在终端输出汇总表格"""
+        from rich.console import Console
+        from rich.table import Table
+
+        console = console or Console()
+        summary = self.summary()
+
+        spans = Table(title="Time by phase")
+        for column in ("phase", "count", "total ms", "max ms"):
+            spans.add_column(column, justify="left" if column == "phase" else "right")
+        for name, entry in sorted(summary["spans"].items(), key=lambda item: -item[1]["total_ms"]):
+            spans.add_row(name, str(entry["count"]), f"{entry['total_ms']:.0f}", f"{entry['max_ms']:.0f}")
+        console.print(spans)
+
+        if summary["states"]:
+            states = Table(title="Agent time by state")
+            for column in ("state", "runs", "total ms", "input tokens", "output tokens", "cost"):
+                states.add_column(column, justify="left" if column == "state" else "right")
+            for name, entry in sorted(summary["states"].items(), key=lambda item: -item[1]["total_ms"]):
+                states.add_row(name, str(entry["runs"]), f"{entry['total_ms']:.0f}", str(entry["input_tokens"]),
+                               str(entry["output_tokens"]), f"${entry['cost']:.4f}")
+            console.print(states)
+
+        if summary["models"]:
+            models = Table(title="Usage by model")
+            for column in ("model", "calls", "cache hits", "input tokens", "output tokens", "cost"):
+                models.add_column(column, justify="left" if column == "model" else "right")
+            for name, entry in sorted(summary["models"].items()):
+                models.add_row(name, str(entry["calls"]), str(entry["cache_hits"]), str(entry["input_tokens"]),
+                               str(entry["output_tokens"]), f"${entry['cost']:.4f}")
+            console.print(models)
+
+
+def recorder_from_config(session_id: Optional[str] = None) -> MetricsRecorder:
+    """根据 system.config.json 的 metrics 节创建记录器，JSONL 写入日志目录"""
+    settings = get_section("metrics")
+    path = None
+    if settings.get("enabled", True):
+        log_dir = get_section("paths").get("log_dir", "logs")
+        if not os.path.isabs(log_dir):
+            log_dir = os.path.join(PROJECT_ROOT, log_dir)
+        os.makedirs(log_dir, exist_ok=True)
+        path = os.path.join(log_dir, settings.get("file", DEFAULT_METRICS_FILE))
+    return MetricsRecorder(session_id=session_id, path=path, prices=settings.get("prices", {}))
@@ -0,0 +1,214 @@
+import threading
+from typing import Dict, Any, Iterator, Optional, Tuple
+import boto3
+from botocore.config import Config
+from phi.model.aws.claude import Claude as BedrockClaude
+from phi.utils.log import logger
+from utils.rate_limiter import CHARS_PER_TOKEN, estimate_tokens, get_rate_limiter, retry_settings, retry_throttled
+from utils.system_config import get_section
+
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+
+# (区域, AWS profile)
+ClientKey = Tuple[Optional[str], Optional[str]]
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+class BedrockClientRegistry:
+    """进程内共享的 boto3 会话和 Bedrock runtime 客户端
+
+    boto3 客户端是线程安全的，同一区域和 profile 下的所有模型共用一个客户端，
+    从而共用凭证解析结果和 HTTP 连接池，并发会话复用已建立的 TLS 连接。
+    boto3 会话不是线程安全的，只在持锁时用于创建客户端。
+    """
+
+    def __init__(self, max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS, tcp_keepalive: bool = True,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 max_attempts: int = 1):
+        self.client_config = Config(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=tcp_keepalive,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            # 限流重试由 utils.rate_limiter 负责（会重新排队），botocore 默认不再重试
+            retries={"mode": "standard", "total_max_attempts": max_attempts}
+        )
+        self.stats: Dict[str, int] = {"clients": 0, "reused": 0}
+        self._sessions: Dict[ClientKey, boto3.Session] = {}
+        self._clients: Dict[ClientKey, Any] = {}
+        self._lock = threading.Lock()
+
+    def runtime_client(self, region: Optional[str] = None, profile: Optional[str] = None) -> Any:
+        """返回指定区域和 profile 的 bedrock-runtime 客户端，首次使用时创建"""
+        key = (region, profile)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.stats["reused"] += 1
+                return client
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = boto3.Session(region_name=region, profile_name=profile)
+            client = session.client(service_name="bedrock-runtime", config=self.client_config)
+            self._clients[key] = client
+            self.stats["clients"] += 1
+        logger.debug(f"Created shared bedrock-runtime client for region={region} profile={profile}")
+        return client
+
+
+class SharedClientClaude(BedrockClaude):
+    """Bedrock 上的 Claude 模型，runtime 客户端取自进程内共享的注册表
+
+    客户端不保存在模型实例上，模型（以及持有它的 agent）仍可以被深拷贝。
+    每次 Converse 调用先经进程内共享的 RPM/TPM 限流器排队，遇到限流错误时
+    按带抖动的指数退避重新排队重试。支持提示词缓存的模型会在请求中加入 cachePoint。
+    """
+    # 正在读取的流式响应，调用方提前放弃时由 close_stream 关闭
+    _active_stream: Optional[Iterator[Dict[str, Any]]] = None
+    # 最近一次调用实际应答的模型，路由切换或对冲后可能不是 id
+    _served_model: Optional[str] = None
+
+    @property
+    def next_model_id(self) -> str:
+        """下一次调用预计使用的模型 ID"""
+        return self.id
+
+    @property
+    def served_model_id(self) -> str:
+        """最近一次调用实际应答的模型 ID，尚未调用时为 id"""
+        return self._served_model or self.id
+
+    @property
+    def bedrock_runtime_client(self):
+        if self._bedrock_runtime_client is not None:
+            return self._bedrock_runtime_client
+        return get_client_registry().runtime_client(self.get_aws_region(), self.get_aws_profile())
+
+    def _converse(self, method: str, body: Dict[str, Any]) -> Any:
+        """经限流和限流重试调用 converse / converse_stream，body["modelId"] 决定使用的配额
+
+        TPM 只在第一次尝试时预约，被限流的重试只重新排队请求数；调用最终失败时退还预约。
+        """
+        limiter = get_rate_limiter()
+        model_id = body.get("modelId", self.id)
+        reserved = estimate_tokens(body)
+        if supports_prompt_cache(model_id):
+            body = with_cache_points(body)
+        attempts = [0]
+
+        def call() -> Any:
+            limiter.acquire(model_id, 0 if attempts[0] else reserved)
+            attempts[0] += 1
+            return getattr(self.bedrock_runtime_client, method)(**body)
+
+        try:
+            response = retry_throttled(call, sleep=limiter.sleep,
+                                       on_throttle=lambda e: limiter.record_throttle(model_id), **retry_settings())
+        except BaseException:
+            limiter.settle(model_id, reserved, 0)
+            raise
+        if method == "converse":
+            limiter.settle(model_id, reserved, response.get("usage", {}).get("totalTokens", reserved))
+        return response
+
+    def _settle_stream(self, model_id: str, body: Dict[str, Any], stream: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """透传流式事件，结束后用 metadata 事件中的实际用量修正 TPM 预约
+
+        流在 metadata 之前出错或被调用方放弃时，按输入估算加上已收到的输出文本结算。
+        """
+        reserved = estimate_tokens(body)
+        used: Optional[int] = None
+        output_chars = 0
+        try:
+            for event in stream:
+                usage = event.get("metadata", {}).get("usage")
+                if usage:
+                    used = usage.get("totalTokens", 0)
+                output_chars += len(event.get("contentBlockDelta", {}).get("delta", {}).get("text") or "")
+                yield event
+        finally:
+            # 关闭 botocore EventStream 的 HTTP 响应体，提前放弃时 Bedrock 停止生成
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            if used is None:
+                used = estimate_tokens(body, output=False) + output_chars // CHARS_PER_TOKEN
+            get_rate_limiter().settle(model_id, reserved, used)
+
+    def _track_stream(self, stream: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """透传 stream 并在读取期间记录它，供 close_stream 使用"""
+        self._active_stream = stream
+        try:
+            yield from stream
+        finally:
+            self._active_stream = None
+            stream.close()
+
+    def close_stream(self) -> None:
+        """关闭尚未读完的流式响应：关闭底层 EventStream 并结算限流预约
+
+        关闭 phidata 的 Agent.run 生成器只会把 GeneratorExit 抛给最外层，
+        内层的模型流要等垃圾回收才会关闭，因此提前停止时需要显式调用。
+        """
+        stream = self._active_stream
+        if stream is not None:
+            stream.close()
+
+    def invoke(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return self._converse("converse", body)
+
+    def invoke_stream(self, body: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        response = self._converse("converse_stream", body)
+        yield from self._track_stream(self._settle_stream(body.get("modelId", self.id), body,
+                                                          response.get("stream") or ()))
+
+
+def registry_from_config() -> BedrockClientRegistry:
+    """根据 system.config.json 的 models.bedrock 节构建客户端注册表"""
+    settings = get_section("models").get("bedrock", {})
+    return BedrockClientRegistry(
+        max_pool_connections=settings.get("max_pool_connections", DEFAULT_MAX_POOL_CONNECTIONS),
+        tcp_keepalive=settings.get("tcp_keepalive", True),
+        connect_timeout=settings.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        read_timeout=settings.get("read_timeout", DEFAULT_READ_TIMEOUT),
+        max_attempts=settings.get("max_attempts", 1)
+    )
+
+
+def supports_prompt_cache(model_id: str) -> bool:
+    """模型是否在 models.prompt_cache.models 中（也匹配 us./eu. 等跨区域推理配置前缀）"""
+    settings = get_section("models").get("prompt_cache", {})
+    if not settings.get("enabled", False):
+        return False
+    return any(model_id == m or model_id.endswith(f".{m}") for m in settings.get("models", ()))
+
+
+def with_cache_points(body: Dict[str, Any]) -> Dict[str, Any]:
+    """在系统提示词和工具定义之后加入 cachePoint，使这部分稳定前缀可被 Bedrock 提示词缓存复用"""
+    body = dict(body)
+    if body.get("system"):
+        body["system"] = list(body["system"]) + [CACHE_POINT]
+    tools = (body.get("toolConfig") or {}).get("tools")
+    if tools:
+        body["toolConfig"] = {**body["toolConfig"], "tools": list(tools) + [CACHE_POINT]}
+    return body
+
+
+def default_region() -> Optional[str]:
+    """system.config.json 中配置的默认区域，未配置时由 boto3 按环境变量解析"""
+    return get_section("models").get("bedrock", {}).get("region")
+
+
+_default_registry: Optional[BedrockClientRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> BedrockClientRegistry:
+    """进程内共享的默认客户端注册表"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = registry_from_config()
+        return _default_registry
@@ -1,16 +1,27 @@
-import json
 from typing import Dict, Any
-from phi.model.aws.claude import Claude as BedrockClaude
+from utils.config_bundle import get_config_bundle
 
 def load_model_from_config(config: Dict[str, Any]):
     model_type = config.get("type", "bedrock").lower()
     model_name = config.get("name", "anthropic.claude-instant-v1")
     
     if model_type == "bedrock":
-        return BedrockClaude(id=model_name)
+        # boto3 和 Bedrock 模型类较重，创建模型时才导入
+        from utils.model_clients import SharedClientClaude, default_region
+        region = config.get("region") or default_region()
+        candidates = config.get("candidates")
+        if candidates:
+            # 配置了候选模型时按延迟和错误率路由，name 为首选模型（默认第一个候选）
+            from utils.model_router import RoutedClaude
+            model_name = config.get("name", candidates[0])
+            candidates = [model_name] + [c for c in candidates if c != model_name]
+            return RoutedClaude(id=model_name, candidates=candidates, hedge=bool(config.get("hedge", False)),
+                                aws_region=region)
+        # 所有 agent 共用同一区域的 runtime 客户端及其连接池，见 system.config.json 的 models.bedrock
+        return SharedClientClaude(id=model_name, aws_region=region)
     else:
         raise ValueError(f"Unsupported model type: {model_type}. Only 'bedrock' is supported.")
 
 def load_agent_config(config_path: str) -> Dict[str, Any]:
-    with open(config_path, 'r') as f:
-        return json.load(f)
+    """读取 agent 配置（经配置缓存，文件未变化时不再解析），返回的字典应视为只读"""
+    return get_config_bundle().load_json(config_path)
@@ -0,0 +1,256 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait, FIRST_COMPLETED
+from typing import Dict, Any, Deque, Iterator, List, Optional, Tuple
+from pydantic import Field
+from phi.utils.log import logger
+from utils.model_clients import SharedClientClaude
+from utils.system_config import get_section
+
+DEFAULT_WINDOW = 100
+DEFAULT_MIN_SAMPLES = 5
+DEFAULT_MAX_ERROR_RATE = 0.5
+DEFAULT_COOLDOWN_SECONDS = 30.0
+DEFAULT_MIN_HEDGE_DELAY = 0.5
+HEDGE_WORKERS = 32
+
+
+class LatencyWindow:
+    """单个模型最近 window 次调用的延迟和成败记录"""
+
+    def __init__(self, size: int = DEFAULT_WINDOW):
+        self.latencies: Deque[float] = deque(maxlen=size)
+        self.outcomes: Deque[bool] = deque(maxlen=size)
+        self.last_error_at: Optional[float] = None
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.last_error_at = time.monotonic()
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class ModelRouter:
+    """按模型 ID 统计滚动 p50/p95 延迟和错误率，为候选模型排序
+
+    错误率超过 max_error_rate 的模型视为不健康，排在健康模型之后；
+    最后一次失败超过 cooldown_seconds 后重新参与排序，以便恢复后能再被选中。
+    样本不足 min_samples 的模型优先尝试，以尽快获得延迟数据。
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, min_samples: int = DEFAULT_MIN_SAMPLES,
+                 max_error_rate: float = DEFAULT_MAX_ERROR_RATE, cooldown_seconds: float = DEFAULT_COOLDOWN_SECONDS,
+                 min_hedge_delay: float = DEFAULT_MIN_HEDGE_DELAY):
+        self.window = window
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.min_hedge_delay = min_hedge_delay
+        self.stats: Dict[str, int] = {"hedged": 0, "hedge_wins": 0, "failovers": 0}
+        self._windows: Dict[str, LatencyWindow] = {}
+        self._lock = threading.Lock()
+
+    def _window(self, model_id: str) -> LatencyWindow:
+        window = self._windows.get(model_id)
+        if window is None:
+            window = self._windows[model_id] = LatencyWindow(self.window)
+        return window
+
+    def record(self, model_id: str, latency: float, ok: bool = True) -> None:
+        with self._lock:
+            self._window(model_id).record(latency, ok)
+
+    def count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def is_healthy(self, model_id: str) -> bool:
+        with self._lock:
+            return self._healthy(self._window(model_id))
+
+    def _healthy(self, window: LatencyWindow) -> bool:
+        if len(window.outcomes) < self.min_samples or window.error_rate < self.max_error_rate:
+            return True
+        return window.last_error_at is not None and time.monotonic() - window.last_error_at > self.cooldown_seconds
+
+    def rank(self, model_ids: List[str]) -> List[str]:
+        """候选模型按优先级排序：健康的在前，其中样本不足的优先，其余按 p95 升序，同级保持配置顺序"""
+        with self._lock:
+            def key(item):
+                index, model_id = item
+                window = self._window(model_id)
+                warm = len(window.latencies) >= self.min_samples
+                return (not self._healthy(window), warm, window.percentile(95) if warm else 0.0, index)
+            return [model_id for _, model_id in sorted(enumerate(model_ids), key=key)]
+
+    def hedge_delay(self, model_id: str) -> Optional[float]:
+        """发送对冲请求前等待的秒数（该模型的 p95），样本不足时返回 None 表示不对冲"""
+        with self._lock:
+            window = self._window(model_id)
+            if len(window.latencies) < self.min_samples:
+                return None
+            return max(window.percentile(95), self.min_hedge_delay)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                model_id: {
+                    "samples": len(window.outcomes),
+                    "p50": window.percentile(50),
+                    "p95": window.percentile(95),
+                    "error_rate": round(window.error_rate, 3),
+                    "healthy": self._healthy(window)
+                }
+                for model_id, window in self._windows.items()
+            }
+
+
+def router_from_config() -> ModelRouter:
+    """根据 system.config.json 的 models.routing 节构建路由器"""
+    settings = get_section("models").get("routing", {})
+    return ModelRouter(
+        window=settings.get("window", DEFAULT_WINDOW),
+        min_samples=settings.get("min_samples", DEFAULT_MIN_SAMPLES),
+        max_error_rate=settings.get("max_error_rate", DEFAULT_MAX_ERROR_RATE),
+        cooldown_seconds=settings.get("cooldown_seconds", DEFAULT_COOLDOWN_SECONDS),
+        min_hedge_delay=settings.get("min_hedge_delay", DEFAULT_MIN_HEDGE_DELAY)
+    )
+
+
+_default_router: Optional[ModelRouter] = None
+_default_router_lock = threading.Lock()
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_default_router() -> ModelRouter:
+    """进程内共享的默认路由器，所有 agent 的调用汇总到同一份延迟统计"""
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = router_from_config()
+        return _default_router
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="model-hedge")
+        return _hedge_executor
+
+
+class RoutedClaude(SharedClientClaude):
+    """在多个 Bedrock 候选模型间路由的 Claude 模型
+
+    路由发生在单次 Converse 调用（invoke）上：按 ModelRouter 的排序选择模型，
+    调用失败时依次换用下一个候选。开启 hedge 时，首选模型超过其 p95 仍未返回，
+    会向次选模型（只有一个候选时为同一模型）发送相同请求，先返回者胜出，
+    另一个请求被取消；已发出的 HTTP 请求无法中断，其结果被丢弃。
+    工具调用在 invoke 返回之后执行，因此对冲不会重复执行工具。
+    """
+    candidates: List[str] = Field(default_factory=list)
+    hedge: bool = False
+
+    @property
+    def router(self) -> ModelRouter:
+        return get_default_router()
+
+    @property
+    def next_model_id(self) -> str:
+        """路由器当前排在首位的候选模型，调用失败切换时实际应答的模型见 served_model_id"""
+        return self.router.rank(self.candidates or [self.id])[0]
+
+    def _call(self, method: str, body: Dict[str, Any], model_id: str) -> Any:
+        started = time.perf_counter()
+        try:
+            result = self._converse(method, {**body, "modelId": model_id})
+        except Exception:
+            self.router.record(model_id, time.perf_counter() - started, ok=False)
+            raise
+        if method == "converse":
+            self.router.record(model_id, time.perf_counter() - started, ok=True)
+        return result
+
+    def _hedged(self, body: Dict[str, Any], primary: str, backup: str) -> Tuple[str, Dict[str, Any]]:
+        """返回 (胜出的模型 ID, 响应)"""
+        delay = self.router.hedge_delay(primary)
+        if delay is None:
+            return primary, self._call("converse", body, primary)
+
+        first = _executor().submit(self._call, "converse", body, primary)
+        try:
+            return primary, first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        logger.debug(f"{primary} exceeded {delay:.2f}s, hedging with {backup}")
+        self.router.count("hedged")
+        second = _executor().submit(self._call, "converse", body, backup)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is second:
+                        self.router.count("hedge_wins")
+                        return backup, future.result()
+                    return primary, future.result()
+                error = future.exception()
+        raise error
+
+    def invoke(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        ranked = self.router.rank(self.candidates or [self.id])
+        error: Optional[Exception] = None
+        for index, model_id in enumerate(ranked):
+            try:
+                if self.hedge and index == 0:
+                    backup = ranked[1] if len(ranked) > 1 else model_id
+                    self._served_model, result = self._hedged(body, model_id, backup)
+                else:
+                    result = self._call("converse", body, model_id)
+                    self._served_model = model_id
+                return result
+            except Exception as e:
+                logger.warning(f"Model {model_id} failed: {e}")
+                error = e
+                if index + 1 < len(ranked):
+                    self.router.count("failovers")
+        raise error
+
+    def invoke_stream(self, body: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """流式调用只做路由和失败切换（建立流之前），不做对冲"""
+        ranked = self.router.rank(self.candidates or [self.id])
+        response = None
+        for index, model_id in enumerate(ranked):
+            started = time.perf_counter()
+            try:
+                response = self._call("converse_stream", body, model_id)
+                self._served_model = model_id
+                break
+            except Exception as e:
+                logger.warning(f"Model {model_id} failed: {e}")
+                if index + 1 == len(ranked):
+                    raise
+                self.router.count("failovers")
+
+        try:
+            yield from self._track_stream(self._settle_stream(model_id, body, response.get("stream") or ()))
+        except Exception:
+            self.router.record(model_id, time.perf_counter() - started, ok=False)
+            raise
+        self.router.record(model_id, time.perf_counter() - started, ok=True)
@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+from typing import Dict, Any, Callable, Optional, TypeVar
+from phi.utils.log import logger
+from utils.system_config import get_section
+
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+# 估算请求 token 数时每个 token 对应的字符数
+CHARS_PER_TOKEN = 4
+
+# Bedrock 在超出配额或容量不足时返回的错误码
+THROTTLING_ERROR_CODES = frozenset({
+    "ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException", "ModelNotReadyException"
+})
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """按分钟速率补充的令牌桶，采用预约方式扣减
+
+    reserve 立即扣除令牌（余额可以为负），返回调用方需要等待的秒数。
+    先预约的调用方等待时间更短，排队因此按到达顺序进行，不会有调用方被饿死。
+    调用方需自行加锁。
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        self._refill()
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """按实际用量修正已预约的数量，正数表示多用，负数表示退还"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class ModelRateLimiter:
+    """按模型 ID 同时限制每分钟请求数（RPM）和 token 数（TPM）
+
+    limits 为 {模型 ID: {"requests_per_minute": ..., "tokens_per_minute": ...}}，
+    未列出的模型使用 default。值为 None 表示不限制。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None,
+                 default: Optional[Dict[str, Any]] = None, sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limits = dict(limits or {})
+        self.default = dict(default or {})
+        self.sleep = sleep
+        self.clock = clock
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._buckets: Dict[str, Dict[str, Optional[TokenBucket]]] = {}
+        self._lock = threading.Lock()
+
+    def _model_buckets(self, model_id: str) -> Dict[str, Optional[TokenBucket]]:
+        buckets = self._buckets.get(model_id)
+        if buckets is None:
+            limits = {**self.default, **self.limits.get(model_id, {})}
+            rpm, tpm = limits.get("requests_per_minute"), limits.get("tokens_per_minute")
+            buckets = self._buckets[model_id] = {
+                "requests": TokenBucket(rpm, self.clock) if rpm else None,
+                "tokens": TokenBucket(tpm, self.clock) if tpm else None
+            }
+        return buckets
+
+    def acquire(self, model_id: str, tokens: int = 0) -> float:
+        """预约一次请求和 tokens 个 token，必要时排队等待，返回等待的秒数"""
+        with self._lock:
+            buckets = self._model_buckets(model_id)
+            wait = 0.0
+            if buckets["requests"] is not None:
+                wait = max(wait, buckets["requests"].reserve(1))
+            if buckets["tokens"] is not None and tokens:
+                wait = max(wait, buckets["tokens"].reserve(tokens))
+            stats = self.stats.setdefault(model_id, {"requests": 0, "waited_s": 0.0, "throttled": 0})
+            stats["requests"] += 1
+            stats["waited_s"] += wait
+        if wait > 0:
+            logger.debug(f"Rate limit for {model_id}: waiting {wait:.2f}s")
+            self.sleep(wait)
+        return wait
+
+    def settle(self, model_id: str, reserved: int, used: int) -> None:
+        """请求完成后用实际 token 用量修正 TPM 预约"""
+        with self._lock:
+            bucket = self._model_buckets(model_id)["tokens"]
+            if bucket is not None and used != reserved:
+                bucket.adjust(used - reserved)
+
+    def record_throttle(self, model_id: str) -> None:
+        with self._lock:
+            self.stats.setdefault(model_id, {"requests": 0, "waited_s": 0.0, "throttled": 0})["throttled"] += 1
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """判断异常是否为 Bedrock 限流或暂时容量不足（botocore ClientError 的错误码）"""
+    response = getattr(error, "response", None)
+    code = (response or {}).get("Error", {}).get("Code") if isinstance(response, dict) else None
+    return code in THROTTLING_ERROR_CODES
+
+
+def retry_throttled(call: Callable[[], T], max_retries: int = DEFAULT_MAX_RETRIES,
+                    base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                    sleep: Callable[[float], None] = time.sleep,
+                    on_throttle: Optional[Callable[[BaseException], None]] = None) -> T:
+    """调用 call，遇到限流错误时按带抖动的指数退避（full jitter）重试，其他错误直接抛出"""
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as e:
+            if not is_throttling_error(e) or attempt >= max_retries:
+                raise
+            if on_throttle is not None:
+                on_throttle(e)
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            attempt += 1
+            logger.warning(f"Model call throttled, retry {attempt}/{max_retries} in {delay:.2f}s")
+            sleep(delay)
+
+
+def estimate_tokens(body: Dict[str, Any], output: bool = True) -> int:
+    """估算一次 Converse 请求占用的 token：输入文本按字符数估算，output 为真时加上 maxTokens 输出预留"""
+    chars = sum(len(str(block.get("text") or "")) for message in body.get("messages", ())
+                for block in message.get("content", ()))
+    chars += sum(len(str(block.get("text") or "")) for block in body.get("system", ()))
+    return chars // CHARS_PER_TOKEN + (body.get("inferenceConfig", {}).get("maxTokens", 0) if output else 0)
+
+
+def limiter_from_config() -> ModelRateLimiter:
+    """根据 system.config.json 的 models.rate_limits 节构建限流器"""
+    limits = dict(get_section("models").get("rate_limits", {}))
+    default = limits.pop("default", {
+        "requests_per_minute": DEFAULT_REQUESTS_PER_MINUTE,
+        "tokens_per_minute": DEFAULT_TOKENS_PER_MINUTE
+    })
+    return ModelRateLimiter(limits=limits, default=default)
+
+
+def retry_settings() -> Dict[str, float]:
+    """system.config.json 中 models.retry 节的退避参数"""
+    settings = get_section("models").get("retry", {})
+    return {
+        "max_retries": settings.get("max_retries", DEFAULT_MAX_RETRIES),
+        "base_delay": settings.get("base_delay", DEFAULT_BASE_DELAY),
+        "max_delay": settings.get("max_delay", DEFAULT_MAX_DELAY)
+    }
+
+
+_default_limiter: Optional[ModelRateLimiter] = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> ModelRateLimiter:
+    """进程内共享的默认限流器，所有会话和 agent 的模型调用共用同一份配额"""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = limiter_from_config()
+        return _default_limiter
@@ -0,0 +1,22 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Any
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SYSTEM_CONFIG = os.path.join(PROJECT_ROOT, "config", "system.config.json")
+
+
+@lru_cache(maxsize=None)
+def load_system_config(config_file: str = DEFAULT_SYSTEM_CONFIG) -> Dict[str, Any]:
+    """加载系统配置（按路径缓存），返回的字典应视为只读"""
+    with open(config_file, 'r') as f:
+        return json.load(f)
+
+
+def get_section(name: str, config_file: str = DEFAULT_SYSTEM_CONFIG) -> Dict[str, Any]:
+    """读取系统配置中的某一节，配置文件缺失时返回空字典"""
+    try:
+        return load_system_config(config_file).get(name, {}) or {}
+    except FileNotFoundError:
+        return {}
@@ -0,0 +1,135 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Iterator, Tuple, Callable, Optional
+from phi.utils.log import logger
+from utils.metrics import recorder_from_config
+from .models import WorkflowStateData
+from .workflow_controller import WorkflowController
+
+DEFAULT_BATCH_WORKERS = 4
+
+ControllerFactory = Callable[[str, str], WorkflowController]
+
+
+def load_batch_inputs(source: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (input_id, input_data) from a directory of *.json files or a .jsonl file.
+
+    JSONL records use their ``id`` field as input id when present, otherwise
+    the line number.
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".json"):
+                with open(os.path.join(source, name), "r", encoding="utf-8") as f:
+                    yield os.path.splitext(name)[0], json.load(f)
+        return
+
+    with open(source, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield str(record.pop("id", line_no)), record
+
+
+@dataclass
+class BatchSummary:
+    """Throughput and latency of a finished batch"""
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    wall_seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    @property
+    def throughput_per_minute(self) -> float:
+        return self.total / self.wall_seconds * 60 if self.wall_seconds else 0.0
+
+    def format(self) -> str:
+        return (
+            f"{self.total} sessions ({self.succeeded} succeeded, {self.failed} failed) "
+            f"in {self.wall_seconds:.1f}s, {self.throughput_per_minute:.1f} sessions/min; "
+            f"latency p50 {self.percentile(50):.1f}s, p95 {self.percentile(95):.1f}s, "
+            f"max {max(self.latencies, default=0.0):.1f}s"
+        )
+
+
+def _default_controller(workflow_path: str, session_id: str) -> WorkflowController:
+    controller = WorkflowController(workflow_path=workflow_path, session_id=session_id)
+    controller.metrics = recorder_from_config(session_id)
+    return controller
+
+
+def _run_one(workflow_path: str, input_id: str, input_data: Dict[str, Any], session_id: str,
+             make_controller: ControllerFactory) -> Dict[str, Any]:
+    """Run a single session and describe its outcome as one JSONL record"""
+    started = time.perf_counter()
+    record: Dict[str, Any] = {"input_id": input_id, "session_id": session_id}
+    try:
+        controller = make_controller(workflow_path, session_id)
+        data = WorkflowStateData(**input_data).model_dump()
+        succeeded = controller.run_dag(data)
+        record.update({
+            "status": "success" if succeeded else "failed",
+            "final_state": controller.current_state,
+            "completed_states": controller.session_state.get("completed_states", []),
+            # Results are read outside the session, so offloaded fields are included in full
+            "state_data": controller.blob_store.resolve_fields(controller.session_state.get("state_data", {}))
+        })
+    except Exception as e:
+        logger.error(f"Batch input {input_id} raised: {str(e)}")
+        record.update({"status": "error", "error": str(e)})
+    record["duration_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(workflow_path: str, inputs: Iterator[Tuple[str, Dict[str, Any]]], output_path: str,
+              max_workers: int = DEFAULT_BATCH_WORKERS, make_controller: Optional[ControllerFactory] = None,
+              on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> BatchSummary:
+    """Run every input through the same workflow on a bounded thread pool.
+
+    Each session runs in its own controller; agents, model clients and the
+    concurrency limiter are shared through the process-wide defaults. A result
+    line is appended to ``output_path`` as soon as its session finishes.
+    """
+    make_controller = make_controller or _default_controller
+    batch_id = f"batch-{int(time.time())}"
+    summary = BatchSummary()
+    started = time.perf_counter()
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workflow-batch") as executor:
+        futures = [
+            executor.submit(_run_one, workflow_path, input_id, input_data, f"{batch_id}-{input_id}", make_controller)
+            for input_id, input_data in inputs
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            summary.total += 1
+            summary.latencies.append(record["duration_s"])
+            if record["status"] == "success":
+                summary.succeeded += 1
+            else:
+                summary.failed += 1
+            if on_result is not None:
+                on_result(record)
+
+    summary.wall_seconds = time.perf_counter() - started
+    logger.info(f"Batch {batch_id} finished: {summary.format()}")
+    return summary
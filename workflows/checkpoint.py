@@ -0,0 +1,276 @@
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Set
+from sqlalchemy import inspect, text, cast, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import MetaData, Table, Column
+from sqlalchemy.sql.expression import select, func
+from sqlalchemy.types import String, Integer, Float, Text
+from phi.utils.log import logger
+from utils.blob_store import BLOB_REF_KEY, find_blob_refs
+from utils.json_processor import get_json_backend
+
+# Controllers built concurrently (batch runs) share one engine; create each table once
+_create_lock = threading.Lock()
+
+# A session's checkpoints store the full state every this many transitions and only the changes in between
+DEFAULT_SNAPSHOT_INTERVAL = 10
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+
+def _encode(value: Any) -> str:
+    """Serialize one state field; values the JSON backend rejects are stored as their string form"""
+    try:
+        return get_json_backend().dumps(value)
+    except Exception:
+        return json.dumps(str(value))
+
+
+def _join(fields: Dict[str, str]) -> str:
+    """Build a JSON object from already serialized field values"""
+    return "{" + ", ".join(f"{json.dumps(str(key))}: {value}" for key, value in fields.items()) + "}"
+
+
+def _changes(previous: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "set": {key: value for key, value in state.items() if key not in previous or previous[key] != value},
+        "removed": [key for key in previous if key not in state],
+    }
+
+
+def referenced_blobs(db_engine: Engine) -> Set[str]:
+    """Digests of the blobs referenced from any table in the database
+
+    Every workflow's session and checkpoint tables are scanned, since all of
+    them offload into the same blob store; pass the result to ``BlobStore.collect``.
+    """
+    metadata = MetaData()
+    metadata.reflect(db_engine)
+    refs: Set[str] = set()
+    with db_engine.connect() as conn:
+        for table in metadata.tables.values():
+            columns = [cast(column, Text) for column in table.columns]
+            query = select(*columns).where(or_(*(column.contains(BLOB_REF_KEY) for column in columns)))
+            for row in conn.execute(query):
+                for value in row:
+                    if value:
+                        refs |= find_blob_refs(value)
+    return refs
+
+
+@dataclass
+class Checkpoint:
+    """State committed after one successful transition"""
+    session_id: str
+    seq: int
+    from_state: Optional[str]
+    to_state: str
+    agent_id: Optional[str]
+    state_data: Dict[str, Any]
+    completed_states: List[str]
+    # run_id of the agent response that produced this state
+    output_ref: Optional[str]
+    created_at: float
+    # SNAPSHOT rows store the whole state, DELTA rows only ``changes``
+    kind: str = SNAPSHOT
+    # Fields this transition set or removed: {"set": {...}, "removed": [...]}; None when not known
+    changes: Optional[Dict[str, Any]] = None
+    # Seconds the transition took, when the caller measured it
+    duration: Optional[float] = None
+
+
+class CheckpointStore:
+    """Append-only per-transition checkpoints, kept next to the phidata workflow sessions.
+
+    Uses the same SQLAlchemy engine as ``SqlWorkflowStorage`` so checkpoints
+    and session rows live in one database file. Every ``snapshot_interval``-th
+    checkpoint of a session stores the full state; the others store only the
+    fields that were added, changed or removed, and ``state_at`` replays them
+    from the nearest snapshot.
+    """
+
+    def __init__(self, db_engine: Engine, table_name: str,
+                 snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL):
+        self.db_engine = db_engine
+        self.table_name = table_name
+        self.snapshot_interval = max(1, int(snapshot_interval))
+        # Serialized fields of the last checkpoint this store wrote, per session: (seq, fields)
+        self._last_fields: Dict[str, tuple] = {}
+        self._fields_lock = threading.Lock()
+        self.table = Table(
+            table_name,
+            MetaData(),
+            Column("session_id", String, primary_key=True),
+            Column("seq", Integer, primary_key=True),
+            Column("from_state", String),
+            Column("to_state", String, nullable=False),
+            Column("agent_id", String),
+            Column("state_data", Text, nullable=False),
+            Column("completed_states", Text, nullable=False),
+            Column("output_ref", String),
+            Column("created_at", Float, nullable=False),
+            Column("kind", String, nullable=False, server_default=SNAPSHOT),
+            Column("duration", Float),
+        )
+        with _create_lock:
+            try:
+                self.table.create(self.db_engine, checkfirst=True)
+            except OperationalError:
+                # Another process created the table between the check and the create
+                if not inspect(self.db_engine).has_table(table_name):
+                    raise
+            self._add_missing_columns()
+
+    def _add_missing_columns(self) -> None:
+        """Upgrade tables written before delta checkpoints; their rows are all full snapshots"""
+        existing = {column["name"] for column in inspect(self.db_engine).get_columns(self.table_name)}
+        added = {
+            "kind": f"VARCHAR NOT NULL DEFAULT '{SNAPSHOT}'",
+            "duration": "FLOAT",
+        }
+        for name, ddl in added.items():
+            if name in existing:
+                continue
+            try:
+                with self.db_engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE "{self.table_name}" ADD COLUMN {name} {ddl}'))
+            except OperationalError:
+                # Another process added the column first
+                if name not in {c["name"] for c in inspect(self.db_engine).get_columns(self.table_name)}:
+                    raise
+
+    def save(self, session_id: str, from_state: Optional[str], to_state: str, agent_id: Optional[str],
+             state_data: Dict[str, Any], completed_states: List[str],
+             output_ref: Optional[str] = None, duration: Optional[float] = None) -> int:
+        """Durably append a checkpoint and return its sequence number"""
+        fields = {key: _encode(value) for key, value in state_data.items()}
+        with self.db_engine.begin() as conn:
+            last = conn.execute(
+                select(func.max(self.table.c.seq)).where(self.table.c.session_id == session_id)
+            ).scalar() or 0
+            seq = last + 1
+            previous = self._previous_fields(conn, session_id, last)
+            if previous is None or last % self.snapshot_interval == 0:
+                kind, payload = SNAPSHOT, _join(fields)
+            else:
+                changed = {key: value for key, value in fields.items() if previous.get(key) != value}
+                removed = [key for key in previous if key not in fields]
+                kind, payload = DELTA, f'{{"set": {_join(changed)}, "removed": {json.dumps(removed)}}}'
+            conn.execute(self.table.insert().values(
+                session_id=session_id,
+                seq=seq,
+                from_state=from_state,
+                to_state=to_state,
+                agent_id=agent_id,
+                state_data=payload,
+                completed_states=json.dumps(list(completed_states)),
+                output_ref=output_ref,
+                created_at=time.time(),
+                kind=kind,
+                duration=duration,
+            ))
+        with self._fields_lock:
+            self._last_fields[session_id] = (seq, fields)
+        logger.info(f"Checkpoint {seq} ({kind}, {len(payload)} bytes) saved for session {session_id}: "
+                    f"{from_state} -> {to_state}")
+        return seq
+
+    def _previous_fields(self, conn, session_id: str, last: int) -> Optional[Dict[str, str]]:
+        """Serialized fields of checkpoint ``last``, from memory unless another writer got there first"""
+        if not last:
+            return None
+        with self._fields_lock:
+            cached = self._last_fields.get(session_id)
+        if cached is not None and cached[0] == last:
+            return cached[1]
+        state = self._replay(conn, session_id, last)
+        return None if state is None else {key: _encode(value) for key, value in state.items()}
+
+    def _rows(self, conn, session_id: str, up_to: Optional[int] = None) -> list:
+        """Rows from the last snapshot at or before ``up_to`` (default: all rows) through ``up_to``"""
+        query = select(self.table).where(self.table.c.session_id == session_id)
+        if up_to is not None:
+            start = conn.execute(
+                select(func.max(self.table.c.seq)).where(
+                    self.table.c.session_id == session_id,
+                    self.table.c.kind == SNAPSHOT,
+                    self.table.c.seq <= up_to,
+                )
+            ).scalar()
+            if start is None:
+                return []
+            query = query.where(self.table.c.seq >= start, self.table.c.seq <= up_to)
+        return conn.execute(query.order_by(self.table.c.seq)).all()
+
+    @staticmethod
+    def _apply(state: Dict[str, Any], row) -> Dict[str, Any]:
+        """Return the state after ``row`` given the state before it"""
+        data = json.loads(row.state_data)
+        if row.kind == SNAPSHOT:
+            return data
+        state = dict(state)
+        state.update(data["set"])
+        for key in data["removed"]:
+            state.pop(key, None)
+        return state
+
+    def _replay(self, conn, session_id: str, seq: int) -> Optional[Dict[str, Any]]:
+        rows = self._rows(conn, session_id, up_to=seq)
+        if not rows or rows[-1].seq != seq:
+            return None
+        state: Dict[str, Any] = {}
+        for row in rows:
+            state = self._apply(state, row)
+        return state
+
+    def state_at(self, session_id: str, seq: int) -> Optional[Dict[str, Any]]:
+        """Rebuild the state committed by checkpoint ``seq``, or None if there is no such checkpoint"""
+        with self.db_engine.connect() as conn:
+            return self._replay(conn, session_id, seq)
+
+    def _to_checkpoint(self, row, state_data: Dict[str, Any], changes: Optional[Dict[str, Any]]) -> Checkpoint:
+        return Checkpoint(
+            session_id=row.session_id,
+            seq=row.seq,
+            from_state=row.from_state,
+            to_state=row.to_state,
+            agent_id=row.agent_id,
+            state_data=state_data,
+            completed_states=json.loads(row.completed_states),
+            output_ref=row.output_ref,
+            created_at=row.created_at,
+            kind=row.kind,
+            changes=changes,
+            duration=row.duration,
+        )
+
+    def latest(self, session_id: str) -> Optional[Checkpoint]:
+        """Return the last committed checkpoint of a session"""
+        with self.db_engine.connect() as conn:
+            last = conn.execute(
+                select(func.max(self.table.c.seq)).where(self.table.c.session_id == session_id)
+            ).scalar()
+            rows = self._rows(conn, session_id, up_to=last) if last is not None else []
+        if not rows:
+            return None
+        state: Dict[str, Any] = {}
+        for row in rows:
+            state = self._apply(state, row)
+        changes = json.loads(rows[-1].state_data) if rows[-1].kind == DELTA else None
+        return self._to_checkpoint(rows[-1], state, changes)
+
+    def history(self, session_id: str) -> List[Checkpoint]:
+        """Return all checkpoints of a session in commit order, each with its full state and changes"""
+        with self.db_engine.connect() as conn:
+            rows = self._rows(conn, session_id)
+        checkpoints = []
+        state: Dict[str, Any] = {}
+        for row in rows:
+            previous, state = state, self._apply(state, row)
+            changes = json.loads(row.state_data) if row.kind == DELTA else _changes(previous, state)
+            checkpoints.append(self._to_checkpoint(row, state, changes))
+        return checkpoints
@@ -0,0 +1,36 @@
+import time
+from dataclasses import dataclass, field, asdict
+from enum import Enum
+from typing import Dict, Any, Optional, Callable
+
+
+class WorkflowEventType(str, Enum):
+    """Events emitted by WorkflowController while a workflow runs"""
+
+    transition_started = "TransitionStarted"
+    token = "Token"
+    tool_call = "ToolCall"
+    transition_completed = "TransitionCompleted"
+    transition_failed = "TransitionFailed"
+    workflow_completed = "WorkflowCompleted"
+
+
+@dataclass(frozen=True)
+class WorkflowEvent:
+    event: WorkflowEventType
+    session_id: str
+    # State being produced by the transition, None for workflow-level events
+    state: Optional[str] = None
+    agent_id: Optional[str] = None
+    # Token text for token events
+    content: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = asdict(self)
+        result["event"] = self.event.value
+        return result
+
+
+EventSink = Callable[[WorkflowEvent], None]
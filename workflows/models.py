@@ -1,6 +1,20 @@
-from typing import List, Dict, Any, Optional, Union
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Union, Tuple, Type
 from datetime import datetime
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, create_model, field_validator
+
+# Type names accepted in a state's ``field_types``; undeclared fields accept any value
+FIELD_TYPES: Dict[str, Any] = {
+    "any": Any,
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "list": list,
+    "dict": dict,
+    "list[str]": List[str],
+    "list[dict]": List[Dict[str, Any]],
+}
 
 class AgentResponse(BaseModel):
     content: Optional[str] = None
@@ -27,3 +41,27 @@ class WorkflowStateData(BaseModel):
                 'format': 'markdown' if '#' in v else 'text'
             }
         return v
+
+
+class StateModel(BaseModel):
+    """Base of the generated per-state models; fields outside the state are ignored"""
+    model_config = ConfigDict(extra="ignore", populate_by_name=False)
+
+
+@lru_cache(maxsize=256)
+def build_state_model(state: str, required: Tuple[str, ...], optional: Tuple[str, ...],
+                      types: Tuple[Tuple[str, str], ...] = ()) -> Type[StateModel]:
+    """Generate (once per distinct spec) the pydantic model validating one state's fields.
+
+    Fields are declared under positional names with the state field name as
+    alias, so any field name is accepted, including ones that would shadow
+    BaseModel attributes.
+    """
+    declared = dict(types)
+    fields: Dict[str, Any] = {}
+    for index, name in enumerate(required):
+        fields[f"f{index}"] = (FIELD_TYPES[declared.get(name, "any")], Field(..., alias=name))
+    for index, name in enumerate(optional, start=len(required)):
+        fields[f"f{index}"] = (Optional[FIELD_TYPES[declared.get(name, "any")]], Field(None, alias=name))
+    model_name = "".join(part.title() for part in state.split("_")) + "StateData"
+    return create_model(model_name, __base__=StateModel, **fields)
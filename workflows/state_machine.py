@@ -0,0 +1,169 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Any, List, Tuple, Iterator, Mapping, Optional, FrozenSet, Type
+from .models import FIELD_TYPES, StateModel, build_state_model
+
+Transition = Mapping[str, Any]
+
+# Fields every agent sees unless the workflow declares its own ``shared_inputs``
+DEFAULT_SHARED_INPUTS = ("project_name", "project_description")
+# ``"inputs": "*"`` on a transition sends the whole state to its agent
+ALL_INPUTS = "*"
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively convert dicts and lists into read-only equivalents"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Inverse of _freeze, producing plain JSON-compatible structures"""
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledWorkflow(Mapping):
+    """Immutable, pre-indexed view of a workflow config.
+
+    Behaves like the original config mapping (``workflow["name"]``) while
+    exposing O(1) lookups for transitions, per-state field requirements and
+    agents. Build instances with ``CompiledWorkflow.compile``.
+    """
+    config: Mapping[str, Any]
+    edges: Mapping[Tuple[str, str], Transition] = field(repr=False)
+    outgoing: Mapping[str, Tuple[Transition, ...]] = field(repr=False)
+    required_fields: Mapping[str, Tuple[str, ...]] = field(repr=False)
+    optional_fields: Mapping[str, Tuple[str, ...]] = field(repr=False)
+    # Declared type names of a state's fields, sorted by field name
+    field_types: Mapping[str, Tuple[Tuple[str, str], ...]] = field(repr=False)
+    agents: Mapping[str, Mapping[str, Any]] = field(repr=False)
+    # State fields passed to each transition's agent; None means the whole state
+    input_fields: Mapping[Tuple[str, str], Optional[FrozenSet[str]]] = field(repr=False)
+
+    @classmethod
+    def compile(cls, config: Dict[str, Any]) -> "CompiledWorkflow":
+        """Index a validated workflow config, raising ValueError on dangling references"""
+        frozen = _freeze(config)
+        state_data = frozen["state_data"]
+        errors: List[str] = []
+
+        agents: Dict[str, Mapping[str, Any]] = {}
+        for agent in frozen["agents"]:
+            agent_id = agent.get("id")
+            if not agent_id or "config_path" not in agent:
+                errors.append(f"agent entry missing id or config_path: {dict(agent)}")
+            elif agent_id in agents:
+                errors.append(f"duplicate agent id: {agent_id}")
+            else:
+                agents[agent_id] = agent
+
+        if frozen["initial_state"] not in state_data:
+            errors.append(f"initial state not declared in state_data: {frozen['initial_state']}")
+
+        def state_fields(state: str) -> Tuple[str, ...]:
+            spec = state_data.get(state) or {}
+            return tuple(spec.get("required_fields", ())) + tuple(spec.get("optional_fields", ()))
+
+        field_types: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        for state, spec in state_data.items():
+            types = (spec or {}).get("field_types", {})
+            for name, type_name in types.items():
+                if type_name not in FIELD_TYPES:
+                    errors.append(f"state {state} declares unknown type for {name}: {type_name!r}")
+                elif name not in state_fields(state):
+                    errors.append(f"state {state} declares a type for undeclared field: {name}")
+            field_types[state] = tuple(sorted(types.items()))
+
+        projection = frozen.get("input_projection", True)
+        shared_inputs = frozen.get("shared_inputs", DEFAULT_SHARED_INPUTS)
+        edges: Dict[Tuple[str, str], Transition] = {}
+        outgoing: Dict[str, List[Transition]] = {}
+        input_fields: Dict[Tuple[str, str], Optional[FrozenSet[str]]] = {}
+        for transition in frozen["transitions"]:
+            from_state = transition.get("from_state")
+            to_state = transition.get("to_state")
+            for state in (from_state, to_state):
+                if state not in state_data:
+                    errors.append(f"transition {from_state} -> {to_state} references unknown state: {state}")
+            if transition.get("agent_id") not in agents:
+                errors.append(f"transition {from_state} -> {to_state} references unknown agent: {transition.get('agent_id')}")
+            if (from_state, to_state) in edges:
+                errors.append(f"duplicate transition: {from_state} -> {to_state}")
+            edges[(from_state, to_state)] = transition
+            outgoing.setdefault(from_state, []).append(transition)
+
+            inputs = transition.get("inputs", ())
+            if inputs != ALL_INPUTS and not (
+                isinstance(inputs, tuple) and all(isinstance(name, str) for name in inputs)
+            ):
+                errors.append(f"transition {from_state} -> {to_state} has invalid inputs: {inputs!r}")
+            elif not projection or inputs == ALL_INPUTS:
+                input_fields[(from_state, to_state)] = None
+            else:
+                input_fields[(from_state, to_state)] = frozenset(
+                    shared_inputs + state_fields(from_state) + state_fields(to_state) + inputs
+                )
+
+        if errors:
+            raise ValueError("; ".join(errors))
+
+        return cls(
+            config=frozen,
+            edges=MappingProxyType(edges),
+            outgoing=MappingProxyType({k: tuple(v) for k, v in outgoing.items()}),
+            required_fields=MappingProxyType({
+                state: tuple(spec.get("required_fields", ())) for state, spec in state_data.items()
+            }),
+            optional_fields=MappingProxyType({
+                state: tuple(spec.get("optional_fields", ())) for state, spec in state_data.items()
+            }),
+            field_types=MappingProxyType(field_types),
+            agents=MappingProxyType(agents),
+            input_fields=MappingProxyType(input_fields),
+        )
+
+    def transition(self, from_state: str, to_state: str) -> Optional[Transition]:
+        return self.edges.get((from_state, to_state))
+
+    def transitions_from(self, state: str) -> Tuple[Transition, ...]:
+        return self.outgoing.get(state, ())
+
+    def required_fields_for(self, state: str) -> Tuple[str, ...]:
+        return self.required_fields.get(state, ())
+
+    def state_model(self, state: str) -> Type[StateModel]:
+        """Pydantic model validating the fields ``state`` owns (built once per distinct state spec)"""
+        return build_state_model(state, self.required_fields_for(state), self.optional_fields.get(state, ()),
+                                 self.field_types.get(state, ()))
+
+    def input_fields_for(self, transition: Transition) -> Optional[FrozenSet[str]]:
+        """Fields of the accumulated state the transition's agent needs, or None for all of them.
+
+        The default is the shared inputs, the required and optional fields of
+        both ends of the transition and the transition's own ``inputs`` list.
+        """
+        return self.input_fields.get((transition["from_state"], transition["to_state"]))
+
+    def agent(self, agent_id: str) -> Optional[Mapping[str, Any]]:
+        return self.agents.get(agent_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a mutable deep copy of the original config"""
+        return _thaw(self.config)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.config[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.config)
+
+    def __len__(self) -> int:
+        return len(self.config)
@@ -0,0 +1,153 @@
+import threading
+from collections.abc import Mapping, MutableMapping
+from typing import Dict, Any, Iterator, List, Optional
+
+# Versions chained deeper than this are flattened into a new root on the next change
+MAX_CHAIN_DEPTH = 16
+
+_MISSING = object()
+
+
+class StateVersion(Mapping):
+    """Immutable version of the workflow state data.
+
+    A version stores only the top-level fields that changed relative to its
+    parent and shares everything else, including unchanged nested values, by
+    reference. ``evolve`` therefore costs as much as the change, not the
+    state; every ``MAX_CHAIN_DEPTH`` changes the chain is flattened once to
+    keep lookups short. Values are shared between versions and must be
+    replaced, never mutated in place.
+    """
+
+    __slots__ = ("_parent", "_changes", "_depth", "_size", "version")
+
+    def __init__(self, data: Optional[Mapping] = None, *, _parent: Optional["StateVersion"] = None,
+                 _size: Optional[int] = None, version: int = 0):
+        self._parent = _parent
+        self._changes: Dict[str, Any] = dict(data or {})
+        self._depth = 0 if _parent is None else _parent._depth + 1
+        self._size = len(self._changes) if _size is None else _size
+        self.version = version
+
+    def __getitem__(self, key: str) -> Any:
+        node = self
+        while node is not None:
+            value = node._changes.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            node = node._parent
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_dict())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __repr__(self) -> str:
+        return f"StateVersion(version={self.version}, fields={self._size})"
+
+    def _chain(self) -> List["StateVersion"]:
+        chain, node = [], self
+        while node is not None:
+            chain.append(node)
+            node = node._parent
+        return chain
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow copy of the state as a plain dict; nested values stay shared"""
+        if self._parent is None:
+            return dict(self._changes)
+        flat: Dict[str, Any] = {}
+        for node in reversed(self._chain()):
+            flat.update(node._changes)
+        return flat
+
+    def evolve(self, changes: Mapping) -> "StateVersion":
+        """Return a new version with ``changes`` applied, or this one if nothing changed"""
+        changed = {key: value for key, value in changes.items() if self.get(key, _MISSING) is not value}
+        if not changed:
+            return self
+        if self._depth >= MAX_CHAIN_DEPTH:
+            flat = self.to_dict()
+            flat.update(changed)
+            return StateVersion(flat, version=self.version + 1)
+        added = sum(1 for key in changed if key not in self)
+        return StateVersion(changed, _parent=self, _size=self._size + added, version=self.version + 1)
+
+    def diff(self, base: "StateVersion") -> Dict[str, Any]:
+        """Fields whose value differs from ``base``.
+
+        Walks the chain back to ``base`` when it is an ancestor, so the cost is
+        that of the changes in between; otherwise compares every field by
+        identity.
+        """
+        changed: Dict[str, Any] = {}
+        node = self
+        while node is not None and node is not base:
+            for key, value in node._changes.items():
+                changed.setdefault(key, value)
+            node = node._parent
+        if node is None:
+            return {key: value for key, value in self.to_dict().items() if base.get(key, _MISSING) is not value}
+        return {key: value for key, value in changed.items() if base.get(key, _MISSING) is not value}
+
+
+class StateDraft(MutableMapping):
+    """Mutable view over a StateVersion that records writes for ``StateStore.commit``"""
+
+    def __init__(self, base: StateVersion):
+        self.base = base
+        self.writes: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.writes:
+            return self.writes[key]
+        return self.base[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.writes[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("workflow state fields cannot be removed")
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.base
+        yield from (key for key in self.writes if key not in self.base)
+
+    def __len__(self) -> int:
+        return len(self.base) + sum(1 for key in self.writes if key not in self.base)
+
+
+class StateStore:
+    """Head of the workflow state history for one run.
+
+    Branches fork the current head for free and their merged results are
+    committed as new versions; old versions stay valid for as long as
+    something references them.
+    """
+
+    def __init__(self, data: Optional[Mapping] = None):
+        self._head = data if isinstance(data, StateVersion) else StateVersion(data)
+        self._lock = threading.Lock()
+
+    @property
+    def head(self) -> StateVersion:
+        return self._head
+
+    def fork(self) -> StateVersion:
+        """Snapshot of the current state for a branch to start from"""
+        return self._head
+
+    def draft(self) -> StateDraft:
+        return StateDraft(self._head)
+
+    def commit(self, changes: Mapping) -> StateVersion:
+        """Apply ``changes`` (a mapping or a StateDraft) on top of the current head"""
+        writes = changes.writes if isinstance(changes, StateDraft) else changes
+        with self._lock:
+            self._head = self._head.evolve(writes)
+            return self._head
@@ -1,46 +1,447 @@
 from datetime import datetime
-from typing import Dict, Any, Optional
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import (
+    Dict, Any, Optional, Iterator, List, FrozenSet, Callable, Tuple, Mapping, MutableMapping, NamedTuple,
+    Awaitable, Generator, AsyncIterator
+)
 from pathlib import Path
+import asyncio
 import os
+import queue
+import threading
+import time
 import json
+from phi.agent import RunResponse
+from phi.run.response import RunEvent
 from phi.workflow import Workflow
 from phi.storage.workflow.sqlite import SqlWorkflowStorage
-from pydantic import Field
+from pydantic import Field, PrivateAttr, ValidationError
 from phi.utils.log import logger
 from .workflow_loader import WorkflowConfigLoader
+from .state_machine import CompiledWorkflow, Transition, DEFAULT_SHARED_INPUTS
+from .checkpoint import CheckpointStore, DEFAULT_SNAPSHOT_INTERVAL, referenced_blobs
+from .state_store import StateStore, StateVersion
+from .events import WorkflowEvent, WorkflowEventType, EventSink
 from agents.base_agent import NimshipAgent
-from utils.json_processor import JsonProcessor
+from agents.agent_pool import AgentPool, get_default_pool
+from utils.blob_store import BlobStore, get_blob_store, is_blob_ref
+from utils.concurrency import ModelConcurrencyLimiter, get_default_limiter
+from utils.json_processor import JsonProcessor, IncrementalJsonExtractor
+from utils.log_utils import log_payload
+from utils.metrics import MetricsRecorder
+from utils.system_config import get_section
 
 
-def json_serial(obj):
-    """JSON serializer for objects not serializable by default json code"""
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
+DEFAULT_MAX_PARALLEL_BRANCHES = 4
+# Session database used when no storage is passed in
+DEFAULT_DB_FILE = "tmp/workflows.db"
+# Fields every agent run rewrites; merged by rule instead of treated as conflicts
+BOOKKEEPING_FIELDS = ("status", "last_updated")
+_MISSING = object()
+# Strings longer than this are summarised when a field is projected out of an agent's input
+SUMMARY_PREVIEW_CHARS = 120
+# RunResponse bookkeeping merged into the state by earlier agents; never useful as agent input
+RUN_RESPONSE_FIELDS = frozenset({
+    "content_type", "event", "messages", "metrics", "model", "run_id", "agent_id", "session_id",
+    "workflow_id", "tools", "images", "videos", "audio", "response_audio", "extra_data", "created_at"
+})
+# Serializes session table creation when many controllers start at once (batch runs)
+_storage_init_lock = threading.Lock()
+# State produced by the transition running in the current thread or task, used to tag streamed events
+_event_state: ContextVar[Optional[str]] = ContextVar("workflow_event_state", default=None)
+# Required fields of that state missing from the transition's input, i.e. the ones its agent has to produce
+_pending_fields: ContextVar[Tuple[str, ...]] = ContextVar("workflow_pending_fields", default=())
+_SCHEDULER_EVENTS = {
+    "started": WorkflowEventType.transition_started,
+    "completed": WorkflowEventType.transition_completed,
+    "failed": WorkflowEventType.transition_failed,
+}
+
+
+@contextmanager
+def _producing(state: str, pending: Tuple[str, ...] = ()) -> Iterator[None]:
+    """Tag events, spans and usage recorded inside the block with the state being produced"""
+    token = _event_state.set(state)
+    pending_token = _pending_fields.set(pending)
+    try:
+        yield
+    finally:
+        _pending_fields.reset(pending_token)
+        _event_state.reset(token)
+
+
+def _model_id(agent: NimshipAgent, attribute: str) -> Optional[str]:
+    """Model id an agent's model reports through ``attribute``, else its configured id
+
+    Routed models answer from whichever candidate the router picks, so
+    ``next_model_id`` and ``served_model_id`` can differ from ``model.id``.
+    """
+    model = agent.model
+    if model is None:
+        return None
+    return getattr(model, attribute, None) or model.id
+
+
+@dataclass(frozen=True)
+class StateNode:
+    """A schedulable state together with the transition that enters it"""
+    state: str
+    transition: Transition
+    depends_on: FrozenSet[str]
+    # Declaration order of the entering transition; later declarations win merge conflicts
+    rank: int
+
+
+class _Step(NamedTuple):
+    """One unit of work yielded by a controller step generator.
+
+    The synchronous driver calls ``run``. The async driver awaits ``arun``
+    when there is one and otherwise runs ``run`` in a worker thread, so
+    blocking I/O (SQLite, blob files, agent construction) stays off the loop.
+    """
+    run: Callable[..., Any]
+    arun: Optional[Callable[..., Awaitable[Any]]]
+    args: tuple
+
+
+# Generators of _Step that return the operation's result
+Steps = Generator[_Step, Any, Any]
+
+
+def _drive(steps: Steps) -> Any:
+    """Run a step generator to completion in the calling thread"""
+    result, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error is not None else steps.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            result = step.run(*step.args)
+        except Exception as e:
+            error = e
+
+
+async def _adrive(steps: Steps) -> Any:
+    """Run a step generator to completion on the event loop"""
+    result, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error is not None else steps.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            if step.arun is not None:
+                result = await step.arun(*step.args)
+            else:
+                result = await asyncio.to_thread(step.run, *step.args)
+        except Exception as e:
+            error = e
+
+
+def build_dependency_graph(workflow: CompiledWorkflow) -> Dict[str, StateNode]:
+    """Read the transitions reachable from the initial state as a dependency graph.
+
+    A state depends on every state that has a transition into it. States are
+    returned in topological order; cycles raise ValueError.
+    """
+    initial_state = workflow["initial_state"]
+    incoming: Dict[str, List[tuple]] = {}
+    reachable = {initial_state}
+    frontier = [initial_state]
+    while frontier:
+        state = frontier.pop()
+        for transition in workflow.transitions_from(state):
+            to_state = transition["to_state"]
+            if to_state not in reachable:
+                reachable.add(to_state)
+                frontier.append(to_state)
+
+    for rank, transition in enumerate(workflow["transitions"]):
+        if transition["from_state"] in reachable:
+            incoming.setdefault(transition["to_state"], []).append((rank, transition))
+
+    nodes: Dict[str, StateNode] = {}
+    for state, entries in incoming.items():
+        agent_ids = {t["agent_id"] for _, t in entries}
+        if len(agent_ids) > 1:
+            raise ValueError(f"State {state} is entered by different agents: {sorted(agent_ids)}")
+        rank, transition = entries[0]
+        nodes[state] = StateNode(
+            state=state,
+            transition=transition,
+            depends_on=frozenset(t["from_state"] for _, t in entries),
+            rank=max(r for r, _ in entries)
+        )
+
+    ordered: Dict[str, StateNode] = {}
+    done = {initial_state}
+    remaining = dict(nodes)
+    while remaining:
+        ready = [s for s, node in remaining.items() if node.depends_on <= done]
+        if not ready:
+            raise ValueError(f"Workflow transitions contain a cycle through: {sorted(remaining)}")
+        for state in ready:
+            ordered[state] = remaining.pop(state)
+            done.add(state)
+    return ordered
+
+
+def summarize_value(value: Any) -> Any:
+    """Short stand-in for a state field left out of an agent's input"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if is_blob_ref(value):
+        # Offloaded fields are summarised from their reference without reading the blob
+        if value.get("type") == "text":
+            return f"text, {value['length']} chars: {value['preview']}..."
+        if value.get("type") == "object":
+            keys = ", ".join(value["preview"])
+            return f"object with {value['length']} keys: {keys}{', ...' if value['length'] > 8 else ''}"
+        if value.get("type") == "list":
+            return f"list of {value['length']} items"
+        return f"{value.get('type')}, {value.get('size')} bytes"
+    if isinstance(value, str):
+        if len(value) <= SUMMARY_PREVIEW_CHARS:
+            return value
+        return f"text, {len(value)} chars: {value[:SUMMARY_PREVIEW_CHARS]}..."
+    if isinstance(value, dict):
+        keys = ", ".join(list(map(str, value))[:8])
+        return f"object with {len(value)} keys: {keys}{', ...' if len(value) > 8 else ''}"
+    if isinstance(value, (list, tuple)):
+        return f"list of {len(value)} items"
+    return type(value).__name__
+
+
+def project_input(data: Dict[str, Any], fields: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+    """Keep ``fields`` of the state in full and summarise the rest under ``omitted_fields``.
+
+    ``fields=None`` returns the state unchanged.
+    """
+    if fields is None:
+        return data
+    projected = {key: value for key, value in data.items() if key in fields}
+    omitted = {
+        key: summarize_value(value) for key, value in data.items()
+        if key not in fields and key not in RUN_RESPONSE_FIELDS
+    }
+    if omitted:
+        projected["omitted_fields"] = omitted
+    return projected
+
+
+def prompt_layout(payload: Dict[str, Any], leading: Tuple[str, ...]) -> Dict[str, Any]:
+    """Order an agent input so it serialises the same way whatever order the state was built in.
+
+    ``leading`` fields (the workflow's shared inputs, which rarely change)
+    come first, then the remaining fields by name, with ``omitted_fields`` last,
+    so the most volatile content sits at the end of the prompt.
+    """
+    ordered = {key: payload[key] for key in leading if key in payload}
+    for key in sorted(k for k in payload if k not in ordered and k != "omitted_fields"):
+        ordered[key] = payload[key]
+    if "omitted_fields" in payload:
+        ordered["omitted_fields"] = payload["omitted_fields"]
+    return ordered
+
+
+def _record_conflict(conflicts: List[Dict[str, Any]], field: str, writer: StateNode, node: StateNode) -> bool:
+    """Record that two branches wrote different values to ``field``; True if ``node``'s value is kept"""
+    winner = node if node.rank > writer.rank else writer
+    conflicts.append({"field": field, "states": [writer.state, node.state], "kept": winner.state})
+    logger.warning(f"Merge conflict on '{field}' between {writer.state} and {node.state}, keeping {winner.state}")
+    return winner is node
+
+
+def _merge_dict_changes(current: Dict[str, Any], incoming: Dict[str, Any], base: Any, field: str,
+                        writer: StateNode, node: StateNode, conflicts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Three-way merge of two branches' versions of a dict field against the snapshot both started from.
+
+    Keys only one branch changed keep that change and nested dicts are merged
+    key by key; a key both branches changed to different values is a conflict
+    recorded under its dotted path.
+    """
+    base = base if isinstance(base, dict) else {}
+    merged = dict(current)
+    for key, value in incoming.items():
+        base_value = base.get(key, _MISSING)
+        if value is base_value or value == base_value:
+            continue
+        mine = current.get(key, _MISSING)
+        if mine is base_value or mine == base_value or mine == value:
+            merged[key] = value
+        elif isinstance(mine, dict) and isinstance(value, dict):
+            merged[key] = _merge_dict_changes(mine, value, base_value, f"{field}.{key}", writer, node, conflicts)
+        elif _record_conflict(conflicts, f"{field}.{key}", writer, node):
+            merged[key] = value
+    return merged
+
+
+def merge_branch_result(state_data: MutableMapping[str, Any], base: Mapping[str, Any],
+                        result: Dict[str, Any], node: StateNode, writers: Dict[str, StateNode],
+                        conflicts: List[Dict[str, Any]], blob_store: Optional[BlobStore] = None) -> None:
+    """Merge one branch's output into the shared state data in place.
+
+    ``state_data`` is usually a StateDraft over the current version, so only
+    the merged fields are written.
+
+    Only fields the branch changed relative to its input snapshot are applied.
+    When another branch changed the same field since that snapshot:
+    - dict values are merged key by key against the snapshot; keys only one
+      branch changed are kept, keys both changed are conflicts;
+    - for conflicts and other values the branch whose transition is declared
+      later wins, and the conflict is recorded (nested keys by dotted path).
+    ``status`` becomes "error" if any branch failed and ``last_updated``
+    keeps the most recent timestamp. Offloaded dict values are read back from
+    ``blob_store`` to be deep-merged and the merge result is offloaded again.
+    """
+    for key, value in result.items():
+        base_value = base.get(key, _MISSING)
+        if base_value is value or base_value == value:
+            continue
+
+        if key == "status":
+            if state_data.get("status") != "error":
+                state_data["status"] = value
+            continue
+        if key == "last_updated":
+            state_data[key] = max(str(state_data.get(key) or ""), str(value))
+            continue
+
+        current = state_data.get(key, _MISSING)
+        writer = writers.get(key)
+        concurrent_write = writer is not None and current is not base_value and current != base_value
+        if not concurrent_write:
+            state_data[key] = value
+            writers[key] = node
+            continue
+
+        if blob_store is not None:
+            current, incoming = blob_store.resolve(current), blob_store.resolve(value)
+            base_value = blob_store.resolve(base_value)
+        else:
+            incoming = value
+        if isinstance(current, dict) and isinstance(incoming, dict) and not (
+            is_blob_ref(current) or is_blob_ref(incoming)
+        ):
+            merged = _merge_dict_changes(current, incoming, base_value, key, writer, node, conflicts)
+            state_data[key] = blob_store.offload(merged) if blob_store is not None else merged
+        elif _record_conflict(conflicts, key, writer, node):
+            state_data[key] = value
+            writers[key] = node
+
+
+class _DagRun:
+    """Scheduling state of one run_dag (threads) or arun (asyncio tasks) call"""
+
+    def __init__(self, controller: "WorkflowController", data: Dict[str, Any],
+                 on_event: Optional[Callable[[str, str, str], None]]):
+        self.controller = controller
+        self.on_event = on_event
+        self.graph = build_dependency_graph(controller.workflow_config)
+        self.completed = set(controller.session_state.get("completed_states", []))
+        self.completed.add(controller.workflow_config["initial_state"])
+        self.pending = {state: node for state, node in self.graph.items() if state not in self.completed}
+        self.store = StateStore(data)
+        self.writers: Dict[str, StateNode] = {}
+        self.failed = False
+
+    def emit(self, event: str, node: StateNode) -> None:
+        self.controller._emit(_SCHEDULER_EVENTS[event], node.transition["agent_id"], state=node.state)
+        if self.on_event is not None:
+            self.on_event(event, node.state, node.transition["agent_id"])
+
+    def ready(self) -> List[Tuple[StateNode, StateVersion]]:
+        """Take every pending state whose dependencies have completed, with the snapshot it starts from"""
+        if self.failed:
+            return []
+        ready = []
+        for state, node in list(self.pending.items()):
+            if node.depends_on <= self.completed:
+                # Announce the state before its branch can emit token or tool events
+                self.emit("started", node)
+                ready.append((node, self.store.fork()))
+                del self.pending[state]
+                logger.info(f"Scheduled state {state} with agent {node.transition['agent_id']}")
+        return ready
+
+    @staticmethod
+    def outcome(node: StateNode, finished: Any, started: float) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Result of a finished future or task (None if it raised) and how long the branch took"""
+        duration = time.perf_counter() - started
+        try:
+            return finished.result(), duration
+        except Exception as e:
+            logger.error(f"State {node.state} raised: {str(e)}")
+            return None, duration
+
+    def record(self, node: StateNode, committed: bool) -> None:
+        if committed:
+            self.emit("completed", node)
+        else:
+            self.failed = True
+            self.emit("failed", node)
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.failed and not self.pending
 
 
 class WorkflowController(Workflow):
-    workflow_config: Dict[str, Any] = Field(default_factory=dict)
+    workflow_config: Optional[CompiledWorkflow] = Field(default=None, exclude=True)
     current_state: str = Field(default="init")
     input_data: Dict[str, Any] = Field(default_factory=dict)
+    agent_pool: AgentPool = Field(default_factory=get_default_pool, exclude=True)
+    concurrency_limiter: ModelConcurrencyLimiter = Field(default_factory=get_default_limiter, exclude=True)
+    # How often missing fields were recovered locally instead of calling the formatter agent
+    formatter_stats: Dict[str, int] = Field(
+        default_factory=lambda: {"fields_recovered": 0, "formatter_avoided": 0, "formatter_calls": 0}
+    )
+    checkpoint_store: Optional[CheckpointStore] = Field(default=None, exclude=True)
+    # Large state fields are kept here and referenced from the state (see _finish_agent_task)
+    blob_store: BlobStore = Field(default_factory=get_blob_store, exclude=True)
+    # When set, agents run in streaming mode and every event is passed to this callable
+    event_sink: Optional[EventSink] = Field(default=None, exclude=True)
+    # Timing spans and token usage of this session; in memory unless a file-backed recorder is attached
+    metrics: MetricsRecorder = Field(default_factory=MetricsRecorder, exclude=True)
+    _stats_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
 
-    def __init__(self, workflow_path: str, session_id: str, storage: Optional[SqlWorkflowStorage] = None):
+    def __init__(self, workflow_path: str, session_id: str, storage: Optional[SqlWorkflowStorage] = None,
+                 agent_pool: Optional[AgentPool] = None):
         # Initialize parent class first
         super().__init__(
             session_id=session_id,
             storage=storage
         )
+        if agent_pool is not None:
+            self.agent_pool = agent_pool
+        self.metrics = MetricsRecorder(session_id=session_id)
         
         # Load configuration
         config_dir = os.path.dirname(workflow_path)
         loader = WorkflowConfigLoader(config_dir)
-        self.workflow_config = loader.load_workflow(Path(workflow_path))
+        with self._span("config_load"):
+            self.workflow_config = loader.load_workflow(Path(workflow_path))
         
         # Set up storage
         if not storage:
             self.storage = SqlWorkflowStorage(
                 table_name=f"{self.workflow_config['name']}_workflows",
-                db_file="tmp/workflows.db"
+                db_file=DEFAULT_DB_FILE
+            )
+        # Per-transition checkpoints share the session storage database
+        db_engine = getattr(self.storage, "db_engine", None)
+        if db_engine is not None:
+            with _storage_init_lock:
+                self.storage.create()
+            self.checkpoint_store = CheckpointStore(
+                db_engine, table_name=f"{self.workflow_config['name']}_checkpoints",
+                snapshot_interval=get_section("checkpoints").get("snapshot_interval", DEFAULT_SNAPSHOT_INTERVAL)
             )
         
         # Load input data
@@ -57,47 +458,91 @@ class WorkflowController(Workflow):
         with open(input_path, 'r') as f:
             return json.load(f)
 
+    @contextmanager
+    def _span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Time a phase of the run, tagged with the state being produced"""
+        state = _event_state.get()
+        if state is not None:
+            attrs.setdefault("state", state)
+        with self.metrics.span(name, **attrs) as extra:
+            yield extra
+
+    def _record_usage(self, agent_id: str, agent: NimshipAgent, response) -> None:
+        """Record token usage reported on a RunResponse; cached responses count as cache hits"""
+        model_id = _model_id(agent, "served_model_id") or getattr(response, "model", None)
+        if getattr(agent, "served_from_cache", False):
+            # The stored metrics belong to the call that filled the cache
+            self.metrics.record_cache_hit(model_id, agent_id=agent_id, state=_event_state.get())
+            return
+        self.metrics.record_usage(model_id, getattr(response, "metrics", None), agent_id=agent_id,
+                                  state=_event_state.get())
+
     def get_valid_transitions(self):
         """Get valid transitions for current state"""
-        return [
-            t for t in self.workflow_config["transitions"]
-            if t["from_state"] == self.current_state
-        ]
+        return list(self.workflow_config.transitions_from(self.current_state))
 
     def validate_transition(self, to_state: str) -> Optional[Dict[str, Any]]:
         """Validate if state transition is allowed"""
-        valid_transitions = self.get_valid_transitions()
-        for transition in valid_transitions:
-            if transition["to_state"] == to_state:
-                logger.info(f"Found valid transition: {self.current_state} -> {to_state}")
-                return transition
+        transition = self.workflow_config.transition(self.current_state, to_state)
+        if transition is not None:
+            logger.info(f"Found valid transition: {self.current_state} -> {to_state}")
+            return transition
         logger.error(f"Invalid transition: {self.current_state} -> {to_state}")
         return None
 
     def validate_state_data(self, state: str, data: Dict[str, Any]) -> bool:
-        """Validate if state data meets requirements"""
-        state_requirements = self.workflow_config["state_data"].get(state, {})
-        required_fields = state_requirements.get("required_fields", [])
-
-        for field in required_fields:
-            if field not in data:
-                logger.error(f"Missing required field for state {state}: {field}")
+        """Validate the fields ``state`` owns in a single pass of its generated model"""
+        with self._span("validation"):
+            typed_fields = [name for name, _ in self.workflow_config.field_types.get(state, ())]
+            if typed_fields:
+                data = self.blob_store.resolve_fields(data, typed_fields)
+            try:
+                self.workflow_config.state_model(state).model_validate(data)
+            except ValidationError as e:
+                for error in e.errors():
+                    field = ".".join(str(part) for part in error["loc"])
+                    logger.error(f"Invalid state data for state {state}: {field}: {error['msg']}")
                 return False
 
         logger.info(f"State data validation passed for state: {state}")
         return True
 
     def load_agent(self, agent_id: str) -> NimshipAgent:
-        """Load agent instance"""
-        agent_config = next(
-            (a for a in self.workflow_config["agents"] if a["id"] == agent_id),
-            None
-        )
+        """Acquire an agent instance from the pool; hand it back with release_agent"""
+        agent_config = self.workflow_config.agent(agent_id)
         if not agent_config:
             logger.error(f"Agent not found: {agent_id}")
             raise ValueError(f"Agent {agent_id} not found in workflow config")
 
-        return NimshipAgent(config_path=agent_config["config_path"])
+        # Includes agent construction when the pool has no idle instance
+        with self._span("agent_acquire", agent_id=agent_id):
+            return self.agent_pool.acquire(agent_config["config_path"])
+
+    def release_agent(self, agent: NimshipAgent) -> None:
+        """Return an agent instance to the pool"""
+        self.agent_pool.release(agent)
+
+    @contextmanager
+    def lease_agent(self, agent_id: str) -> Iterator[NimshipAgent]:
+        """Borrow a pooled agent for the duration of a single run"""
+        agent = self.load_agent(agent_id)
+        try:
+            yield agent
+        except BaseException:
+            self.agent_pool.discard(agent)
+            raise
+        self.release_agent(agent)
+
+    @asynccontextmanager
+    async def _alease_agent(self, agent_id: str) -> AsyncIterator[NimshipAgent]:
+        """Async variant of lease_agent; a pool miss builds the agent in a worker thread"""
+        agent = await asyncio.to_thread(self.load_agent, agent_id)
+        try:
+            yield agent
+        except BaseException:
+            self.agent_pool.discard(agent)
+            raise
+        self.release_agent(agent)
 
     def _serialize_run_response(self, response):
         """Convert RunResponse to a serializable dictionary"""
@@ -108,152 +553,537 @@ class WorkflowController(Workflow):
         else:
             return str(response)
 
-    def execute_agent_task(self, agent_id: str, task_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute agent task"""
+    def _emit(self, event: WorkflowEventType, agent_id: Optional[str] = None, state: Optional[str] = None,
+              content: Optional[str] = None, data: Optional[Dict[str, Any]] = None) -> None:
+        """Pass an event to the event sink, if one is attached"""
+        sink = self.event_sink
+        if sink is None:
+            return
+        try:
+            sink(WorkflowEvent(
+                event=event,
+                session_id=self.session_id,
+                state=state if state is not None else _event_state.get(),
+                agent_id=agent_id,
+                content=content,
+                data=data
+            ))
+        except Exception as e:
+            logger.warning(f"Event sink raised on {event.value}: {str(e)}")
+
+    def _stream_agent(self, agent: NimshipAgent, agent_id: str, message: Dict[str, Any],
+                      required_fields: Tuple[str, ...] = ()):
+        """Run an agent in streaming mode, emitting token and tool call events.
+
+        Returns the complete RunResponse once the stream is exhausted. When
+        ``required_fields`` are given, JSON objects are decoded as tokens
+        arrive and generation stops as soon as all of them have been seen;
+        the response content is then the text streamed up to that point.
+        """
+        response = agent.run(message, stream=True, stream_intermediate_steps=True)
+        if isinstance(response, RunResponse):
+            # Agents with a response_model cannot stream
+            return response
+
+        extractor = IncrementalJsonExtractor(required_fields) if required_fields else None
+        streamed: List[str] = []
+        for chunk in response:
+            if chunk.event == RunEvent.run_response.value:
+                if isinstance(chunk.content, str) and chunk.content:
+                    self._emit(WorkflowEventType.token, agent_id, content=chunk.content)
+                    streamed.append(chunk.content)
+                    if extractor is not None and extractor.feed(chunk.content) and extractor.complete:
+                        # Closing the run generator alone leaves the model's HTTP stream open
+                        # until garbage collection; close it (and settle its rate limit) now
+                        response.close()
+                        close_stream = getattr(agent.model, "close_stream", None)
+                        if close_stream is not None:
+                            close_stream()
+                        logger.info("Agent %s produced all required fields, stopping generation early", agent_id)
+                        agent.run_response.content = "".join(streamed)
+                        return agent.run_response
+            elif chunk.event in (RunEvent.tool_call_started.value, RunEvent.tool_call_completed.value):
+                tools = agent.run_response.tools or []
+                self._emit(WorkflowEventType.tool_call, agent_id, content=chunk.content, data={
+                    "phase": "started" if chunk.event == RunEvent.tool_call_started.value else "completed",
+                    **(tools[-1] if tools else {})
+                })
+        return agent.run_response
+
+    def _run_agent(self, agent_id: str, message: Dict[str, Any], required_fields: Tuple[str, ...] = ()):
+        """Run a pooled agent synchronously"""
+        with self.lease_agent(agent_id) as agent:
+            with self._span("agent_run", agent_id=agent_id):
+                if self.event_sink is not None:
+                    response = self._stream_agent(agent, agent_id, message, required_fields)
+                else:
+                    response = agent.run(message)
+            self._record_usage(agent_id, agent, response)
+            return response
+
+    async def _arun_agent(self, agent_id: str, message: Dict[str, Any], required_fields: Tuple[str, ...] = ()):
+        """Run a pooled agent on the event loop, bounded by its model's concurrency limit"""
+        async with self._alease_agent(agent_id) as agent:
+            async with self.concurrency_limiter.slot(_model_id(agent, "next_model_id")):
+                with self._span("agent_run", agent_id=agent_id):
+                    if self.event_sink is not None:
+                        response = await asyncio.to_thread(self._stream_agent, agent, agent_id, message, required_fields)
+                    else:
+                        response = await agent.arun(message)
+            self._record_usage(agent_id, agent, response)
+            return response
+
+    def _input_fields(self, state: Optional[str]) -> Optional[FrozenSet[str]]:
+        """Input projection of the transition from ``state`` into the state being produced"""
+        target = _event_state.get()
+        transition = self.workflow_config.transition(state or self.current_state, target) if target else None
+        return self.workflow_config.input_fields_for(transition) if transition is not None else None
+
+    def _agent_input(self, agent_id: str, current_data: Dict[str, Any],
+                     fields: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
+        """Build the user message sent to an agent, limited to ``fields`` when given"""
+        payload = prompt_layout(project_input(self.blob_store.resolve_fields(current_data, fields), fields),
+                                self.workflow_config.get("shared_inputs", DEFAULT_SHARED_INPUTS))
+        formatted_input = {
+            "role": "user",
+            "content": JsonProcessor.safe_serialize(payload)
+        }
+        if fields is not None:
+            logger.info("Agent %s input projected to %d of %d fields", agent_id,
+                        len(payload) - ("omitted_fields" in payload), len(current_data))
+        logger.info("Agent %s input: %s", agent_id, log_payload(payload))
+        return formatted_input
+
+    def _apply_agent_output(self, agent_id: str, current_data: Dict[str, Any], result,
+                            state: Optional[str]) -> List[str]:
+        """Merge an agent response into current_data and return required fields still missing"""
+        # Log raw agent output
+        serialized_result = self._serialize_run_response(result)
+        logger.info("Agent %s raw output: %s", agent_id, log_payload(serialized_result))
+
+        if not isinstance(serialized_result, dict):
+            current_data["content"] = str(serialized_result)
+            logger.info("Agent %s output (non-dict): %s", agent_id, log_payload(serialized_result))
+            return []
+
+        # Merge instead of replace
+        cleaned_result = JsonProcessor.clean_content(serialized_result)
+        logger.debug("Agent %s cleaned output: %s", agent_id, log_payload(cleaned_result))
+
+        if 'content' in cleaned_result:
+            logger.debug("Content in cleaned result: %s", log_payload(cleaned_result['content']))
+
+            # Check if technical_design is nested in content
+            if isinstance(cleaned_result['content'], dict) and 'technical_design' in cleaned_result['content']:
+                current_data['technical_design'] = cleaned_result['content']['technical_design']
+                logger.info("Found technical_design in content: %s", log_payload(current_data['technical_design']))
+
+        current_data.update(cleaned_result)
+
+        # Check for required fields
+        required_fields = self.workflow_config.required_fields_for(state or self.current_state)
+        missing_fields = [field for field in required_fields if field not in current_data]
+        return self._recover_missing_fields(current_data, missing_fields)
+
+    def _recover_missing_fields(self, data: Dict[str, Any], missing_fields: List[str]) -> List[str]:
+        """Fill missing fields from the existing content without a model call.
+
+        Returns the fields that still need the formatter agent and updates
+        ``formatter_stats``.
+        """
+        if not missing_fields:
+            return missing_fields
+
+        logger.warning(f"Missing required fields: {missing_fields}")
+        recovered = JsonProcessor.extract_fields(self.blob_store.resolve_fields(data, ("content",)), missing_fields)
+        data.update(recovered)
+        remaining = [field for field in missing_fields if field not in recovered]
+
+        with self._stats_lock:
+            self.formatter_stats["fields_recovered"] += len(recovered)
+            if remaining:
+                self.formatter_stats["formatter_calls"] += 1
+            else:
+                self.formatter_stats["formatter_avoided"] += 1
+
+        if recovered:
+            logger.info(f"Recovered fields locally: {list(recovered)}")
+        if remaining:
+            logger.warning(f"Fields left for the formatter agent: {remaining}")
+        return remaining
+
+    def _formatter_data(self, data: Dict[str, Any], fields: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+        """The agent's view of the state plus its raw content, for the formatter agent"""
+        fields = None if fields is None else fields | {"content"}
+        return project_input(self.blob_store.resolve_fields(data, fields), fields)
+
+    def _formatter_input(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the user message for the formatter agent"""
+        formatter_input = {
+            "role": "user",
+            "content": JsonProcessor.safe_serialize(payload)
+        }
+        logger.info("Formatter agent input: %s", log_payload(payload))
+        return formatter_input
+
+    def _apply_formatter_output(self, data: Dict[str, Any], formatter_result) -> None:
+        """Merge the formatter agent response into data"""
+        formatted_result = self._serialize_run_response(formatter_result)
+        logger.info("Formatter agent raw output: %s", log_payload(formatted_result))
+        if isinstance(formatted_result, dict):
+            cleaned_formatted_result = JsonProcessor.clean_content(formatted_result)
+            logger.debug("Formatter agent cleaned output: %s", log_payload(cleaned_formatted_result))
+            data.update(cleaned_formatted_result)
+        else:
+            logger.error("Formatter agent did not return a dictionary")
+
+    def _finish_agent_task(self, agent_id: str, current_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Stamp status information onto a completed task"""
+        current_data.update({
+            "status": "success",
+            "last_updated": datetime.now().isoformat()
+        })
+        # Keep large outputs out of the state, its logs, checkpoints and later prompts
+        self.blob_store.offload_fields(current_data)
+
+        # Log final state data
+        logger.info("Final state data after %s task: %s", agent_id, log_payload(current_data))
+        return current_data
+
+    def _failed_agent_task(self, task_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        logger.error(f"Agent task failed: {str(error)}")
+        return {
+            **task_data,
+            "content": str(error),
+            "status": "error",
+            "last_updated": datetime.now().isoformat()
+        }
+
+    def _agent_task_steps(self, agent_id: str, task_data: Dict[str, Any], state: Optional[str]) -> Steps:
+        """Steps of execute_agent_task, shared by the sync and async variants"""
         logger.info(f"Executing agent task: {agent_id}")
         try:
-            agent = self.load_agent(agent_id)
-            
             # Keep original data
             current_data = task_data.copy()
-            
-            # Format input
-            formatted_input = {
-                "role": "user",
-                "content": JsonProcessor.safe_serialize(current_data)
-            }
-            
-            # Log agent input
-            logger.info(f"Agent {agent_id} input: {json.dumps(formatted_input, indent=2, default=json_serial)}")
-            
-            # Execute agent
-            result = agent.run(formatted_input)
-            
-            # Log raw agent output
-            serialized_result = self._serialize_run_response(result)
-            logger.info(f"Agent {agent_id} raw output: {json.dumps(serialized_result, indent=2, default=json_serial)}")
-            
-            # Process return result
-            if isinstance(serialized_result, dict):
-                # Merge instead of replace
-                cleaned_result = JsonProcessor.clean_content(serialized_result)
-                logger.info(f"Agent {agent_id} cleaned output: {json.dumps(cleaned_result, indent=2, default=json_serial)}")
-                
-                # Log the exact content of cleaned_result
-                logger.info(f"Cleaned result keys: {cleaned_result.keys()}")
-                if 'content' in cleaned_result:
-                    logger.info(f"Content in cleaned result: {cleaned_result['content']}")
-                    
-                    # Check if technical_design is nested in content
-                    if isinstance(cleaned_result['content'], dict) and 'technical_design' in cleaned_result['content']:
-                        current_data['technical_design'] = cleaned_result['content']['technical_design']
-                        logger.info(f"Found technical_design in content: {current_data['technical_design']}")
-                
-                current_data.update(cleaned_result)
-                
-                # Check for required fields
-                required_fields = self.workflow_config["state_data"].get(self.current_state, {}).get("required_fields", [])
-                missing_fields = [field for field in required_fields if field not in current_data]
-                
-                if missing_fields:
-                    logger.warning(f"Missing required fields: {missing_fields}")
-                    formatter_agent = self.load_agent("formatter")
-                    formatter_input = {
-                        "role": "user",
-                        "content": JsonProcessor.safe_serialize({
-                            "original_data": current_data,
+            fields = self._input_fields(state)
+            result = yield _Step(self._run_agent, self._arun_agent, (
+                agent_id, self._agent_input(agent_id, current_data, fields), _pending_fields.get()
+            ))
+
+            missing_fields = self._apply_agent_output(agent_id, current_data, result, state)
+            if missing_fields:
+                with self._span("formatter_fallback", agent_id=agent_id):
+                    formatter_result = yield _Step(self._run_agent, self._arun_agent, (
+                        "formatter", self._formatter_input({
+                            "original_data": self._formatter_data(current_data, fields),
                             "missing_fields": missing_fields
                         })
-                    }
-                    logger.info(f"Formatter agent input: {json.dumps(formatter_input, indent=2, default=json_serial)}")
-                    formatter_result = formatter_agent.run(formatter_input)
-                    formatted_result = self._serialize_run_response(formatter_result)
-                    logger.info(f"Formatter agent raw output: {json.dumps(formatted_result, indent=2, default=json_serial)}")
-                    if isinstance(formatted_result, dict):
-                        cleaned_formatted_result = JsonProcessor.clean_content(formatted_result)
-                        logger.info(f"Formatter agent cleaned output: {json.dumps(cleaned_formatted_result, indent=2, default=json_serial)}")
-                        current_data.update(cleaned_formatted_result)
-                    else:
-                        logger.error("Formatter agent did not return a dictionary")
-            else:
-                current_data["content"] = str(serialized_result)
-                logger.info(f"Agent {agent_id} output (non-dict): {serialized_result}")
-            
-            # Add status information
-            current_data.update({
-                "status": "success",
-                "last_updated": datetime.now().isoformat()
-            })
-            
-            # Log final state data
-            logger.info(f"Final state data after {agent_id} task: {json.dumps(current_data, indent=2, default=json_serial)}")
-            
-            return current_data
-                
+                    ))
+                    self._apply_formatter_output(current_data, formatter_result)
+
+            # Offloading large fields writes blob files
+            return (yield _Step(self._finish_agent_task, None, (agent_id, current_data)))
         except Exception as e:
-            logger.error(f"Agent task failed: {str(e)}")
-            return {
-                **task_data,
-                "content": str(e),
-                "status": "error",
-                "last_updated": datetime.now().isoformat()
-            }
+            return self._failed_agent_task(task_data, e)
 
-    def try_transition(self, to_state: str, data: Dict[str, Any]) -> bool:
-        """Try to transition to new state"""
-        transition = self.validate_transition(to_state)
-        if not transition:
-            return False
+    def execute_agent_task(self, agent_id: str, task_data: Dict[str, Any],
+                           state: Optional[str] = None) -> Dict[str, Any]:
+        """Execute agent task; output is checked against ``state`` (default: current state).
 
-        logger.info(f"State data before validation: {json.dumps(data, indent=2, default=json_serial)}")
-        logger.info(f"Required fields for state {to_state}: {self.workflow_config['state_data'][to_state]['required_fields']}")
-        
+        The agent sees only the fields its transition needs (see
+        ``CompiledWorkflow.input_fields_for``); the rest of the state is
+        summarised under ``omitted_fields`` but kept in full in the result.
+        """
+        return _drive(self._agent_task_steps(agent_id, task_data, state))
+
+    async def aexecute_agent_task(self, agent_id: str, task_data: Dict[str, Any],
+                                  state: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of execute_agent_task"""
+        return await _adrive(self._agent_task_steps(agent_id, task_data, state))
+
+    def _fields_to_produce(self, state: str, data: Dict[str, Any]) -> Tuple[str, ...]:
+        """Required fields of ``state`` the transition's input lacks.
+
+        Taken before prepare_transition_data fills them in, so these are the
+        fields the transition's agent is expected to produce; streaming stops
+        early only once they have all been seen.
+        """
+        return tuple(field for field in self.workflow_config.required_fields_for(state) if field not in data)
+
+    def _missing_transition_fields(self, transition: Transition, data: Dict[str, Any]) -> List[str]:
+        to_state = transition["to_state"]
+        logger.debug("State data before validation: %s", log_payload(data))
         # Check for missing fields before validation
-        required_fields = self.workflow_config["state_data"].get(to_state, {}).get("required_fields", [])
+        required_fields = self.workflow_config.required_fields_for(to_state)
+        logger.info(f"Required fields for state {to_state}: {list(required_fields)}")
         missing_fields = [field for field in required_fields if field not in data]
-        
-        if missing_fields:
-            logger.warning(f"Missing required fields: {missing_fields}")
-            formatter_agent = self.load_agent("formatter")
-            formatter_input = {
-                "role": "user",
-                "content": JsonProcessor.safe_serialize({
-                    "original_data": data,
-                    "missing_fields": missing_fields,
-                    "current_state": self.current_state,
-                    "target_state": to_state
-                })
-            }
-            logger.info(f"Formatter agent input: {json.dumps(formatter_input, indent=2, default=json_serial)}")
-            formatter_result = formatter_agent.run(formatter_input)
-            formatted_result = self._serialize_run_response(formatter_result)
-            logger.info(f"Formatter agent raw output: {json.dumps(formatted_result, indent=2, default=json_serial)}")
-            if isinstance(formatted_result, dict):
-                cleaned_formatted_result = JsonProcessor.clean_content(formatted_result)
-                logger.info(f"Formatter agent cleaned output: {json.dumps(cleaned_formatted_result, indent=2, default=json_serial)}")
-                data.update(cleaned_formatted_result)
-            else:
-                logger.error("Formatter agent did not return a dictionary")
+        return self._recover_missing_fields(data, missing_fields)
 
+    def _transition_formatter_input(self, transition: Transition, data: Dict[str, Any],
+                                    missing_fields: List[str]) -> Dict[str, Any]:
+        return self._formatter_input({
+            "original_data": self.blob_store.resolve_fields(data),
+            "missing_fields": missing_fields,
+            "current_state": transition["from_state"],
+            "target_state": transition["to_state"]
+        })
+
+    def _validate_transition_data(self, transition: Transition, data: Dict[str, Any]) -> bool:
+        to_state = transition["to_state"]
         if not self.validate_state_data(to_state, data):
             logger.error(f"State data validation failed for {to_state}")
             return False
 
         logger.info(f"State data validation passed for {to_state}")
+        return True
+
+    def _prepare_steps(self, transition: Transition, data: Dict[str, Any]) -> Steps:
+        missing_fields = self._missing_transition_fields(transition, data)
+        if missing_fields:
+            with self._span("formatter_fallback", agent_id=transition["agent_id"]):
+                formatter_result = yield _Step(self._run_agent, self._arun_agent, (
+                    "formatter", self._transition_formatter_input(transition, data, missing_fields)
+                ))
+                self._apply_formatter_output(data, formatter_result)
+        return self._validate_transition_data(transition, data)
+
+    def prepare_transition_data(self, transition: Transition, data: Dict[str, Any]) -> bool:
+        """Fill missing fields required by the target state and validate the data in place"""
+        return _drive(self._prepare_steps(transition, data))
+
+    async def aprepare_transition_data(self, transition: Transition, data: Dict[str, Any]) -> bool:
+        """Async variant of prepare_transition_data"""
+        return await _adrive(self._prepare_steps(transition, data))
+
+    def _save_checkpoint(self, transition: Transition, state_data: Dict[str, Any],
+                         duration: Optional[float] = None) -> None:
+        """Durably record a successful transition so the session can resume from it"""
+        with self._span("storage_write", state=transition["to_state"]):
+            if self.checkpoint_store is not None:
+                self.checkpoint_store.save(
+                    session_id=self.session_id,
+                    from_state=transition["from_state"],
+                    to_state=transition["to_state"],
+                    agent_id=transition["agent_id"],
+                    state_data=state_data,
+                    completed_states=self.session_state.get("completed_states", []),
+                    output_ref=state_data.get("run_id"),
+                    duration=duration
+                )
+            self.write_to_storage()
+
+    def resume(self) -> bool:
+        """Restore the last committed checkpoint of this session; returns False if there is none"""
+        checkpoint = self.checkpoint_store.latest(self.session_id) if self.checkpoint_store else None
+        if checkpoint is None:
+            logger.warning(f"No checkpoint found for session {self.session_id}")
+            return False
+
+        self.current_state = checkpoint.to_state
+        self.session_state["current_state"] = checkpoint.to_state
+        self.session_state["completed_states"] = checkpoint.completed_states
+        self.session_state["state_data"] = checkpoint.state_data
+        logger.info(f"Resumed session {self.session_id} at checkpoint {checkpoint.seq} ({checkpoint.to_state})")
+        return True
+
+    def state_at(self, seq: int) -> Optional[Dict[str, Any]]:
+        """State data of this session as committed by checkpoint ``seq`` (1 is the first transition)"""
+        return self.checkpoint_store.state_at(self.session_id, seq) if self.checkpoint_store else None
+
+    def collect_blobs(self, min_age_seconds: Optional[float] = None) -> Dict[str, int]:
+        """Delete blobs no session or checkpoint in this storage database references any more"""
+        db_engine = getattr(self.storage, "db_engine", None)
+        if db_engine is None:
+            return {"removed": 0, "bytes_freed": 0}
+        return self.blob_store.collect(referenced_blobs(db_engine), min_age_seconds)
+
+    def _commit_transition(self, transition: Transition, old_state: str, to_state: str,
+                           agent_result: Dict[str, Any], duration: Optional[float] = None) -> None:
+        self.current_state = to_state
+        self.session_state["current_state"] = to_state
+        self.session_state["state_data"] = agent_result
+        if agent_result.get("status") != "error":
+            completed = self.session_state.setdefault("completed_states", [])
+            if to_state not in completed:
+                completed.append(to_state)
+            self._save_checkpoint(transition, agent_result, duration)
+
+        logger.info(f"State transition successful: {old_state} -> {to_state}")
+        logger.debug("Final state data after transition: %s", log_payload(agent_result))
+
+    def _transition_steps(self, to_state: str, data: Dict[str, Any]) -> Steps:
+        """Steps of try_transition, shared by the sync and async variants"""
+        transition = self.validate_transition(to_state)
+        if not transition:
+            return False
+
+        pending = self._fields_to_produce(to_state, data)
+        if not (yield _Step(self.prepare_transition_data, self.aprepare_transition_data, (transition, data))):
+            return False
 
         old_state = self.current_state
-        try:
-            agent_result = self.execute_agent_task(transition["agent_id"], data)
+        agent_id = transition["agent_id"]
+        with _producing(to_state, pending):
+            self._emit(WorkflowEventType.transition_started, agent_id)
+            try:
+                started = time.perf_counter()
+                agent_result = yield _Step(self.execute_agent_task, self.aexecute_agent_task, (agent_id, data))
+                # Checkpoint and session writes go to SQLite
+                yield _Step(self._commit_transition, None, (
+                    transition, old_state, to_state, agent_result, time.perf_counter() - started
+                ))
+                self._emit(WorkflowEventType.transition_completed, agent_id)
+                return True
 
-            self.current_state = to_state
-            self.session_state["current_state"] = to_state
-            self.session_state["state_data"] = agent_result
+            except Exception as e:
+                self.current_state = old_state
+                logger.error(f"State transition failed: {str(e)}")
+                self._emit(WorkflowEventType.transition_failed, agent_id, data={"error": str(e)})
+                return False
 
-            logger.info(f"State transition successful: {old_state} -> {to_state}")
-            logger.info(f"Final state data after transition: {json.dumps(agent_result, indent=2, default=json_serial)}")
-            return True
+    def try_transition(self, to_state: str, data: Dict[str, Any]) -> bool:
+        """Try to transition to new state"""
+        return _drive(self._transition_steps(to_state, data))
 
-        except Exception as e:
-            self.current_state = old_state
-            logger.error(f"State transition failed: {str(e)}")
+    async def atry_transition(self, to_state: str, data: Dict[str, Any]) -> bool:
+        """Async variant of try_transition"""
+        return await _adrive(self._transition_steps(to_state, data))
+
+    def _branch_steps(self, node: StateNode, data: Dict[str, Any]) -> Steps:
+        with _producing(node.state, self._fields_to_produce(node.state, data)):
+            if not (yield _Step(self.prepare_transition_data, self.aprepare_transition_data,
+                                (node.transition, data))):
+                return None
+            return (yield _Step(self.execute_agent_task, self.aexecute_agent_task, (
+                node.transition["agent_id"], data, node.transition["from_state"]
+            )))
+
+    def _run_branch(self, node: StateNode, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Run a single scheduled state; returns None when its input fails validation"""
+        return _drive(self._branch_steps(node, data))
+
+    async def _arun_branch(self, node: StateNode, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Async variant of _run_branch"""
+        return await _adrive(self._branch_steps(node, data))
+
+    def _complete_branch(self, run: _DagRun, node: StateNode, base: StateVersion,
+                         result: Optional[Dict[str, Any]], duration: Optional[float] = None) -> bool:
+        """Merge a finished branch into the shared state; returns False if the branch failed"""
+        if result is None or result.get("status") == "error":
+            logger.error(f"State {node.state} failed, no further states will be scheduled")
             return False
+
+        conflicts = self.session_state.setdefault("merge_conflicts", [])
+        draft = run.store.draft()
+        merge_branch_result(draft, base, result, node, run.writers, conflicts, self.blob_store)
+        version = run.store.commit(draft)
+        logger.debug(f"State {node.state} committed version {version.version} ({len(draft.writes)} fields changed)")
+        run.completed.add(node.state)
+        self.current_state = node.state
+        self.session_state["current_state"] = node.state
+        self.session_state["completed_states"] = [s for s in run.graph if s in run.completed]
+        self.session_state["state_data"] = version.to_dict()
+        self._save_checkpoint(node.transition, self.session_state["state_data"], duration)
+        logger.info(f"State {node.state} completed")
+        return True
+
+    def run_dag(self, data: Dict[str, Any], max_workers: Optional[int] = None,
+                on_event: Optional[Callable[[str, str, str], None]] = None) -> bool:
+        """Run every state reachable from the initial state, in parallel where the graph allows.
+
+        Each state starts as soon as all states with a transition into it have
+        completed, on a thread pool bounded by ``max_workers`` (or the
+        workflow's ``max_parallel_branches``). Branch outputs are merged with
+        ``merge_branch_result``. ``on_event`` receives ("started" | "completed" |
+        "failed", state, agent_id). States listed in
+        ``session_state["completed_states"]`` are not run again.
+        """
+        run = _DagRun(self, data, on_event)
+        max_workers = max_workers or self.workflow_config.get(
+            "max_parallel_branches", DEFAULT_MAX_PARALLEL_BRANCHES
+        )
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workflow-branch") as executor:
+            running = {}
+            while True:
+                for node, base in run.ready():
+                    future = executor.submit(self._run_branch, node, base.to_dict())
+                    running[future] = (node, base, time.perf_counter())
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node, base, started = running.pop(future)
+                    result, duration = run.outcome(node, future, started)
+                    run.record(node, self._complete_branch(run, node, base, result, duration))
+
+        return run.succeeded
+
+    def stream_dag(self, data: Dict[str, Any], max_workers: Optional[int] = None) -> Iterator[WorkflowEvent]:
+        """Run the workflow like run_dag and yield its events as they happen.
+
+        Transitions, token chunks and tool calls are yielded in arrival order,
+        followed by a final ``workflow_completed`` event whose data holds the
+        overall result. Closing the iterator early still waits for the run to
+        finish.
+        """
+        events: "queue.Queue[Optional[WorkflowEvent]]" = queue.Queue()
+        previous_sink = self.event_sink
+        self.event_sink = events.put
+        outcome = {"success": False}
+
+        def run() -> None:
+            try:
+                outcome["success"] = self.run_dag(data, max_workers=max_workers)
+            except Exception as e:
+                logger.error(f"Streaming run failed: {str(e)}")
+            finally:
+                events.put(None)
+
+        worker = threading.Thread(target=run, name="workflow-stream", daemon=True)
+        worker.start()
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            worker.join()
+            self.event_sink = previous_sink
+
+        yield WorkflowEvent(
+            event=WorkflowEventType.workflow_completed,
+            session_id=self.session_id,
+            state=self.current_state,
+            data={"success": outcome["success"]}
+        )
+
+    async def arun(self, data: Optional[Dict[str, Any]] = None,
+                   on_event: Optional[Callable[[str, str, str], None]] = None) -> bool:
+        """Run the whole workflow on the current event loop.
+
+        Same scheduling and merge rules as run_dag, but branches are asyncio
+        tasks, so many sessions can share one loop. Model calls are bounded per
+        model id by the controller's concurrency limiter; agent construction,
+        blob writes and checkpoint commits run in worker threads.
+        """
+        run = _DagRun(self, self.input_data if data is None else data, on_event)
+
+        running: Dict[asyncio.Task, tuple] = {}
+        while True:
+            for node, base in run.ready():
+                task = asyncio.ensure_future(self._arun_branch(node, base.to_dict()))
+                running[task] = (node, base, time.perf_counter())
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                node, base, started = running.pop(task)
+                result, duration = run.outcome(node, task, started)
+                committed = await asyncio.to_thread(self._complete_branch, run, node, base, result, duration)
+                run.record(node, committed)
+
+        return run.succeeded
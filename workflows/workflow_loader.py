@@ -1,11 +1,18 @@
-import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from pathlib import Path
+import sys
 from phi.utils.log import logger
+from utils.config_bundle import ConfigBundle, get_config_bundle, source_version
+from . import models, state_machine
+from .state_machine import CompiledWorkflow
+
+# 编译结果依赖校验和编译代码本身，这些模块变化后磁盘上缓存的编译结果不再使用
+COMPILE_VERSION = source_version(models, state_machine, sys.modules[__name__])
 
 class WorkflowConfigLoader:
-    def __init__(self, config_dir: str):
+    def __init__(self, config_dir: str, bundle: Optional[ConfigBundle] = None):
         self.config_dir = Path(config_dir)
+        self.bundle = bundle if bundle is not None else get_config_bundle()
     
     def validate_config(self, config: Dict[str, Any]) -> bool:
         """验证工作流配置的完整性"""
@@ -21,12 +28,22 @@ class WorkflowConfigLoader:
             
         return True
     
-    def load_workflow(self, config_path: Path) -> Dict[str, Any]:
-        """加载并验证工作流配置"""
-        with open(config_path) as f:
-            config = json.load(f)
-            
+    def load_workflow(self, config_path: Path) -> CompiledWorkflow:
+        """加载并验证工作流配置，编译为不可变的状态机
+
+        编译结果按文件内容缓存并写入配置缓存文件，配置文件未变化时
+        （包括新进程中）不再重复解析、验证和编译。
+        """
+        return self.bundle.derive(str(config_path), "workflow",
+                                  lambda config: self._compile(config_path, config), persist=True,
+                                  version=COMPILE_VERSION)
+
+    def _compile(self, config_path: Path, config: Dict[str, Any]) -> CompiledWorkflow:
         if not self.validate_config(config):
             raise ValueError(f"Invalid workflow config: {config_path}")
-            
-        return config        
\ No newline at end of file
+
+        try:
+            return CompiledWorkflow.compile(config)
+        except ValueError as e:
+            logger.error(f"Workflow config has dangling references: {e}")
+            raise ValueError(f"Invalid workflow config: {config_path}: {e}") from e